@@ -0,0 +1,53 @@
+"""add dimensions to embedding_cache
+
+Revision ID: 2a6d8f4b9e15
+Revises: 5e9b3d7a1c08
+Create Date: 2026-10-18 15:41:09.264183
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "2a6d8f4b9e15"
+down_revision: Union[str, None] = "5e9b3d7a1c08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("embedding_cache", sa.Column("dimensions", sa.Integer()))
+    # Existing entries were requested at the size they are stored with
+    op.execute("UPDATE embedding_cache SET dimensions = vector_dims(embedding)")
+    op.alter_column("embedding_cache", "dimensions", nullable=False)
+    op.drop_constraint(
+        "uq_embedding_cache_model_hash", "embedding_cache", type_="unique"
+    )
+    op.create_unique_constraint(
+        "uq_embedding_cache_model_dimensions_hash",
+        "embedding_cache",
+        ["model", "dimensions", "content_hash"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(
+        "uq_embedding_cache_model_dimensions_hash", "embedding_cache", type_="unique"
+    )
+    # One entry per (model, content_hash) again: keep the most recently used
+    op.execute(
+        """
+        DELETE FROM embedding_cache AS e
+        USING embedding_cache AS newer
+        WHERE newer.model = e.model
+          AND newer.content_hash = e.content_hash
+          AND (newer.last_used_at, newer.id) > (e.last_used_at, e.id)
+        """
+    )
+    op.create_unique_constraint(
+        "uq_embedding_cache_model_hash", "embedding_cache", ["model", "content_hash"]
+    )
+    op.drop_column("embedding_cache", "dimensions")
@@ -0,0 +1,30 @@
+"""add input_fingerprint to analysis_results
+
+Revision ID: 3b8f1e6c4a92
+Revises: 9c2e7b5a0d14
+Create Date: 2026-10-17 19:03:25.618407
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b8f1e6c4a92"
+down_revision: Union[str, None] = "9c2e7b5a0d14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing results have no fingerprint; the next analysis of each user
+    # runs once and records one
+    op.add_column(
+        "analysis_results", sa.Column("input_fingerprint", sa.Text(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("analysis_results", "input_fingerprint")
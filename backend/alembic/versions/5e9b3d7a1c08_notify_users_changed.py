@@ -0,0 +1,47 @@
+"""notify users changes
+
+Revision ID: 5e9b3d7a1c08
+Revises: 7d5a2c9e3f60
+Create Date: 2026-10-18 10:14:37.502816
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e9b3d7a1c08"
+down_revision: Union[str, None] = "7d5a2c9e3f60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Frozen copy of app.models.USERS_CHANGED_TRIGGER_SQL
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_users_changed() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('users_changed', OLD.email);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER users_updated_notify AFTER UPDATE ON users FOR EACH ROW
+        WHEN (
+            (to_jsonb(OLD) - 'corpus_version') IS DISTINCT FROM
+            (to_jsonb(NEW) - 'corpus_version')
+        )
+        EXECUTE FUNCTION notify_users_changed();
+
+        CREATE TRIGGER users_deleted_notify AFTER DELETE ON users FOR EACH ROW
+        EXECUTE FUNCTION notify_users_changed();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS users_deleted_notify ON users")
+    op.execute("DROP TRIGGER IF EXISTS users_updated_notify ON users")
+    op.execute("DROP FUNCTION IF EXISTS notify_users_changed()")
@@ -0,0 +1,38 @@
+"""add hnsw index to rag_embeddings
+
+Revision ID: 61fb0314dc36
+Revises: d9343f0131be
+Create Date: 2026-10-17 08:41:09.372615
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "61fb0314dc36"
+down_revision: Union[str, None] = "d9343f0131be"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction block, and keeps the table
+    # writable while the index builds. Raise maintenance_work_mem for large
+    # tables so the graph fits in memory during the build.
+    with op.get_context().autocommit_block():
+        op.execute(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS
+                ix_rag_embeddings_embedding_hnsw
+            ON rag_embeddings
+            USING hnsw (embedding vector_cosine_ops)
+            WITH (m = 16, ef_construction = 64)
+            """
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_rag_embeddings_embedding_hnsw")
@@ -0,0 +1,33 @@
+"""add started_at to analysis_jobs
+
+Revision ID: 7d5a2c9e3f60
+Revises: 3b8f1e6c4a92
+Create Date: 2026-10-17 19:48:09.274163
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7d5a2c9e3f60"
+down_revision: Union[str, None] = "3b8f1e6c4a92"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "analysis_jobs",
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    # Running jobs started when they were locked
+    op.execute(
+        "UPDATE analysis_jobs SET started_at = locked_at WHERE status = 'running'"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("analysis_jobs", "started_at")
@@ -0,0 +1,63 @@
+"""fill embedding_bits in the database
+
+Revision ID: 8f4c1a7e2d39
+Revises: 2a6d8f4b9e15
+Create Date: 2026-10-18 17:26:51.803447
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8f4c1a7e2d39"
+down_revision: Union[str, None] = "2a6d8f4b9e15"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Frozen copy of app.models.EMBEDDING_BITS_TRIGGER_SQL
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION fill_embedding_bits() RETURNS trigger AS $$
+        BEGIN
+            IF (TG_OP = 'INSERT' AND NEW.embedding_bits IS NULL)
+                OR (TG_OP = 'UPDATE'
+                    AND NEW.embedding IS DISTINCT FROM OLD.embedding
+                    AND NEW.embedding_bits IS NOT DISTINCT FROM OLD.embedding_bits)
+            THEN
+                NEW.embedding_bits := (
+                    SELECT string_agg(
+                        CASE WHEN x > 0 THEN '1' ELSE '0' END, '' ORDER BY i
+                    )
+                    FROM unnest(NEW.embedding::real[]) WITH ORDINALITY AS e(x, i)
+                )::varbit;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER rag_embeddings_fill_bits
+        BEFORE INSERT OR UPDATE ON rag_embeddings
+        FOR EACH ROW EXECUTE FUNCTION fill_embedding_bits();
+        """
+    )
+    # Rows written by the previous app version after e2b7c5d91f48 backfilled
+    # the column
+    op.execute(
+        """
+        UPDATE rag_embeddings r
+        SET embedding_bits = (
+            SELECT string_agg(CASE WHEN x > 0 THEN '1' ELSE '0' END, '' ORDER BY i)
+            FROM unnest(r.embedding::real[]) WITH ORDINALITY AS e(x, i)
+        )::varbit
+        WHERE embedding_bits IS NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS rag_embeddings_fill_bits ON rag_embeddings")
+    op.execute("DROP FUNCTION IF EXISTS fill_embedding_bits()")
@@ -0,0 +1,80 @@
+"""coalesce queued analysis jobs per user
+
+Revision ID: 9c2e7b5a0d14
+Revises: 4f6a9d3c1b27
+Create Date: 2026-10-17 18:12:47.310254
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9c2e7b5a0d14"
+down_revision: Union[str, None] = "4f6a9d3c1b27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "analysis_jobs",
+        sa.Column(
+            "coalesced_triggers", sa.Integer(), server_default="0", nullable=False
+        ),
+    )
+    op.drop_constraint("analysis_jobs_status_check", "analysis_jobs", type_="check")
+    op.create_check_constraint(
+        "analysis_jobs_status_check",
+        "analysis_jobs",
+        "status IN ('queued', 'running', 'succeeded', 'dead', 'coalesced')",
+    )
+    # Keep the newest queued job per user; the older ones are absorbed into it
+    op.execute(
+        """
+        WITH kept AS (
+            SELECT DISTINCT ON (user_id) id, user_id
+            FROM analysis_jobs
+            WHERE status = 'queued'
+            ORDER BY user_id, created_at DESC, id
+        ),
+        absorbed AS (
+            UPDATE analysis_jobs AS j
+            SET status = 'coalesced', finished_at = now()
+            FROM kept
+            WHERE j.user_id = kept.user_id
+              AND j.status = 'queued'
+              AND j.id <> kept.id
+            RETURNING j.user_id
+        )
+        UPDATE analysis_jobs AS j
+        SET coalesced_triggers = counts.n
+        FROM (
+            SELECT kept.id, count(*) AS n
+            FROM kept JOIN absorbed USING (user_id)
+            GROUP BY kept.id
+        ) AS counts
+        WHERE j.id = counts.id
+        """
+    )
+    op.create_index(
+        "uq_analysis_jobs_queued_user_id",
+        "analysis_jobs",
+        ["user_id"],
+        unique=True,
+        postgresql_where=sa.text("status = 'queued'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_analysis_jobs_queued_user_id", table_name="analysis_jobs")
+    op.execute("UPDATE analysis_jobs SET status = 'dead' WHERE status = 'coalesced'")
+    op.drop_constraint("analysis_jobs_status_check", "analysis_jobs", type_="check")
+    op.create_check_constraint(
+        "analysis_jobs_status_check",
+        "analysis_jobs",
+        "status IN ('queued', 'running', 'succeeded', 'dead')",
+    )
+    op.drop_column("analysis_jobs", "coalesced_triggers")
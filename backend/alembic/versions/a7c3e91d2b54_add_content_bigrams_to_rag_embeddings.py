@@ -0,0 +1,95 @@
+"""add content_bigrams to rag_embeddings
+
+Revision ID: a7c3e91d2b54
+Revises: f13afef4765c
+Create Date: 2026-10-17 11:02:37.518204
+
+"""
+
+import re
+import unicodedata
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c3e91d2b54"
+down_revision: Union[str, None] = "f13afef4765c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+_WORD_RUN = re.compile(r"\w+")
+
+
+def _text_bigrams(text: str) -> list[str]:
+    # Frozen copy of app.services.lexical.text_bigrams at this revision
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    grams: dict[str, None] = {}
+    for run in _WORD_RUN.findall(normalized):
+        if len(run) == 1:
+            grams[run] = None
+        for i in range(len(run) - 1):
+            grams[run[i : i + 2]] = None
+    return list(grams)
+
+
+def upgrade() -> None:
+    # A constant default does not rewrite the table
+    op.add_column(
+        "rag_embeddings",
+        sa.Column(
+            "content_bigrams",
+            postgresql.ARRAY(sa.Text()),
+            server_default="{}",
+            nullable=False,
+        ),
+    )
+
+    # Backfill in short batches, each committed on its own, before the index
+    # exists so the GIN index is built once instead of updated per row.
+    rows = sa.table(
+        "rag_embeddings",
+        sa.column("id", postgresql.UUID(as_uuid=True)),
+        sa.column("content", sa.Text()),
+        sa.column("content_bigrams", postgresql.ARRAY(sa.Text())),
+    )
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        last_id = None
+        while True:
+            query = sa.select(rows.c.id, rows.c.content).order_by(rows.c.id)
+            if last_id is not None:
+                query = query.where(rows.c.id > last_id)
+            batch = connection.execute(query.limit(BATCH_SIZE)).all()
+            if not batch:
+                break
+            connection.execute(
+                sa.update(rows)
+                .where(rows.c.id == sa.bindparam("row_id"))
+                .values(content_bigrams=sa.bindparam("grams")),
+                [
+                    {"row_id": row.id, "grams": _text_bigrams(row.content)}
+                    for row in batch
+                ],
+            )
+            last_id = batch[-1].id
+
+        op.execute(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS
+                ix_rag_embeddings_content_bigrams
+            ON rag_embeddings
+            USING gin (content_bigrams)
+            """
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_rag_embeddings_content_bigrams"
+        )
+    op.drop_column("rag_embeddings", "content_bigrams")
@@ -0,0 +1,67 @@
+"""normalize rag_embeddings vectors to unit length
+
+Revision ID: b8e4a0c6d2f1
+Revises: e2b7c5d91f48
+Create Date: 2026-10-17 15:12:48.604217
+
+"""
+
+from typing import Sequence, Union
+
+import numpy as np
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "b8e4a0c6d2f1"
+down_revision: Union[str, None] = "e2b7c5d91f48"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+# Frozen copy of app.core.vector.NORM_TOLERANCE at this revision
+NORM_TOLERANCE = 1e-3
+
+
+def upgrade() -> None:
+    # Writes normalize vectors from now on; this brings older rows in line so
+    # inner-product search (<#>) ranks them like cosine distance. Only rows
+    # off unit length are rewritten, each batch in its own transaction.
+    rows = sa.table(
+        "rag_embeddings",
+        sa.column("id", postgresql.UUID(as_uuid=True)),
+        sa.column("embedding", sa.Text()),
+    )
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        last_id = None
+        while True:
+            query = sa.select(
+                rows.c.id, sa.cast(rows.c.embedding, sa.Text()).label("embedding")
+            ).order_by(rows.c.id)
+            if last_id is not None:
+                query = query.where(rows.c.id > last_id)
+            batch = connection.execute(query.limit(BATCH_SIZE)).all()
+            if not batch:
+                break
+            updates = []
+            for row in batch:
+                vector = np.array(row.embedding[1:-1].split(","), dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                if norm > 0 and abs(norm - 1) > NORM_TOLERANCE:
+                    values = ",".join("%.9g" % value for value in vector / norm)
+                    updates.append({"row_id": row.id, "vector": f"[{values}]"})
+            if updates:
+                connection.execute(
+                    sa.update(rows)
+                    .where(rows.c.id == sa.bindparam("row_id"))
+                    .values(embedding=sa.bindparam("vector")),
+                    updates,
+                )
+            last_id = batch[-1].id
+
+
+def downgrade() -> None:
+    # Original lengths are not kept; cosine search does not depend on them
+    pass
@@ -0,0 +1,32 @@
+"""add corpus_version to users
+
+Revision ID: c4d81f2a9e67
+Revises: a7c3e91d2b54
+Create Date: 2026-10-17 12:20:44.905113
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4d81f2a9e67"
+down_revision: Union[str, None] = "a7c3e91d2b54"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant default does not rewrite the table
+    op.add_column(
+        "users",
+        sa.Column(
+            "corpus_version", sa.BigInteger(), server_default="0", nullable=False
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "corpus_version")
@@ -0,0 +1,31 @@
+"""index user_answers.embedding_id
+
+Revision ID: d9343f0131be
+Revises: 0ba09524d3b8
+Create Date: 2026-10-16 10:03:21.540918
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d9343f0131be"
+down_revision: Union[str, None] = "0ba09524d3b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Used by the orphaned rag_embeddings sweep (NOT EXISTS on embedding_id)
+    op.create_index(
+        "ix_user_answers_embedding_id",
+        "user_answers",
+        ["embedding_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_answers_embedding_id", table_name="user_answers")
@@ -0,0 +1,103 @@
+"""add embedding_bits to rag_embeddings
+
+Revision ID: e2b7c5d91f48
+Revises: c4d81f2a9e67
+Create Date: 2026-10-17 14:05:12.337910
+
+"""
+
+import re
+from typing import Sequence, Union
+
+import numpy as np
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "e2b7c5d91f48"
+down_revision: Union[str, None] = "c4d81f2a9e67"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+_DIMENSIONS = re.compile(r"\((\d+)\)")
+
+
+def _binary_quantize(text: str) -> str:
+    # Frozen copy of app.core.vector.binary_quantize, reading the vector's
+    # text form ("[0.1,-0.2,...]") so halfvec columns work as well
+    signs = np.array(text[1:-1].split(","), dtype=np.float32) > 0
+    return (signs.view(np.uint8) + ord("0")).tobytes().decode("ascii")
+
+
+def _pgvector_version(connection) -> tuple[int, ...]:
+    version = connection.execute(
+        sa.text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    ).scalar_one()
+    return tuple(int(part) for part in version.split(".")[:2])
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    # Follow the embedding column, which EMBEDDING_DIMENSIONS may have shrunk
+    declared = connection.execute(
+        sa.text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = 'rag_embeddings'::regclass "
+            "AND attname = 'embedding' AND NOT attisdropped"
+        )
+    ).scalar_one()
+    dimensions = int(_DIMENSIONS.search(declared).group(1))
+    op.execute(
+        f"ALTER TABLE rag_embeddings ADD COLUMN embedding_bits bit({dimensions})"
+    )
+
+    rows = sa.table(
+        "rag_embeddings",
+        sa.column("id", postgresql.UUID(as_uuid=True)),
+        sa.column("embedding", sa.Text()),
+        sa.column("embedding_bits", sa.Text()),
+    )
+    with op.get_context().autocommit_block():
+        last_id = None
+        while True:
+            query = sa.select(
+                rows.c.id, sa.cast(rows.c.embedding, sa.Text()).label("embedding")
+            ).order_by(rows.c.id)
+            if last_id is not None:
+                query = query.where(rows.c.id > last_id)
+            batch = connection.execute(query.limit(BATCH_SIZE)).all()
+            if not batch:
+                break
+            connection.execute(
+                sa.update(rows)
+                .where(rows.c.id == sa.bindparam("row_id"))
+                .values(embedding_bits=sa.bindparam("bits")),
+                [
+                    {"row_id": row.id, "bits": _binary_quantize(row.embedding)}
+                    for row in batch
+                ],
+            )
+            last_id = batch[-1].id
+
+        # HNSW on bit columns arrived in pgvector 0.7.0. Without it the
+        # binary search mode scans the user's signatures instead.
+        if _pgvector_version(connection) >= (0, 7):
+            op.execute(
+                """
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS
+                    ix_rag_embeddings_embedding_bits_hnsw
+                ON rag_embeddings
+                USING hnsw (embedding_bits bit_hamming_ops)
+                WITH (m = 16, ef_construction = 64)
+                """
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_rag_embeddings_embedding_bits_hnsw"
+        )
+    op.drop_column("rag_embeddings", "embedding_bits")
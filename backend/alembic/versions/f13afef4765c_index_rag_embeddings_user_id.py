@@ -0,0 +1,33 @@
+"""index rag_embeddings.user_id
+
+Revision ID: f13afef4765c
+Revises: 61fb0314dc36
+Create Date: 2026-10-17 10:15:52.804127
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f13afef4765c"
+down_revision: Union[str, None] = "61fb0314dc36"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Serves the per-user corpus size check and the exact search path
+    with op.get_context().autocommit_block():
+        op.execute(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_rag_embeddings_user_id
+            ON rag_embeddings (user_id)
+            """
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_rag_embeddings_user_id")
@@ -1,4 +1,6 @@
+import asyncio
 import os
+import weakref
 
 import openai
 from dotenv import load_dotenv
@@ -7,3 +9,35 @@ load_dotenv()
 
 api_key = os.getenv("OPENAI_API_KEY")
 client = openai.OpenAI(api_key=api_key)
+async_client = openai.AsyncOpenAI(api_key=api_key)
+
+
+def create_async_client() -> openai.AsyncOpenAI:
+    """
+    Returns a new async client, for code that runs its own short-lived event
+    loop (asyncio.run). async_client's connection pool is bound to the first
+    loop that uses it and fails once that loop is closed; close the returned
+    client (async with) before its loop ends.
+    """
+    return openai.AsyncOpenAI(api_key=api_key)
+
+
+# Maximum number of in-flight requests made through async_client per event loop
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "256"))
+
+_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_async_semaphore() -> asyncio.Semaphore:
+    """
+    Returns the semaphore bounding concurrent OpenAI requests on the running loop.
+
+    Semaphores are tied to the event loop that first waits on them, so one is
+    kept per loop (tests and workers may run several loops in one process).
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
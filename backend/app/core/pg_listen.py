@@ -0,0 +1,92 @@
+"""
+Background LISTEN connection for Postgres NOTIFY channels.
+
+Used to hear about writes made by other processes (web workers, the
+analysis worker, CLI scripts): each process keeps one connection per
+channel, read by a daemon thread.
+"""
+
+import logging
+import os
+import select
+import threading
+import time
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+# Delay before reconnecting after a LISTEN connection failed
+PG_LISTEN_RETRY_SECONDS = float(os.getenv("PG_LISTEN_RETRY_SECONDS", "5"))
+
+
+class PgListener:
+    """
+    Calls on_notify(payload) for every NOTIFY on channel, from a background
+    thread started by start(). on_reset() is called whenever the connection
+    is lost, since notifications sent meanwhile are missed.
+    """
+
+    def __init__(
+        self,
+        engine,
+        channel: str,
+        on_notify: Callable[[str], None],
+        on_reset: Callable[[], None] | None = None,
+    ):
+        self._engine = engine
+        self.channel = channel
+        self._on_notify = on_notify
+        self._on_reset = on_reset
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._connected = threading.Event()
+
+    @property
+    def connected(self) -> bool:
+        """
+        Whether LISTEN is in effect, i.e. every notification from now on will
+        be delivered (until on_reset is called).
+        """
+        return self._connected.is_set()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"listen-{self.channel}", daemon=True
+                )
+                self._thread.start()
+
+    def wait_connected(self, timeout: float | None = None) -> bool:
+        self.start()
+        return self._connected.wait(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception(f"LISTEN {self.channel} connection failed")
+            self._connected.clear()
+            if self._on_reset is not None:
+                self._on_reset()
+            time.sleep(PG_LISTEN_RETRY_SECONDS)
+
+    def _listen(self):
+        # A connection of its own, taken out of the pool for good
+        proxy = self._engine.raw_connection()
+        connection = proxy.driver_connection
+        proxy.detach()
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            self._connected.set()
+            while True:
+                # The timeout only bounds how long a dead socket goes unnoticed
+                select.select([connection], [], [], 60)
+                connection.poll()
+                while connection.notifies:
+                    self._on_notify(connection.notifies.pop(0).payload)
+        finally:
+            proxy.close()
@@ -0,0 +1,177 @@
+"""
+pgvector column types with a faster bind path, and the embedding storage
+settings.
+
+psycopg2 sends every parameter as text, so pgvector's binary format cannot be
+used through it. What can be made cheap is producing the text literal: the
+stock processor formats each element through Python-level str(float(v)),
+about 2 ms per 1536-dim vector. Here the whole vector is formatted with one
+%-format call, and "%.9g" round-trips float32 exactly.
+"""
+
+import os
+from functools import lru_cache
+
+import numpy as np
+from pgvector import HalfVector as _PgHalfVectorValue
+from pgvector.sqlalchemy import HALFVEC as _PgHalfVector
+from pgvector.sqlalchemy import Vector as _PgVector
+
+# Embedding storage. text-embedding-3 models can return shortened vectors
+# (the API's dimensions parameter), and pgvector 0.7.0+ can store them in half
+# precision ("halfvec"). Changing either setting on an existing database needs
+# app/scripts/migrate_embedding_storage.py.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector")
+
+_STORAGE_TYPES = {"vector", "halfvec"}
+if EMBEDDING_STORAGE not in _STORAGE_TYPES:
+    raise ValueError(f"Invalid EMBEDDING_STORAGE: {EMBEDDING_STORAGE}")
+
+# Distance operator used for search and its HNSW index. Stored vectors are
+# unit length (normalized at write time), so "inner_product" (<#>) ranks
+# exactly like "cosine" (<=>) without normalizing both operands on every
+# comparison. Switching needs app/scripts/migrate_embedding_storage.py to
+# rebuild the index.
+VECTOR_SEARCH_METRIC = os.getenv("VECTOR_SEARCH_METRIC", "cosine")
+
+_METRICS = {"cosine": "cosine", "inner_product": "ip"}
+if VECTOR_SEARCH_METRIC not in _METRICS:
+    raise ValueError(f"Invalid VECTOR_SEARCH_METRIC: {VECTOR_SEARCH_METRIC}")
+
+# Stored vectors further than this from unit length are re-normalized by the
+# migration (float32 and halfvec rounding stay well inside it)
+NORM_TOLERANCE = 1e-3
+
+
+@lru_cache(maxsize=8)
+def _literal_format(dimensions: int) -> str:
+    return "[" + ",".join(["%.9g"] * dimensions) + "]"
+
+
+def to_vector_literal(value, dimensions: int | None = None) -> str | None:
+    """
+    Formats a list or NumPy array as a pgvector text literal.
+    """
+    if value is None:
+        return None
+    array = np.asarray(value, dtype=np.float32)
+    if array.ndim != 1:
+        raise ValueError("expected a one-dimensional vector")
+    if dimensions is not None and array.shape[0] != dimensions:
+        raise ValueError(f"expected {dimensions} dimensions, not {array.shape[0]}")
+    return _literal_format(array.shape[0]) % tuple(array.tolist())
+
+
+class Vector(_PgVector):
+    """
+    Drop-in replacement for pgvector.sqlalchemy.Vector. Accepts lists and
+    NumPy arrays (e.g. float32 buffers decoded from base64 embeddings).
+    """
+
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        def process(value):
+            return to_vector_literal(value, self.dim)
+
+        return process
+
+    def literal_processor(self, dialect):
+        string_literal_processor = self._string._cached_literal_processor(dialect)
+
+        def process(value):
+            return string_literal_processor(to_vector_literal(value, self.dim))
+
+        return process
+
+
+class HalfVector(_PgHalfVector):
+    """
+    halfvec counterpart of Vector. The text literal is the same; the server
+    rounds each element to half precision. Values are read back as float32
+    arrays, like Vector's.
+    """
+
+    cache_ok = True
+
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            if value is None:
+                return None
+            return _PgHalfVectorValue.from_text(value).to_numpy().astype(np.float32)
+
+        return process
+
+    def bind_processor(self, dialect):
+        def process(value):
+            return to_vector_literal(value, self.dim)
+
+        return process
+
+    def literal_processor(self, dialect):
+        string_literal_processor = self._string._cached_literal_processor(dialect)
+
+        def process(value):
+            return string_literal_processor(to_vector_literal(value, self.dim))
+
+        return process
+
+
+def embedding_type(
+    storage: str = EMBEDDING_STORAGE, dimensions: int = EMBEDDING_DIMENSIONS
+):
+    """
+    Column type for stored embeddings under the given storage settings.
+    """
+    if storage == "halfvec":
+        return HalfVector(dimensions)
+    return Vector(dimensions)
+
+
+def distance_ops(
+    storage: str = EMBEDDING_STORAGE, metric: str = VECTOR_SEARCH_METRIC
+) -> str:
+    """
+    HNSW operator class for the metric on the storage type.
+    """
+    return f"{storage}_{_METRICS[metric]}_ops"
+
+
+def normalize_embedding(vector) -> np.ndarray:
+    """
+    Returns the vector scaled to unit length as float32.
+
+    Raises:
+        ValueError: If the vector has non-finite elements or zero length,
+            which no embedding model returns.
+    """
+    array = np.asarray(vector, dtype=np.float32)
+    if not np.isfinite(array).all():
+        raise ValueError("Embedding has non-finite elements")
+    norm = np.linalg.norm(array)
+    if norm == 0:
+        raise ValueError("Embedding has zero length")
+    return array / norm
+
+
+def shorten_embedding(vector, dimensions: int) -> np.ndarray:
+    """
+    Truncates a text-embedding-3 vector to its first dimensions elements and
+    re-normalizes it. For these models this is equivalent to requesting the
+    shorter size through the API's dimensions parameter, so stored vectors can
+    be converted without re-embedding.
+    """
+    shortened = np.asarray(vector, dtype=np.float32)[:dimensions]
+    norm = np.linalg.norm(shortened)
+    return shortened / norm if norm > 0 else shortened
+
+
+def binary_quantize(vector) -> str:
+    """
+    One bit per element, set where the element is positive, as a bit string
+    literal ("1011..."). Hamming distance between these signatures tracks the
+    angle between the vectors, which makes them a compact prefilter.
+    """
+    signs = np.asarray(vector, dtype=np.float32) > 0
+    return (signs.view(np.uint8) + ord("0")).tobytes().decode("ascii")
@@ -1,9 +1,15 @@
 import uuid
+from datetime import datetime, timedelta, timezone
 
-from sqlalchemy.orm import Session
+from sqlalchemy import case, delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
 
 from . import models, schemas
 from .core import security
+from .core.vector import EMBEDDING_DIMENSIONS, binary_quantize, normalize_embedding
+from .services import job_events, lexical, vector_index
 
 
 def get_user_by_email(db: Session, email: str):
@@ -21,6 +27,19 @@ def create_user(db: Session, user: schemas.UserRegister):
     return db_user
 
 
+def _validated_embedding(embedding):
+    """
+    Checks the embedding's dimensions and returns it scaled to unit length.
+    Stored vectors are unit length, so searches can rank by inner product.
+    """
+    if len(embedding) != EMBEDDING_DIMENSIONS:
+        raise ValueError(
+            f"Embedding dimension mismatch: expected {EMBEDDING_DIMENSIONS}, "
+            f"got {len(embedding)}"
+        )
+    return normalize_embedding(embedding)
+
+
 def create_rag_embedding(
     db: Session,
     user_id: uuid.UUID,
@@ -30,28 +49,145 @@ def create_rag_embedding(
     question_id: uuid.UUID | None = None,
     weight: float = 1.0,
 ):
-    if len(embedding) != 1536:
-        raise ValueError(
-            f"Embedding dimension mismatch: expected 1536, got {len(embedding)}"
-        )
+    embedding = _validated_embedding(embedding)
     db_item = models.RagEmbedding(
         user_id=user_id,
         content=content,
+        content_bigrams=lexical.text_bigrams(content),
         embedding=embedding,
+        embedding_bits=binary_quantize(embedding),
         source_type=source_type,
         question_id=question_id,
         weight=weight,
     )
     db.add(db_item)
+    mark_corpus_changed(db, user_id)
     db.commit()
     db.refresh(db_item)
     return db_item
 
 
+def mark_corpus_changed(db: Session, *user_ids: uuid.UUID):
+    """
+    Records a write to the users' rag_embeddings rows: bumps their
+    corpus_version in the current transaction and drops their in-memory
+    vector indexes. Every writer of rag_embeddings must call this.
+    """
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if not user_ids:
+        return
+    db.execute(
+        update(models.User)
+        .where(models.User.id.in_(user_ids))
+        .values(corpus_version=models.User.corpus_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    vector_index.invalidate_on_commit(db, *user_ids)
+
+
+def get_corpus_version(db: Session, user_id: uuid.UUID) -> int | None:
+    return db.execute(
+        select(models.User.corpus_version).where(models.User.id == user_id)
+    ).scalar_one_or_none()
+
+
+def get_cached_embeddings(
+    db: Session, model: str, dimensions: int, content_hashes: set[str]
+):
+    """
+    Returns {content_hash: embedding} for cached entries of the model at the
+    given output dimensions and marks them as used.
+    """
+    if not content_hashes:
+        return {}
+    rows = db.execute(
+        select(
+            models.EmbeddingCache.content_hash, models.EmbeddingCache.embedding
+        ).filter(
+            models.EmbeddingCache.model == model,
+            models.EmbeddingCache.dimensions == dimensions,
+            models.EmbeddingCache.content_hash.in_(content_hashes),
+        )
+    ).all()
+    cached = {row.content_hash: row.embedding.tolist() for row in rows}
+    if cached:
+        db.execute(
+            update(models.EmbeddingCache)
+            .filter(
+                models.EmbeddingCache.model == model,
+                models.EmbeddingCache.dimensions == dimensions,
+                models.EmbeddingCache.content_hash.in_(cached.keys()),
+            )
+            .values(
+                hit_count=models.EmbeddingCache.hit_count + 1,
+                last_used_at=func.now(),
+            )
+        )
+        db.commit()
+    return cached
+
+
+def create_cached_embeddings(
+    db: Session, model: str, dimensions: int, embeddings: dict[str, list[float]]
+):
+    """
+    Stores {content_hash: embedding} entries, keeping existing ones on conflict.
+    """
+    if not embeddings:
+        return
+    stmt = (
+        insert(models.EmbeddingCache)
+        .values(
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "model": model,
+                    "dimensions": dimensions,
+                    "content_hash": content_hash,
+                    "embedding": embedding,
+                    "hit_count": 0,
+                }
+                for content_hash, embedding in embeddings.items()
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=["model", "dimensions", "content_hash"])
+    )
+    db.execute(stmt)
+    db.commit()
+
+
+def evict_embedding_cache(db: Session, max_age: timedelta, max_entries: int) -> int:
+    """
+    Deletes entries unused for longer than max_age, then the least recently
+    used entries beyond max_entries. Returns the number of deleted rows.
+    """
+    cutoff = datetime.now(timezone.utc) - max_age
+    deleted = db.execute(
+        delete(models.EmbeddingCache).filter(
+            models.EmbeddingCache.last_used_at < cutoff
+        )
+    ).rowcount
+
+    overflow = (
+        select(models.EmbeddingCache.id)
+        .order_by(models.EmbeddingCache.last_used_at.desc())
+        .offset(max_entries)
+    )
+    deleted += db.execute(
+        delete(models.EmbeddingCache).filter(models.EmbeddingCache.id.in_(overflow))
+    ).rowcount
+    db.commit()
+    return deleted
+
+
 def get_questions(db: Session):
     return db.query(models.Question).order_by(models.Question.display_order).all()
 
 
+def get_questions_by_ids(db: Session, question_ids: set[uuid.UUID]):
+    return db.query(models.Question).filter(models.Question.id.in_(question_ids)).all()
+
+
 def create_user_answer(
     db: Session,
     user_id: uuid.UUID,
@@ -88,6 +224,127 @@ def create_user_answer(
     return db_answer
 
 
+def bulk_create_rag_embeddings(db: Session, items: list[dict]) -> list[uuid.UUID]:
+    """
+    Inserts several RagEmbedding rows with one statement. Each item holds the
+    create_rag_embedding keyword arguments (user_id, content, embedding, ...).
+    Does not commit, so it can share a transaction with other writes.
+    Returns the new ids in item order.
+    """
+    if not items:
+        return []
+    rows = []
+    for item in items:
+        embedding = _validated_embedding(item["embedding"])
+        rows.append(
+            {
+                "id": uuid.uuid4(),
+                "source_type": "memo",
+                "question_id": None,
+                "weight": 1.0,
+                "content_bigrams": lexical.text_bigrams(item["content"]),
+                **item,
+                "embedding": embedding,
+                "embedding_bits": binary_quantize(embedding),
+            }
+        )
+    db.execute(insert(models.RagEmbedding).values(rows))
+    mark_corpus_changed(db, *{row["user_id"] for row in rows})
+    return [row["id"] for row in rows]
+
+
+def delete_rag_embeddings_by_source(
+    db: Session, user_id: uuid.UUID, source_id: uuid.UUID
+) -> int:
+    """
+    Deletes the chunk rows of one text of the user. Does not commit.
+    Returns the number of deleted rows.
+    """
+    result = db.execute(
+        delete(models.RagEmbedding).where(
+            models.RagEmbedding.user_id == user_id,
+            models.RagEmbedding.source_id == source_id,
+        )
+    )
+    mark_corpus_changed(db, user_id)
+    return result.rowcount
+
+
+def bulk_update_rag_embeddings(db: Session, user_id: uuid.UUID, items: list[dict]):
+    """
+    Updates several RagEmbedding rows of a user in place. Each item holds the
+    row id and the columns to change. Does not commit.
+    """
+    if not items:
+        return
+    rows = []
+    for item in items:
+        if "content" in item:
+            item = {**item, "content_bigrams": lexical.text_bigrams(item["content"])}
+        if "embedding" in item:
+            embedding = _validated_embedding(item["embedding"])
+            item = {
+                **item,
+                "embedding": embedding,
+                "embedding_bits": binary_quantize(embedding),
+            }
+        rows.append(item)
+    db.execute(update(models.RagEmbedding), rows)
+    mark_corpus_changed(db, user_id)
+
+
+def update_rag_embedding(
+    db: Session,
+    rag_embedding: models.RagEmbedding,
+    content: str,
+    embedding: list[float],
+    weight: float | None = None,
+):
+    embedding = _validated_embedding(embedding)
+    rag_embedding.content = content
+    rag_embedding.content_bigrams = lexical.text_bigrams(content)
+    rag_embedding.embedding = embedding
+    rag_embedding.embedding_bits = binary_quantize(embedding)
+    if weight is not None:
+        rag_embedding.weight = weight
+    mark_corpus_changed(db, rag_embedding.user_id)
+    db.commit()
+    db.refresh(rag_embedding)
+    return rag_embedding
+
+
+def bulk_upsert_user_answers(db: Session, user_id: uuid.UUID, items: list[dict]):
+    """
+    Inserts or updates several answers of a user with one
+    INSERT ... ON CONFLICT (user_id, question_id) DO UPDATE ... RETURNING.
+    Each item holds question_id, answer_text and embedding_id; question ids
+    must be unique. Does not commit. Returns the resulting UserAnswer rows.
+    """
+    if not items:
+        return []
+    stmt = insert(models.UserAnswer).values(
+        [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "question_id": item["question_id"],
+                "answer_text": item["answer_text"],
+                "embedding_id": item.get("embedding_id"),
+            }
+            for item in items
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "question_id"],
+        set_={
+            "answer_text": stmt.excluded.answer_text,
+            "embedding_id": stmt.excluded.embedding_id,
+            "updated_at": func.now(),
+        },
+    ).returning(models.UserAnswer)
+    return list(db.scalars(stmt, execution_options={"populate_existing": True}).all())
+
+
 def get_user_answers(db: Session, user_id: uuid.UUID):
     from sqlalchemy.orm import joinedload
 
@@ -99,6 +356,19 @@ def get_user_answers(db: Session, user_id: uuid.UUID):
     )
 
 
+def get_user_answers_by_questions(
+    db: Session, user_id: uuid.UUID, question_ids: set[uuid.UUID]
+):
+    return (
+        db.query(models.UserAnswer)
+        .filter(
+            models.UserAnswer.user_id == user_id,
+            models.UserAnswer.question_id.in_(question_ids),
+        )
+        .all()
+    )
+
+
 def get_user_answer_by_question(
     db: Session, user_id: uuid.UUID, question_id: uuid.UUID
 ):
@@ -132,11 +402,58 @@ def update_user_answer(
     return answer
 
 
+def delete_orphaned_rag_embeddings(
+    db: Session, batch_size: int, min_age: timedelta
+) -> tuple[int, int]:
+    """
+    Deletes one batch of answer embeddings ('episode' rows) that no UserAnswer
+    references any more. Rows younger than min_age are kept, because the
+    single-answer update path creates the embedding before linking it.
+    Returns (deleted rows, bytes of row data reclaimed).
+    """
+    result = db.execute(
+        text(
+            """
+            WITH doomed AS (
+                SELECT r.id
+                FROM rag_embeddings r
+                WHERE r.source_type = 'episode'
+                  AND r.created_at < :cutoff
+                  AND NOT EXISTS (
+                      SELECT 1 FROM user_answers a WHERE a.embedding_id = r.id
+                  )
+                LIMIT :batch_size
+                FOR UPDATE SKIP LOCKED
+            )
+            DELETE FROM rag_embeddings r
+            USING doomed
+            WHERE r.id = doomed.id
+            RETURNING r.user_id, pg_column_size(r.*)
+            """
+        ),
+        {
+            "cutoff": datetime.now(timezone.utc) - min_age,
+            "batch_size": batch_size,
+        },
+    )
+    rows = result.all()
+    mark_corpus_changed(db, *{row.user_id for row in rows})
+    db.commit()
+    return len(rows), sum(row[1] for row in rows)
+
+
 def create_analysis_result(
-    db: Session, user_id: uuid.UUID, analysis_type: str, result_data: dict
+    db: Session,
+    user_id: uuid.UUID,
+    analysis_type: str,
+    result_data: dict,
+    input_fingerprint: str | None = None,
 ):
     db_result = models.AnalysisResult(
-        user_id=user_id, analysis_type=analysis_type, result_data=result_data
+        user_id=user_id,
+        analysis_type=analysis_type,
+        result_data=result_data,
+        input_fingerprint=input_fingerprint,
     )
     db.add(db_result)
     db.commit()
@@ -154,3 +471,242 @@ def get_analysis_result(db: Session, user_id: uuid.UUID, analysis_type: str):
         .order_by(models.AnalysisResult.created_at.desc())
         .first()
     )
+
+
+def _notify_job_change(db: Session, user_ids) -> None:
+    # Wakes status long-polls of the users (see app.services.job_events).
+    # NOTIFY is delivered on commit, and only once per payload and transaction.
+    for user_id in set(user_ids):
+        db.execute(select(func.pg_notify(job_events.CHANNEL, str(user_id))))
+
+
+def enqueue_analysis_job(
+    db: Session,
+    user_id: uuid.UUID,
+    max_attempts: int,
+    delay: timedelta,
+    max_delay: timedelta,
+) -> models.AnalysisJob:
+    """
+    Queues an analysis for the user to run after delay. If the user already
+    has a queued job, that job absorbs the trigger instead: its run_after is
+    pushed to now + delay, but no further than max_delay after it was
+    queued, and its coalesced_triggers count goes up. Commits.
+    """
+    queued = models.AnalysisJob
+    stmt = (
+        insert(models.AnalysisJob)
+        .values(
+            user_id=user_id,
+            max_attempts=max_attempts,
+            run_after=func.now() + delay,
+        )
+        .on_conflict_do_update(
+            index_elements=[queued.user_id],
+            index_where=queued.status == "queued",
+            set_={
+                "run_after": func.least(
+                    func.now() + delay, queued.created_at + max_delay
+                ),
+                "coalesced_triggers": queued.coalesced_triggers + 1,
+            },
+        )
+        .returning(models.AnalysisJob)
+        .execution_options(populate_existing=True)
+    )
+    job = db.scalars(stmt).one()
+    _notify_job_change(db, [job.user_id])
+    db.commit()
+    return job
+
+
+def claim_analysis_job(db: Session, worker_id: str) -> models.AnalysisJob | None:
+    """
+    Marks the oldest due queued job as running for worker_id and returns it,
+    or None if no job is due. Rows being claimed by other workers are skipped
+    (FOR UPDATE SKIP LOCKED), so concurrent workers never take the same job.
+    A user's job waits while another of their jobs is running, so analyses
+    of one user never overlap. Does not commit; the caller commits to publish
+    the claim.
+    """
+    running = aliased(models.AnalysisJob)
+    due = (
+        select(models.AnalysisJob.id)
+        .filter(
+            models.AnalysisJob.status == "queued",
+            models.AnalysisJob.run_after <= func.now(),
+            ~select(running.id)
+            .where(
+                running.user_id == models.AnalysisJob.user_id,
+                running.status == "running",
+            )
+            .exists(),
+        )
+        .order_by(models.AnalysisJob.run_after)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    job = db.scalars(
+        update(models.AnalysisJob)
+        .where(models.AnalysisJob.id == due)
+        .values(
+            status="running",
+            attempts=models.AnalysisJob.attempts + 1,
+            locked_by=worker_id,
+            locked_at=func.now(),
+            started_at=func.now(),
+        )
+        .returning(models.AnalysisJob)
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+    if job is not None:
+        _notify_job_change(db, [job.user_id])
+    return job
+
+
+def _requeued_status():
+    """
+    "queued", or "coalesced" when the user already has another queued job,
+    which will run the analysis anyway (one queued job per user).
+    """
+    other = aliased(models.AnalysisJob)
+    pending = (
+        select(other.id)
+        .where(
+            other.user_id == models.AnalysisJob.user_id,
+            other.status == "queued",
+            other.id != models.AnalysisJob.id,
+        )
+        .exists()
+    )
+    return case((pending, "coalesced"), else_="queued")
+
+
+def _execute_requeue(db: Session, stmt) -> list:
+    """
+    Executes an UPDATE using _requeued_status and returns its rows.
+    enqueue_analysis_job may queue a job for the same user after the
+    statement's snapshot was taken; requeueing then violates the one queued
+    job per user index. The statement is run again in that case, and sees
+    the new job and coalesces into it.
+    """
+    while True:
+        try:
+            with db.begin_nested():
+                return db.execute(stmt).all()
+        except IntegrityError as e:
+            constraint = getattr(getattr(e.orig, "diag", None), "constraint_name", None)
+            if constraint != "uq_analysis_jobs_queued_user_id":
+                raise
+
+
+def finish_analysis_job(
+    db: Session,
+    job_id: uuid.UUID,
+    worker_id: str,
+    status: str,
+    error: str | None = None,
+    run_after: datetime | None = None,
+) -> bool:
+    """
+    Records the outcome of a run: "succeeded", "dead", or "queued" again with
+    run_after for a retry (see _requeued_status and _execute_requeue). Only
+    applies while worker_id still holds the job; after an expired lease
+    another worker may own it. Returns whether the job was updated.
+    """
+    values = {"status": status, "locked_by": None, "locked_at": None}
+    if error is not None:
+        values["last_error"] = error
+    if status == "queued":
+        values["status"] = _requeued_status()
+        values["run_after"] = run_after or func.now()
+        values["finished_at"] = case(
+            (values["status"] == "coalesced", func.now()), else_=None
+        )
+    else:
+        values["finished_at"] = func.now()
+    rows = _execute_requeue(
+        db,
+        update(models.AnalysisJob)
+        .where(
+            models.AnalysisJob.id == job_id,
+            models.AnalysisJob.status == "running",
+            models.AnalysisJob.locked_by == worker_id,
+        )
+        .values(**values)
+        .returning(models.AnalysisJob.user_id)
+        .execution_options(synchronize_session=False),
+    )
+    user_ids = [row.user_id for row in rows]
+    _notify_job_change(db, user_ids)
+    db.commit()
+    return len(user_ids) == 1
+
+
+def release_expired_analysis_jobs(db: Session, lease: timedelta) -> int:
+    """
+    Takes back jobs that have been running for longer than lease, i.e. whose
+    worker died or was killed mid-run. They are queued again (see
+    _requeued_status), or moved to "dead" when no attempts are left. Returns
+    the number of jobs released.
+    """
+    exhausted = models.AnalysisJob.attempts >= models.AnalysisJob.max_attempts
+    status = case((exhausted, "dead"), else_=_requeued_status())
+    rows = _execute_requeue(
+        db,
+        update(models.AnalysisJob)
+        .where(
+            models.AnalysisJob.status == "running",
+            models.AnalysisJob.locked_at < func.now() - lease,
+        )
+        .values(
+            status=status,
+            finished_at=case((status == "queued", None), else_=func.now()),
+            locked_by=None,
+            locked_at=None,
+            last_error="Worker lease expired",
+        )
+        .returning(models.AnalysisJob.user_id)
+        .execution_options(synchronize_session=False),
+    )
+    user_ids = [row.user_id for row in rows]
+    _notify_job_change(db, user_ids)
+    db.commit()
+    return len(user_ids)
+
+
+def get_current_analysis_job(
+    db: Session, user_id: uuid.UUID
+) -> models.AnalysisJob | None:
+    """
+    The job describing the state of the user's analysis: the running one,
+    else the queued one, else the most recently created finished one.
+    Coalesced jobs are left out; the job that absorbed them stands for them.
+    """
+    pending_first = case(
+        (models.AnalysisJob.status == "running", 0),
+        (models.AnalysisJob.status == "queued", 1),
+        else_=2,
+    )
+    return db.scalars(
+        select(models.AnalysisJob)
+        .where(
+            models.AnalysisJob.user_id == user_id,
+            models.AnalysisJob.status != "coalesced",
+        )
+        .order_by(pending_first, models.AnalysisJob.created_at.desc())
+        .limit(1)
+        .execution_options(populate_existing=True)
+    ).first()
+
+
+def get_saved_analysis_count(db: Session, since: datetime | None = None) -> int:
+    """
+    Number of analysis triggers coalesced into another job, i.e. LLM analyses
+    saved, optionally counting jobs created since a given time only.
+    """
+    stmt = select(func.coalesce(func.sum(models.AnalysisJob.coalesced_triggers), 0))
+    if since is not None:
+        stmt = stmt.where(models.AnalysisJob.created_at >= since)
+    return db.execute(stmt).scalar_one()
@@ -1,20 +1,67 @@
+import hashlib
+import os
+import time
 from typing import Annotated
 
-from app import crud, models
+from app import crud, models, schemas
 from app.core import security
-from app.database import get_db
+from app.core.cache import TTLCache
+from app.core.pg_listen import PgListener
+from app.database import engine, get_db
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Authenticated users, keyed by (sub, token hash). Entries never outlive the
+# token's exp claim. Set the size to 0 to disable the cache.
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "300"))
+
+user_cache = TTLCache(maxsize=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL_SECONDS)
+
+
+def _token_key(email: str, token: str) -> tuple[str, str]:
+    return email, hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def invalidate_user(email: str) -> int:
+    """
+    Drops every cached session of the user. Returns the number of entries.
+    """
+    return user_cache.discard_where(lambda key, _: key[0] == email)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    # Immediate for ORM writes in this process; user_events covers the rest
+    invalidate_user(target.email)
+    # The email itself may have changed; drop sessions cached under the old one
+    for old_email in inspect(target).attrs.email.history.deleted or ():
+        invalidate_user(old_email)
+
+
+# Every change to a users row, by any process or statement, is announced by a
+# trigger (see models.USERS_CHANGED_CHANNEL) with the old email as payload.
+# Logins are only cached while this listener is connected, and the whole cache
+# is dropped when it disconnects, since notifications may have been missed.
+user_events = PgListener(
+    engine,
+    models.USERS_CHANGED_CHANNEL,
+    invalidate_user,
+    on_reset=user_cache.clear,
+)
+
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: Annotated[Session, Depends(get_db)],
-) -> models.User:
+) -> schemas.CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -30,7 +77,22 @@ async def get_current_user(
     except JWTError as exc:
         raise credentials_exception from exc
 
-    user = crud.get_user_by_email(db, email=email)
+    # Hot sessions skip the database lookup
+    token_key = _token_key(email, token)
+    cached_user = user_cache.get(token_key)
+    if cached_user is not None:
+        return cached_user
+
+    # The session is synchronous; run the lookup in the threadpool so a slow
+    # database round-trip does not block the event loop.
+    user = await run_in_threadpool(crud.get_user_by_email, db, email=email)
     if user is None:
         raise credentials_exception
-    return user
+
+    current_user = schemas.CurrentUser.model_validate(user)
+    expires_in = payload.get("exp", 0) - time.time()
+    ttl = min(AUTH_USER_CACHE_TTL_SECONDS, expires_in)
+    user_events.start()
+    if ttl > 0 and user_events.connected:
+        user_cache.set(token_key, current_user, ttl=ttl)
+    return current_user
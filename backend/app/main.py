@@ -1,8 +1,8 @@
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 
-from . import crud, models, schemas
+from . import schemas
 from .database import get_db
 from .dependencies.auth import get_current_user
 from .routers import auth, chat, episodes, questionnaire
@@ -40,17 +40,19 @@ def read_health():
 @app.post("/memos")
 def create_memo(
     memo: schemas.MemoCreate,
-    current_user: models.User = Depends(get_current_user),  # noqa: B008
+    current_user: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
     db: Session = Depends(get_db),  # noqa: B008
 ):
-    # 1. Generate Embedding
-    from app.services.embedding import get_embedding
-
-    embedding = get_embedding(memo.text)
-
-    # 2. Save to DB
-    crud.create_rag_embedding(
-        db, current_user.id, memo.text, embedding, source_type="memo"
-    )
-
-    return {"status": "success", "message": "Memo saved successfully"}
+    # Long memos are stored as several chunks sharing a source_id
+    from app.services.ingest import ingest_text
+
+    if not memo.text.strip():
+        raise HTTPException(status_code=422, detail="Memo content cannot be empty")
+    source_id, chunk_ids = ingest_text(db, current_user.id, memo.text)
+
+    return {
+        "status": "success",
+        "message": "Memo saved successfully",
+        "source_id": str(source_id),
+        "chunks": len(chunk_ids),
+    }
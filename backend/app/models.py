@@ -1,23 +1,29 @@
 import uuid
 
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import BIT
 from sqlalchemy import (
     ARRAY,
+    DDL,
     JSON,
+    BigInteger,
     Boolean,
     CheckConstraint,
     Column,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     Text,
     UniqueConstraint,
+    event,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
+from .core.vector import EMBEDDING_DIMENSIONS, distance_ops, embedding_type
 from .database import Base
 
 
@@ -34,6 +40,9 @@ class User(Base):
     major = Column(Text)
     desired_roles = Column(ARRAY(Text))
     job_axis_raw = Column(Text)
+    # Bumped on every write to the user's rag_embeddings rows; keys the
+    # retrieval result cache (services/vector_search.py)
+    corpus_version = Column(BigInteger, nullable=False, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     life_events = relationship(
@@ -63,6 +72,32 @@ class User(Base):
     )
 
 
+# NOTIFY channel announcing changes to users rows, with the old email as
+# payload; drops cached logins in every process (app.dependencies.auth).
+# corpus_version bumps are not changes to the login and are left out.
+USERS_CHANGED_CHANNEL = "users_changed"
+USERS_CHANGED_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_users_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{USERS_CHANGED_CHANNEL}', OLD.email);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_updated_notify AFTER UPDATE ON users FOR EACH ROW
+WHEN (
+    (to_jsonb(OLD) - 'corpus_version') IS DISTINCT FROM
+    (to_jsonb(NEW) - 'corpus_version')
+)
+EXECUTE FUNCTION notify_users_changed();
+
+CREATE TRIGGER users_deleted_notify AFTER DELETE ON users FOR EACH ROW
+EXECUTE FUNCTION notify_users_changed();
+"""
+# Databases built with create_all (tests); migrations install the same
+event.listen(User.__table__, "after_create", DDL(USERS_CHANGED_TRIGGER_SQL))
+
+
 class EpisodeDetail(Base):
     __tablename__ = "episode_details"
 
@@ -250,8 +285,15 @@ class RagEmbedding(Base):
         nullable=False,
     )
     source_id = Column(UUID(as_uuid=True), nullable=True)
-    embedding = Column(Vector(1536), nullable=False)
+    embedding = Column(embedding_type(), nullable=False)
+    # Sign bits of embedding (core.vector.binary_quantize) for the binary
+    # prefilter search mode, filled in by EMBEDDING_BITS_TRIGGER_SQL when a
+    # writer leaves them out. Its HNSW index (bit_hamming_ops) needs pgvector
+    # 0.7.0+ and is created by the migration where available.
+    embedding_bits = Column(BIT(EMBEDDING_DIMENSIONS), nullable=True)
     content = Column(Text, nullable=False)
+    # Character bigrams of content for lexical search (services/lexical.py)
+    content_bigrams = Column(ARRAY(Text), nullable=False, server_default="{}")
     question_id = Column(
         UUID(as_uuid=True),
         ForeignKey("questions.id", ondelete="SET NULL"),
@@ -263,6 +305,75 @@ class RagEmbedding(Base):
     user = relationship("User", back_populates="rag_embeddings")
     question = relationship("Question")
 
+    __table_args__ = (
+        Index("ix_rag_embeddings_user_id", "user_id"),
+        Index(
+            "ix_rag_embeddings_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": distance_ops()},
+        ),
+        Index(
+            "ix_rag_embeddings_content_bigrams",
+            "content_bigrams",
+            postgresql_using="gin",
+        ),
+    )
+
+
+# Fills embedding_bits for writers that do not set it (e.g. an app version
+# from before the column, still running during a deploy), so the binary
+# prefilter never misses their rows. Same rule as core.vector.binary_quantize.
+# No UPDATE OF column list: it would pin the embedding column, which the
+# storage conversion drops and replaces.
+EMBEDDING_BITS_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION fill_embedding_bits() RETURNS trigger AS $$
+BEGIN
+    IF (TG_OP = 'INSERT' AND NEW.embedding_bits IS NULL)
+        OR (TG_OP = 'UPDATE'
+            AND NEW.embedding IS DISTINCT FROM OLD.embedding
+            AND NEW.embedding_bits IS NOT DISTINCT FROM OLD.embedding_bits)
+    THEN
+        NEW.embedding_bits := (
+            SELECT string_agg(CASE WHEN x > 0 THEN '1' ELSE '0' END, '' ORDER BY i)
+            FROM unnest(NEW.embedding::real[]) WITH ORDINALITY AS e(x, i)
+        )::varbit;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER rag_embeddings_fill_bits BEFORE INSERT OR UPDATE ON rag_embeddings
+FOR EACH ROW EXECUTE FUNCTION fill_embedding_bits();
+"""
+event.listen(RagEmbedding.__table__, "after_create", DDL(EMBEDDING_BITS_TRIGGER_SQL))
+
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    model = Column(Text, nullable=False)
+    # Output dimensions requested from the model (EMBEDDING_DIMENSIONS)
+    dimensions = Column(Integer, nullable=False)
+    # SHA-256 hex digest of the normalized text
+    content_hash = Column(Text, nullable=False)
+    embedding = Column(embedding_type(), nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint(
+            "model",
+            "dimensions",
+            "content_hash",
+            name="uq_embedding_cache_model_dimensions_hash",
+        ),
+        Index("ix_embedding_cache_last_used_at", "last_used_at"),
+    )
+
 
 class Question(Base):
     __tablename__ = "questions"
@@ -319,6 +430,11 @@ class UserAnswer(Base):
         # This prevents Alembic from trying to drop it
         # The name 'user_answers_user_id_question_id_key' comes from the
         # initial migration
+        UniqueConstraint(
+            "user_id", "question_id", name="user_answers_user_id_question_id_key"
+        ),
+        # Lets the orphaned-embedding sweep check references without a scan
+        Index("ix_user_answers_embedding_id", "embedding_id"),
         {"extend_existing": True},
     )
 
@@ -332,4 +448,57 @@ class AnalysisResult(Base):
     )
     analysis_type = Column(Text, nullable=False)
     result_data = Column(JSON, nullable=False)
+    # SHA-256 of the inputs the result was generated from; see
+    # app.services.analysis.answers_fingerprint
+    input_fingerprint = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    # queued -> running -> succeeded, or back to queued for a retry after
+    # run_after; "dead" once max_attempts runs have failed. A retry is
+    # "coalesced" instead when a newer queued job of the user will run anyway.
+    status = Column(
+        Text,
+        CheckConstraint(
+            "status IN ('queued', 'running', 'succeeded', 'dead', 'coalesced')"
+        ),
+        nullable=False,
+        server_default="queued",
+    )
+    attempts = Column(Integer, nullable=False, server_default="0")
+    max_attempts = Column(Integer, nullable=False)
+    run_after = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    # Worker holding the job and since when; a job running longer than the
+    # lease is taken back (services/analysis_jobs.py)
+    locked_by = Column(Text)
+    locked_at = Column(DateTime(timezone=True))
+    # Start of the latest attempt; kept after the job finishes
+    started_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    # Triggers folded into this job while it was queued, i.e. analyses (LLM
+    # calls) that did not have to run
+    coalesced_triggers = Column(Integer, nullable=False, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # Workers claim the oldest due job of a status
+        Index("ix_analysis_jobs_status_run_after", "status", "run_after"),
+        Index("ix_analysis_jobs_user_id", "user_id"),
+        # At most one queued job per user; new triggers update it instead
+        Index(
+            "uq_analysis_jobs_queued_user_id",
+            "user_id",
+            unique=True,
+            postgresql_where=text("status = 'queued'"),
+        ),
+    )
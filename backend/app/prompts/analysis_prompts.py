@@ -51,3 +51,65 @@ Ensure the output is valid JSON. Do not include any markdown formatting
 outside the JSON block if possible, but if you do, I will parse it.
 The language of the output must be **Japanese**.
 """
+
+# Map-reduce analysis (ANALYSIS_MODE=map_reduce): the answers of each question
+# category are analyzed separately and concurrently, then merged.
+
+# Display names of the questionnaire categories, used in the prompts
+CATEGORY_LABELS = {
+    "childhood": "幼少期・学校生活",
+    "student_life": "学生時代の活動",
+    "values": "価値観",
+    "future": "将来",
+}
+
+CATEGORY_ANALYSIS_SYSTEM_PROMPT = """
+You are an expert career counselor and self-analysis assistant.
+You analyze the user's answers about one theme of a questionnaire; another
+step combines the analyses of all themes.
+You must output the result in a strict JSON format.
+"""
+
+CATEGORY_ANALYSIS_PROMPT_TEMPLATE = """
+Here are the user's answers to the questions about "{category}":
+
+{q_and_a_text}
+
+Based only on these answers, provide the following in JSON format:
+
+1.  **keywords**: 2-3 keywords that represent the user in these answers.
+2.  **strengths**: 1-3 strengths shown in these answers, each with
+    `strength`, `evidence` (a quote or summary from the answers) and
+    `confidence` (0.0 to 1.0).
+3.  **values**: 1-3 values that seem important to the user here.
+4.  **summary**: A summary of what these answers reveal (about 100 Japanese
+    characters).
+
+The language of the output must be **Japanese**.
+"""
+
+MERGE_ANALYSIS_SYSTEM_PROMPT = """
+You are an expert career counselor and self-analysis assistant.
+Your task is to merge partial analyses of a user's questionnaire, one per
+theme, into a single consistent self-analysis.
+You must output the result in a strict JSON format.
+"""
+
+MERGE_ANALYSIS_PROMPT_TEMPLATE = """
+Here are analyses of the user's answers, one per theme, in JSON:
+
+{category_analyses}
+
+Merge them into one analysis of the user, in JSON format:
+
+1.  **keywords**: A list of 3-5 keywords that represent the user's
+    personality or characteristics.
+2.  **strengths**: A list of exactly 3 strengths, each with `strength`,
+    `evidence` (taken from the partial analyses) and `confidence`
+    (0.0 to 1.0). Prefer strengths supported by several themes.
+3.  **values**: A list of 3 values that seem important to the user.
+4.  **summary**: A comprehensive summary of the user's self-analysis
+    (200-300 Japanese characters).
+
+The language of the output must be **Japanese**.
+"""
@@ -1,6 +1,6 @@
 from typing import Annotated
 
-from app import crud, models, schemas
+from app import crud, schemas
 from app.core import security
 from app.database import get_db
 from app.dependencies.auth import get_current_user
@@ -56,6 +56,6 @@ def login(
 
 @router.get("/me", response_model=schemas.UserResponse)
 def read_users_me(
-    current_user: Annotated[models.User, Depends(get_current_user)],
+    current_user: Annotated[schemas.CurrentUser, Depends(get_current_user)],
 ):
     return current_user
@@ -1,17 +1,46 @@
-from app import models, schemas
+from app import schemas
 from app.database import get_db
 from app.dependencies.auth import get_current_user
+from app.services import embedding_cache, vector_search
 from app.services.answer_generation import generate_answer
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
 @router.post("/answer", response_model=schemas.GeneratedAnswer)
-def generate_chat_answer(
+async def generate_chat_answer(
     request: schemas.AnswerRequest,
-    current_user: models.User = Depends(get_current_user),  # noqa: B008
+    current_user: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
     db: Session = Depends(get_db),  # noqa: B008
 ):
-    return generate_answer(db, request.query_text, current_user.id)
+    return await generate_answer(db, request.query_text, current_user.id)
+
+
+@router.post("/search/batch", response_model=schemas.BatchSearchResponse)
+async def batch_search(
+    request: schemas.BatchSearchRequest,
+    current_user: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
+    db: Session = Depends(get_db),  # noqa: B008
+):
+    """
+    Retrieves context for several queries at once (e.g. one per question
+    category): one embeddings call and one search statement for all of them.
+    """
+    query_vecs = await embedding_cache.get_query_embeddings_async(request.queries)
+    grouped = await run_in_threadpool(
+        vector_search.batch_search,
+        db,
+        query_vecs,
+        current_user.id,
+        limit=request.limit,
+        similarity_threshold=request.similarity_threshold,
+    )
+    return schemas.BatchSearchResponse(
+        results=[
+            schemas.QuerySearchResults(query_text=query, results=results)
+            for query, results in zip(request.queries, grouped, strict=True)
+        ]
+    )
@@ -7,8 +7,10 @@ from uuid import UUID
 from app import models, schemas
 from app.database import get_db
 from app.routers.auth import get_current_user
+from app.services import llm
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter(prefix="/episodes", tags=["episodes"])
 
@@ -17,7 +19,7 @@ router = APIRouter(prefix="/episodes", tags=["episodes"])
 def create_episode_detail(
     question_id: UUID,
     episode_data: schemas.EpisodeDetailCreate,
-    current_user: models.User = Depends(get_current_user),  # noqa: B008
+    current_user: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
     db: Session = Depends(get_db),  # noqa: B008
 ):
     """Create or update episode detail for a question"""
@@ -68,7 +70,7 @@ def create_episode_detail(
 @router.get("/{question_id}", response_model=schemas.EpisodeDetailResponse)
 def get_episode_detail(
     question_id: UUID,
-    current_user: models.User = Depends(get_current_user),  # noqa: B008
+    current_user: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
     db: Session = Depends(get_db),  # noqa: B008
 ):
     """Get episode detail for a question"""
@@ -88,16 +90,14 @@ def get_episode_detail(
 
 
 @router.post("/{question_id}/feedback", response_model=schemas.AnswerFeedbackResponse)
-def get_episode_feedback(
+async def get_episode_feedback(
     question_id: UUID,
     request: schemas.EpisodeFeedbackRequest,
-    _: models.User = Depends(get_current_user),  # noqa: B008
+    _: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
     db: Session = Depends(get_db),  # noqa: B008
 ):
     """Generate AI feedback for episode detail"""
-    import openai
-
-    question = db.get(models.Question, question_id)
+    question = await run_in_threadpool(db.get, models.Question, question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
 
@@ -134,9 +134,10 @@ def get_episode_feedback(
     )
 
     try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
+        feedback_text = await llm.generate_response_async(
+            prompt,
+            model_name="gpt-3.5-turbo",
+            system_instruction=None,
             temperature=0.7,
         )
     except Exception as e:
@@ -148,8 +149,6 @@ def get_episode_feedback(
             detail="Failed to generate feedback",
         ) from e
 
-    feedback_text = response.choices[0].message.content
-
     # Extract suggestions
     suggestions = [
         line.strip("- ").strip()
@@ -166,16 +165,14 @@ def get_episode_feedback(
 
 
 @router.post("/{question_id}/summary")
-def generate_summary(
+async def generate_summary(
     question_id: UUID,
     request: schemas.EpisodeSummaryRequest,
-    _: models.User = Depends(get_current_user),  # noqa: B008
+    _: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
     db: Session = Depends(get_db),  # noqa: B008
 ):
     """Generate summary from episode detail"""
-    import openai
-
-    question = db.get(models.Question, question_id)
+    question = await run_in_threadpool(db.get, models.Question, question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
 
@@ -205,9 +202,10 @@ def generate_summary(
     )
 
     try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
+        summary = await llm.generate_response_async(
+            prompt,
+            model_name="gpt-3.5-turbo",
+            system_instruction=None,
             temperature=0.7,
         )
     except Exception as e:
@@ -219,6 +217,4 @@ def generate_summary(
             detail="Failed to generate summary",
         ) from e
 
-    summary = response.choices[0].message.content
-
     return {"summary": summary}
@@ -3,10 +3,14 @@ from uuid import UUID
 from app import crud, models, schemas
 from app.database import get_db
 from app.dependencies.auth import get_current_user
-from app.services.analysis import run_analysis_background
-from app.services.embedding import get_embedding
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from app.services import analysis_jobs, llm
+from app.services.embedding_cache import (
+    get_embedding_cached,
+    get_embeddings_cached_async,
+)
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
 
@@ -19,58 +23,125 @@ def read_questions(db: Session = Depends(get_db)):  # noqa: B008
 
 @router.get("/answers", response_model=schemas.UserAnswersResponse)
 def get_user_answers(
-    current_user: models.User = Depends(get_current_user),  # noqa: B008
+    current_user: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
     db: Session = Depends(get_db),  # noqa: B008
 ):
     answers = crud.get_user_answers(db, current_user.id)
     return {"answers": answers}
 
 
+def _save_submitted_answers(
+    db: Session,
+    user_id: UUID,
+    answers: list[schemas.UserAnswerCreate],
+    embedding_vectors: list[list[float]],
+    questions: dict[UUID, models.Question],
+):
+    # A question answered twice in one submit keeps its last answer, as with
+    # sequential saves; ON CONFLICT cannot touch the same row twice.
+    latest = {
+        answer.question_id: (answer, embedding_vector)
+        for answer, embedding_vector in zip(answers, embedding_vectors, strict=True)
+    }
+
+    # One transaction and a constant number of statements for the whole submit
+    try:
+        # Re-submitted answers overwrite their existing embedding row instead
+        # of leaving the previous vector orphaned
+        existing_embedding_ids = {
+            answer.question_id: answer.embedding_id
+            for answer in crud.get_user_answers_by_questions(
+                db, user_id, set(latest.keys())
+            )
+            if answer.embedding_id is not None
+        }
+
+        embedding_ids: dict[UUID, UUID] = {}
+        updates = []
+        inserts = []
+        for question_id, (answer, embedding_vector) in latest.items():
+            values = {
+                "content": answer.answer_text,
+                "embedding": embedding_vector,
+                "weight": questions[question_id].weight,
+            }
+            if question_id in existing_embedding_ids:
+                embedding_ids[question_id] = existing_embedding_ids[question_id]
+                updates.append({"id": embedding_ids[question_id], **values})
+            else:
+                inserts.append(
+                    {
+                        "user_id": user_id,
+                        # Using 'episode' for questionnaire answers
+                        "source_type": "episode",
+                        "question_id": question_id,
+                        **values,
+                    }
+                )
+
+        crud.bulk_update_rag_embeddings(db, user_id, updates)
+        new_ids = crud.bulk_create_rag_embeddings(db, inserts)
+        for item, embedding_id in zip(inserts, new_ids, strict=True):
+            embedding_ids[item["question_id"]] = embedding_id
+
+        crud.bulk_upsert_user_answers(
+            db,
+            user_id,
+            [
+                {
+                    "question_id": question_id,
+                    "answer_text": answer.answer_text,
+                    "embedding_id": embedding_ids[question_id],
+                }
+                for question_id, (answer, _) in latest.items()
+            ],
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
 @router.post("/answers/submit")
-def submit_answers(
+async def submit_answers(
     submit_data: schemas.UserAnswerSubmit,
-    background_tasks: BackgroundTasks,
-    current_user: models.User = Depends(get_current_user),  # noqa: B008
+    current_user: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
     db: Session = Depends(get_db),  # noqa: B008
 ):
     user_id = current_user.id
 
+    # Fetch all questions up front to get weights and fail before embedding
+    question_ids = {answer.question_id for answer in submit_data.answers}
+    questions = {
+        question.id: question
+        for question in await run_in_threadpool(
+            crud.get_questions_by_ids, db, question_ids
+        )
+    }
     for answer in submit_data.answers:
-        # Generate embedding
-        embedding_vector = get_embedding(answer.answer_text)
-
-        # Fetch question to get weight
-        # Fetch question to get weight
-        question = db.get(models.Question, answer.question_id)
-        if question is None:
+        if answer.question_id not in questions:
             # Question not found - this should be an error
             raise HTTPException(
                 status_code=404, detail=f"Question {answer.question_id} not found"
             )
-        weight = question.weight
 
-        # Create RagEmbedding
-        rag_embedding = crud.create_rag_embedding(
-            db=db,
-            user_id=user_id,
-            content=answer.answer_text,
-            embedding=embedding_vector,
-            source_type="episode",  # Using 'episode' for questionnaire answers
-            question_id=answer.question_id,
-            weight=weight,
-        )
+    # Generate all embeddings in a single batched API call (cache misses only)
+    embedding_vectors = await get_embeddings_cached_async(
+        db, [answer.answer_text for answer in submit_data.answers]
+    )
 
-        # Create UserAnswer
-        crud.create_user_answer(
-            db=db,
-            user_id=user_id,
-            question_id=answer.question_id,
-            answer_text=answer.answer_text,
-            embedding_id=rag_embedding.id,
-        )
+    # Database writes run in the threadpool to keep the event loop free
+    await run_in_threadpool(
+        _save_submitted_answers,
+        db,
+        user_id,
+        submit_data.answers,
+        embedding_vectors,
+        questions,
+    )
 
-    # Trigger analysis in background
-    background_tasks.add_task(run_analysis_background, user_id)
+    # Queue the analysis for the workers (app.workers.analysis)
+    await run_in_threadpool(analysis_jobs.enqueue_analysis, db, user_id)
 
     return {"status": "success", "message": "Answers submitted successfully"}
 
@@ -79,8 +150,7 @@ def submit_answers(
 def update_answer(
     question_id: UUID,
     answer_data: schemas.SingleAnswerUpdate,
-    background_tasks: BackgroundTasks,
-    current_user: models.User = Depends(get_current_user),  # noqa: B008
+    current_user: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
     db: Session = Depends(get_db),  # noqa: B008
 ):
     user_id = current_user.id
@@ -92,8 +162,8 @@ def update_answer(
             status_code=404, detail="Answer not found for this question"
         )
 
-    # Generate new embedding
-    embedding_vector = get_embedding(answer_data.answer_text)
+    # Generate new embedding (reused from cache when the text is unchanged)
+    embedding_vector = get_embedding_cached(db, answer_data.answer_text)
 
     # Fetch question to get weight
     question = db.get(models.Question, question_id)
@@ -106,11 +176,13 @@ def update_answer(
         # Update existing embedding
         rag_embedding = db.get(models.RagEmbedding, existing_answer.embedding_id)
         if rag_embedding:
-            rag_embedding.content = answer_data.answer_text
-            rag_embedding.embedding = embedding_vector
-            rag_embedding.weight = weight
-            db.commit()
-            db.refresh(rag_embedding)
+            rag_embedding = crud.update_rag_embedding(
+                db,
+                rag_embedding,
+                content=answer_data.answer_text,
+                embedding=embedding_vector,
+                weight=weight,
+            )
         else:
             # Create new embedding if old one doesn't exist
             rag_embedding = crud.create_rag_embedding(
@@ -143,15 +215,15 @@ def update_answer(
         embedding_id=rag_embedding.id,
     )
 
-    # Trigger analysis in background
-    background_tasks.add_task(run_analysis_background, user_id)
+    # Queue the analysis for the workers (app.workers.analysis)
+    analysis_jobs.enqueue_analysis(db, user_id)
 
     return {"status": "success", "message": "Answer updated successfully"}
 
 
 @router.get("/analysis", response_model=schemas.AnalysisResponse)
 def get_analysis(
-    current_user: models.User = Depends(get_current_user),  # noqa: B008
+    current_user: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
     db: Session = Depends(get_db),  # noqa: B008
 ):
     # Fetch analysis result
@@ -162,22 +234,38 @@ def get_analysis(
     return analysis_result.result_data
 
 
+@router.get("/analysis/status", response_model=schemas.AnalysisStatusResponse)
+async def get_analysis_status(
+    wait: float = Query(  # noqa: B008
+        0, ge=0, le=analysis_jobs.ANALYSIS_STATUS_MAX_WAIT_SECONDS
+    ),
+    current_user: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
+    db: Session = Depends(get_db),  # noqa: B008
+):
+    """
+    State of the current user's analysis. With wait, a queued or running
+    analysis is waited on for up to that many seconds (long-polling), so a
+    client needs one request per state change instead of polling /analysis.
+    """
+    if wait > 0:
+        return await analysis_jobs.wait_for_status(db, current_user.id, wait)
+    return await run_in_threadpool(analysis_jobs.get_status, db, current_user.id)
+
+
 @router.post(
     "/answers/{question_id}/feedback", response_model=schemas.AnswerFeedbackResponse
 )
-def get_answer_feedback(
+async def get_answer_feedback(
     question_id: UUID,
     request: schemas.AnswerFeedbackRequest,
-    _: models.User = Depends(get_current_user),  # noqa: B008
+    _: schemas.CurrentUser = Depends(get_current_user),  # noqa: B008
     db: Session = Depends(get_db),  # noqa: B008
 ):
     """
     回答に対するAIフィードバックを生成
     """
-    import openai
-
     # Fetch question
-    question = db.get(models.Question, question_id)
+    question = await run_in_threadpool(db.get, models.Question, question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
 
@@ -196,9 +284,10 @@ def get_answer_feedback(
     )
     try:
         # Call OpenAI API
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
+        feedback_text = await llm.generate_response_async(
+            prompt,
+            model_name="gpt-3.5-turbo",
+            system_instruction=None,
             temperature=0.7,
         )
     except Exception as e:
@@ -211,8 +300,6 @@ def get_answer_feedback(
             detail="Failed to generate feedback",
         ) from e
 
-    feedback_text = response.choices[0].message.content
-
     # Extract suggestions (simple split by newline for now)
     suggestions = [
         line.strip("- ").strip()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Literal, Optional
+from typing import Annotated, Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, EmailStr, Field
@@ -14,6 +14,8 @@ class SearchResult(BaseModel):
     content: str
     source_type: str
     similarity: float
+    # Shared by the chunks of one memo; search returns its best chunk only
+    source_id: Optional[UUID] = None
 
 
 class GeneratedAnswer(BaseModel):
@@ -26,6 +28,23 @@ class AnswerRequest(BaseModel):
     query_text: str = Field(..., min_length=1, description="Query cannot be empty")
 
 
+class BatchSearchRequest(BaseModel):
+    queries: list[Annotated[str, Field(min_length=1)]] = Field(
+        ..., min_length=1, max_length=20, description="Queries cannot be empty"
+    )
+    limit: int = Field(5, ge=1, le=20)
+    similarity_threshold: float = 0.3
+
+
+class QuerySearchResults(BaseModel):
+    query_text: str
+    results: list[SearchResult]
+
+
+class BatchSearchResponse(BaseModel):
+    results: list[QuerySearchResults]
+
+
 class QuestionBase(BaseModel):
     category: str
     question_text: str
@@ -58,6 +77,10 @@ class UpdateAnswerRequest(BaseModel):
     answer_text: str = Field(..., min_length=1)
 
 
+class SingleAnswerUpdate(BaseModel):
+    answer_text: str = Field(..., min_length=1)
+
+
 class UserAnswer(BaseModel):
     id: UUID
     user_id: UUID
@@ -84,6 +107,39 @@ class AnalysisResponse(BaseModel):
     summary: str
 
 
+class AnalysisStatusResponse(BaseModel):
+    status: Literal["none", "queued", "running", "succeeded", "failed"]
+    job_id: Optional[UUID] = None
+    attempts: int = 0
+    queued_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class StrengthItem(BaseModel):
+    strength: str
+    evidence: str
+    confidence: float
+
+
+class AnalysisResultContent(BaseModel):
+    keywords: list[str]
+    strengths: list[StrengthItem]
+    values: list[str]
+    summary: str
+
+
+class AnalysisResult(BaseModel):
+    id: UUID
+    user_id: UUID
+    analysis_type: str
+    result_data: dict
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class UserRegister(BaseModel):
     email: EmailStr
     password: str = Field(..., min_length=8)
@@ -113,6 +169,18 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class CurrentUser(BaseModel):
+    """Lightweight authenticated-user record, shared between requests."""
+
+    id: UUID
+    email: str
+    name: str
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
+
 class AnswerFeedbackRequest(BaseModel):
     answer_text: str = Field(..., min_length=1)
 
@@ -0,0 +1,30 @@
+"""
+Apply the embedding cache eviction policy (run periodically, e.g. from cron)
+"""
+
+from app.database import SessionLocal
+from app.services import embedding_cache
+
+
+def evict_embedding_cache():
+    """Delete expired and least recently used embedding cache entries."""
+    db = SessionLocal()
+
+    try:
+        deleted = embedding_cache.evict(db)
+        print(
+            f"✅ Evicted {deleted} embedding cache entries "
+            f"(max_age_days={embedding_cache.EMBEDDING_CACHE_MAX_AGE_DAYS}, "
+            f"max_entries={embedding_cache.EMBEDDING_CACHE_MAX_ENTRIES})"
+        )
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error evicting embedding cache: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    evict_embedding_cache()
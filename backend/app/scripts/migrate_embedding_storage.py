@@ -0,0 +1,108 @@
+"""
+Convert stored embeddings to the EMBEDDING_STORAGE / EMBEDDING_DIMENSIONS
+settings (e.g. halfvec(768) instead of vector(1536)), and rebuild the HNSW
+index for VECTOR_SEARCH_METRIC
+
+The app only works against columns of its own settings, so the conversion is
+split around the deploy:
+
+1. With the app still running on the old settings, convert the existing rows:
+
+    EMBEDDING_STORAGE=halfvec EMBEDDING_DIMENSIONS=768 \\
+        python -m app.scripts.migrate_embedding_storage --phase backfill
+
+2. Stop the app and the analysis worker (every process on the old settings).
+3. Convert the rows written since step 1 and swap the columns; this takes a
+   write lock for a few seconds, then rebuilds the HNSW index concurrently:
+
+    EMBEDDING_STORAGE=halfvec EMBEDDING_DIMENSIONS=768 \\
+        python -m app.scripts.migrate_embedding_storage --phase swap
+
+4. Start the app with the new settings once every table reports "swapped";
+   searches work while the index is being rebuilt, only slower.
+
+Without --phase, both phases run in a row (the app must be stopped).
+"""
+
+import argparse
+
+from app.core.vector import EMBEDDING_DIMENSIONS, EMBEDDING_STORAGE
+from app.database import SessionLocal
+from app.services import embedding_storage
+
+# (table, HNSW index on its embedding column)
+TABLES = [
+    ("rag_embeddings", "ix_rag_embeddings_embedding_hnsw"),
+    ("embedding_cache", None),
+]
+
+
+def _print_conversion(table: str, report: dict, action: str):
+    if report["from"] == report["to"]:
+        print(f"✅ {table}: already {report['to']}")
+    else:
+        print(
+            f"✅ {table}: {action} {report['rows']} rows "
+            f"from {report['from']} to {report['to']}"
+        )
+
+
+def migrate_embedding_storage(
+    storage: str, dimensions: int, batch_size: int, phase: str = "all"
+):
+    """Convert every embedding column to storage(dimensions)."""
+    db = SessionLocal()
+
+    try:
+        if phase in ("backfill", "all"):
+            for table, _ in TABLES:
+                report = embedding_storage.backfill_embeddings(
+                    db, table, storage, dimensions, batch_size=batch_size
+                )
+                _print_conversion(table, report, "backfilled")
+        if phase in ("swap", "all"):
+            for table, index_name in TABLES:
+                report = embedding_storage.swap_embeddings(
+                    db,
+                    table,
+                    storage,
+                    dimensions,
+                    index_name=index_name,
+                    batch_size=batch_size,
+                )
+                _print_conversion(table, report, "swapped, converted")
+            for table, index_name in TABLES:
+                if index_name is not None and embedding_storage.rebuild_index(
+                    db, table, index_name, storage
+                ):
+                    print(f"✅ {table}: rebuilt {index_name}")
+            print("   Run VACUUM FULL or pg_repack to return the freed space")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error converting embeddings: {e}")
+        raise
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--storage", choices=["vector", "halfvec"], default=EMBEDDING_STORAGE
+    )
+    parser.add_argument("--dimensions", type=int, default=EMBEDDING_DIMENSIONS)
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=embedding_storage.EMBEDDING_STORAGE_BATCH_SIZE,
+    )
+    parser.add_argument("--phase", choices=["backfill", "swap", "all"], default="all")
+    args = parser.parse_args()
+    migrate_embedding_storage(
+        args.storage, args.dimensions, args.batch_size, args.phase
+    )
+
+
+if __name__ == "__main__":
+    main()
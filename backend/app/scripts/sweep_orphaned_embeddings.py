@@ -0,0 +1,70 @@
+"""
+Delete rag_embeddings answer rows that no user answer references any more
+
+Run once, or with --interval to keep sweeping in the background.
+"""
+
+import argparse
+import time
+from datetime import timedelta
+
+from app.database import SessionLocal
+from app.services import embedding_gc
+
+
+def sweep(batch_size: int, min_age_minutes: int, pause: float) -> dict:
+    """Run one full sweep and print what was reclaimed."""
+    db = SessionLocal()
+
+    try:
+        report = embedding_gc.sweep_orphaned_embeddings(
+            db,
+            batch_size=batch_size,
+            min_age=timedelta(minutes=min_age_minutes),
+            pause_seconds=pause,
+        )
+        print(
+            f"✅ Deleted {report['rows']} orphaned embeddings "
+            f"({report['bytes'] / 1024:.1f} KiB of row data) "
+            f"in {report['batches']} batches"
+        )
+        return report
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error sweeping orphaned embeddings: {e}")
+        raise
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--batch-size", type=int, default=embedding_gc.ORPHAN_SWEEP_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--min-age-minutes",
+        type=int,
+        default=embedding_gc.ORPHAN_SWEEP_MIN_AGE_MINUTES,
+    )
+    parser.add_argument(
+        "--pause", type=float, default=0.0, help="Seconds to sleep between batches"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=None,
+        help="Repeat the sweep every N seconds instead of running once",
+    )
+    args = parser.parse_args()
+
+    while True:
+        sweep(args.batch_size, args.min_age_minutes, args.pause)
+        if args.interval is None:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
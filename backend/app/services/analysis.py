@@ -1,28 +1,76 @@
+import asyncio
+import hashlib
+import json
 import logging
+import os
+from collections.abc import Sequence
 from uuid import UUID
 
-from app import crud, schemas
+from app import crud, models, schemas
+from app.core.openai import create_async_client
 from app.prompts.analysis_prompts import (
     ANALYSIS_SYSTEM_PROMPT,
     ANALYSIS_USER_PROMPT_TEMPLATE,
+    CATEGORY_ANALYSIS_PROMPT_TEMPLATE,
+    CATEGORY_ANALYSIS_SYSTEM_PROMPT,
+    CATEGORY_LABELS,
+    MERGE_ANALYSIS_PROMPT_TEMPLATE,
+    MERGE_ANALYSIS_SYSTEM_PROMPT,
+)
+from app.services.llm import (
+    generate_structured_response,
+    generate_structured_response_async,
 )
-from app.services.llm import generate_structured_response
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
+# Chat model used for the self-analysis
+ANALYSIS_MODEL = os.getenv("ANALYSIS_MODEL", "gpt-4o-mini")
+# "single": one completion over all answers. "map_reduce": one concurrent
+# completion per question category, merged by a small final completion;
+# category results are reused while their answers are unchanged.
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "single")
 
-def analyze_user_answers(user_id: UUID, db: Session) -> schemas.AnalysisResult | None:
+_SINGLE_PROMPTS = (ANALYSIS_SYSTEM_PROMPT, ANALYSIS_USER_PROMPT_TEMPLATE)
+_CATEGORY_PROMPTS = (CATEGORY_ANALYSIS_SYSTEM_PROMPT, CATEGORY_ANALYSIS_PROMPT_TEMPLATE)
+_MAP_REDUCE_PROMPTS = (
+    *_CATEGORY_PROMPTS,
+    MERGE_ANALYSIS_SYSTEM_PROMPT,
+    MERGE_ANALYSIS_PROMPT_TEMPLATE,
+)
+
+# analysis_type of the per-category results of the map step
+CATEGORY_ANALYSIS_TYPE = "self_analysis:{category}"
+
+
+def answers_fingerprint(
+    answers: list[models.UserAnswer],
+    model: str,
+    prompts: Sequence[str] = _SINGLE_PROMPTS,
+) -> str:
     """
-    Analyze user answers and save the result.
+    SHA-256 over the ordered (question_id, answer_text) pairs, the prompts and
+    the model: everything the analysis output depends on. Answers are hashed
+    byte for byte, so any edit gives a new fingerprint, and so does changing
+    a prompt or the model.
     """
-    # 1. Fetch user answers
-    answers = crud.get_user_answers(db, user_id)
-    if not answers:
-        # No answers to analyze
-        return None
+    payload = {
+        "answers": [[str(a.question_id), a.answer_text] for a in answers],
+        "prompts": list(prompts),
+        "model": model,
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _question_order(answer: models.UserAnswer):
+    if answer.question:
+        return (0, answer.question.display_order, str(answer.question_id))
+    return (1, 0, str(answer.question_id))
 
-    # 2. Format Q&A text
+
+def _format_q_and_a(answers: list[models.UserAnswer]) -> str:
     q_and_a_list = []
     for answer in answers:
         # Accessing answer.question.question_text (lazy loading)
@@ -31,46 +79,160 @@ def analyze_user_answers(user_id: UUID, db: Session) -> schemas.AnalysisResult |
         else:
             question_text = "Unknown Question"
         q_and_a_list.append(f"Q: {question_text}\nA: {answer.answer_text}")
+    return "\n\n".join(q_and_a_list)
 
-    q_and_a_text = "\n\n".join(q_and_a_list)
 
-    # 3. Construct prompt
-    prompt = ANALYSIS_USER_PROMPT_TEMPLATE.format(q_and_a_text=q_and_a_text)
+def analyze_user_answers(user_id: UUID, db: Session) -> schemas.AnalysisResult | None:
+    """
+    Analyze user answers and save the result.
 
-    # 4. Call LLM
-    analysis_content = generate_structured_response(
-        prompt=prompt,
-        response_model=schemas.AnalysisResultContent,
-        system_instruction=ANALYSIS_SYSTEM_PROMPT,
-    )
+    If the answers, prompts and model are the same as for the latest result
+    (same fingerprint), that result is returned without calling the LLM.
+    """
+    # 1. Fetch user answers, in questionnaire order so that the prompt and
+    # its fingerprint do not depend on row order
+    answers = sorted(crud.get_user_answers(db, user_id), key=_question_order)
+    if not answers:
+        # No answers to analyze
+        return None
+
+    # 2. Skip the LLM call when nothing changed since the last analysis
+    map_reduce = ANALYSIS_MODE == "map_reduce"
+    prompts = _MAP_REDUCE_PROMPTS if map_reduce else _SINGLE_PROMPTS
+    fingerprint = answers_fingerprint(answers, ANALYSIS_MODEL, prompts)
+    latest = crud.get_analysis_result(db, user_id, "self_analysis")
+    if latest is not None and latest.input_fingerprint == fingerprint:
+        logger.info(f"Answers of user_id={user_id} unchanged, skipping analysis")
+        return latest
 
-    # 5. Save result
+    # 3. Call LLM
+    if map_reduce:
+        analysis_content = _map_reduce_analysis(db, user_id, answers)
+    else:
+        prompt = ANALYSIS_USER_PROMPT_TEMPLATE.format(
+            q_and_a_text=_format_q_and_a(answers)
+        )
+        analysis_content = generate_structured_response(
+            prompt=prompt,
+            response_model=schemas.AnalysisResultContent,
+            model_name=ANALYSIS_MODEL,
+            system_instruction=ANALYSIS_SYSTEM_PROMPT,
+        )
+
+    # 4. Save result
     # Convert Pydantic model to dict for JSON storage
     result_data = analysis_content.model_dump()
 
     db_result = crud.create_analysis_result(
-        db=db, user_id=user_id, analysis_type="self_analysis", result_data=result_data
+        db=db,
+        user_id=user_id,
+        analysis_type="self_analysis",
+        result_data=result_data,
+        input_fingerprint=fingerprint,
     )
 
     return db_result
 
 
-def run_analysis_background(user_id: UUID):
+def _category_of(answer: models.UserAnswer) -> str:
+    return answer.question.category if answer.question else "other"
+
+
+async def _analyze_categories(
+    groups: dict[str, list[models.UserAnswer]],
+) -> list[schemas.AnalysisResultContent | BaseException]:
+    # Map step: one completion per category, all in flight at once. A failed
+    # category is returned as its exception, so the others are kept. The
+    # client lives only as long as this run's event loop (see
+    # create_async_client).
+    async with create_async_client() as openai_client:
+        return await asyncio.gather(
+            *(
+                generate_structured_response_async(
+                    prompt=CATEGORY_ANALYSIS_PROMPT_TEMPLATE.format(
+                        category=CATEGORY_LABELS.get(category, category),
+                        q_and_a_text=_format_q_and_a(answers),
+                    ),
+                    response_model=schemas.AnalysisResultContent,
+                    model_name=ANALYSIS_MODEL,
+                    system_instruction=CATEGORY_ANALYSIS_SYSTEM_PROMPT,
+                    openai_client=openai_client,
+                )
+                for category, answers in groups.items()
+            ),
+            return_exceptions=True,
+        )
+
+
+def _map_reduce_analysis(
+    db: Session, user_id: UUID, answers: list[models.UserAnswer]
+) -> schemas.AnalysisResultContent:
     """
-    Wrapper to run analysis in background with a new DB session.
+    Analyzes each question category separately, then merges the category
+    analyses with one small completion. A category whose answers did not
+    change since its last analysis reuses the stored result, so editing one
+    answer re-runs only its category (and the merge).
     """
-    from app.database import SessionLocal
-
-    db = SessionLocal()
-    try:
-        logger.info(f"Starting analysis for user_id={user_id}")
-        result = analyze_user_answers(user_id, db)
-        if result is None:
-            logger.warning(f"No answers found for user_id={user_id}")
+    groups: dict[str, list[models.UserAnswer]] = {}
+    for answer in answers:
+        groups.setdefault(_category_of(answer), []).append(answer)
+
+    partials: dict[str, dict] = {}
+    stale: dict[str, list[models.UserAnswer]] = {}
+    fingerprints = {}
+    for category, group in groups.items():
+        fingerprints[category] = answers_fingerprint(
+            group, ANALYSIS_MODEL, _CATEGORY_PROMPTS
+        )
+        cached = crud.get_analysis_result(
+            db, user_id, CATEGORY_ANALYSIS_TYPE.format(category=category)
+        )
+        if cached is not None and cached.input_fingerprint == fingerprints[category]:
+            partials[category] = cached.result_data
         else:
-            logger.info(f"Analysis completed for user_id={user_id}")
-    except Exception:
-        logger.exception(f"Analysis failed for user_id={user_id}")
-        # Consider: store error state in DB for user notification
-    finally:
-        db.close()
+            stale[category] = group
+
+    if stale:
+        logger.info(
+            f"Analyzing categories {sorted(stale)} of user_id={user_id} "
+            f"({len(partials)} reused)"
+        )
+        # Called from worker threads, which have no running event loop
+        contents = asyncio.run(_analyze_categories(stale))
+        errors = []
+        for category, content in zip(stale, contents, strict=True):
+            if isinstance(content, BaseException):
+                logger.error(f"Analysis of category {category} failed: {content}")
+                errors.append(content)
+                continue
+            partials[category] = content.model_dump()
+            # Stored right away, so a retry after a failed category or merge
+            # only redoes what failed
+            crud.create_analysis_result(
+                db=db,
+                user_id=user_id,
+                analysis_type=CATEGORY_ANALYSIS_TYPE.format(category=category),
+                result_data=partials[category],
+                input_fingerprint=fingerprints[category],
+            )
+        if errors:
+            # Fails the job, which is retried with backoff
+            raise errors[0]
+
+    # Reduce step, over the categories in questionnaire order
+    category_analyses = json.dumps(
+        {
+            CATEGORY_LABELS.get(category, category): partials[category]
+            for category in groups
+        },
+        ensure_ascii=False,
+        indent=2,
+    )
+    return generate_structured_response(
+        prompt=MERGE_ANALYSIS_PROMPT_TEMPLATE.format(
+            category_analyses=category_analyses
+        ),
+        response_model=schemas.AnalysisResultContent,
+        model_name=ANALYSIS_MODEL,
+        system_instruction=MERGE_ANALYSIS_SYSTEM_PROMPT,
+    )
@@ -0,0 +1,193 @@
+"""
+Durable queue for self-analysis runs.
+
+Saving answers enqueues a row in analysis_jobs; worker processes
+(python -m app.workers.analysis) claim due jobs with
+SELECT ... FOR UPDATE SKIP LOCKED and run them outside the web process.
+A failed run is retried with exponential backoff, and moved to the "dead"
+state after ANALYSIS_JOB_MAX_ATTEMPTS runs.
+
+Triggers are debounced per user: a user has at most one queued job, and
+saving more answers while it waits only pushes its start back by the quiet
+period (bounded by ANALYSIS_DEBOUNCE_MAX_SECONDS) and counts the trigger in
+coalesced_triggers, each one an LLM analysis saved.
+
+Clients follow a user's analysis with get_status, or wait_for_status to
+long-poll until it finishes (see app.services.job_events).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from app import crud, models
+from app.services import analysis, job_events
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Runs per job before it is dead-lettered
+ANALYSIS_JOB_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_JOB_MAX_ATTEMPTS", "5"))
+# Retry delay: base * 2 ** (attempts - 1), capped at the maximum
+ANALYSIS_JOB_BACKOFF_SECONDS = float(os.getenv("ANALYSIS_JOB_BACKOFF_SECONDS", "30"))
+ANALYSIS_JOB_BACKOFF_MAX_SECONDS = float(
+    os.getenv("ANALYSIS_JOB_BACKOFF_MAX_SECONDS", "1800")
+)
+# A job running for longer than this is assumed lost with its worker and is
+# taken back. Must exceed the longest analysis (LLM timeouts included).
+ANALYSIS_JOB_LEASE_SECONDS = float(os.getenv("ANALYSIS_JOB_LEASE_SECONDS", "900"))
+# Quiet period: a queued job starts once no trigger came for this long...
+ANALYSIS_DEBOUNCE_SECONDS = float(os.getenv("ANALYSIS_DEBOUNCE_SECONDS", "15"))
+# ...but no later than this after its first trigger, for users who keep editing
+ANALYSIS_DEBOUNCE_MAX_SECONDS = float(os.getenv("ANALYSIS_DEBOUNCE_MAX_SECONDS", "120"))
+
+# Longest long-poll a client may request
+ANALYSIS_STATUS_MAX_WAIT_SECONDS = float(
+    os.getenv("ANALYSIS_STATUS_MAX_WAIT_SECONDS", "60")
+)
+# A waiting request re-reads the state at least this often, in case a
+# notification was lost
+ANALYSIS_STATUS_RECHECK_SECONDS = float(
+    os.getenv("ANALYSIS_STATUS_RECHECK_SECONDS", "5")
+)
+
+# Job states as reported to clients; dead-lettered jobs have failed
+_PUBLIC_STATUS = {
+    "queued": "queued",
+    "running": "running",
+    "succeeded": "succeeded",
+    "dead": "failed",
+}
+PENDING_STATUSES = {"queued", "running"}
+
+
+def enqueue_analysis(db: Session, user_id: UUID) -> models.AnalysisJob:
+    """
+    Queues a self-analysis of the user's answers after the quiet period, or
+    coalesces the trigger into the user's queued job. Commits.
+    """
+    return crud.enqueue_analysis_job(
+        db,
+        user_id,
+        max_attempts=ANALYSIS_JOB_MAX_ATTEMPTS,
+        delay=timedelta(seconds=ANALYSIS_DEBOUNCE_SECONDS),
+        max_delay=timedelta(seconds=ANALYSIS_DEBOUNCE_MAX_SECONDS),
+    )
+
+
+def saved_analysis_count(db: Session, since: datetime | None = None) -> int:
+    """
+    Number of LLM analyses saved by coalescing triggers.
+    """
+    return crud.get_saved_analysis_count(db, since)
+
+
+def backoff_seconds(attempts: int) -> float:
+    """
+    Delay before retrying a job that has failed `attempts` times.
+    """
+    return min(
+        ANALYSIS_JOB_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0),
+        ANALYSIS_JOB_BACKOFF_MAX_SECONDS,
+    )
+
+
+def release_expired_jobs(db: Session) -> int:
+    """
+    Requeues (or dead-letters) jobs whose worker held them past the lease.
+    """
+    released = crud.release_expired_analysis_jobs(
+        db, timedelta(seconds=ANALYSIS_JOB_LEASE_SECONDS)
+    )
+    if released:
+        logger.warning(f"Released {released} analysis jobs with expired leases")
+    return released
+
+
+def run_next_job(db: Session, worker_id: str) -> models.AnalysisJob | None:
+    """
+    Claims the next due job and runs it.
+
+    Returns:
+        The job that was run, or None if no job was due
+    """
+    job = crud.claim_analysis_job(db, worker_id)
+    db.commit()
+    if job is None:
+        return None
+
+    logger.info(
+        f"Starting analysis job {job.id} for user_id={job.user_id} "
+        f"(attempt {job.attempts}/{job.max_attempts}, "
+        f"{job.coalesced_triggers} triggers coalesced)"
+    )
+    try:
+        analysis.analyze_user_answers(job.user_id, db)
+    except Exception as exc:
+        db.rollback()
+        error = f"{type(exc).__name__}: {exc}"
+        if job.attempts >= job.max_attempts:
+            logger.exception(f"Analysis job {job.id} failed for good")
+            crud.finish_analysis_job(db, job.id, worker_id, "dead", error=error)
+        else:
+            delay = backoff_seconds(job.attempts)
+            logger.exception(f"Analysis job {job.id} failed, retrying in {delay}s")
+            crud.finish_analysis_job(
+                db,
+                job.id,
+                worker_id,
+                "queued",
+                error=error,
+                run_after=datetime.now(timezone.utc) + timedelta(seconds=delay),
+            )
+    else:
+        crud.finish_analysis_job(db, job.id, worker_id, "succeeded")
+        logger.info(f"Analysis job {job.id} succeeded")
+    return job
+
+
+def get_status(db: Session, user_id: UUID) -> dict:
+    """
+    State of the user's analysis: "none" if it was never queued, else the
+    state and timings of its current job (see crud.get_current_analysis_job).
+    Ends the session's transaction, so the next read sees new commits.
+    """
+    job = crud.get_current_analysis_job(db, user_id)
+    db.commit()
+    if job is None:
+        return {"status": "none"}
+    return {
+        "status": _PUBLIC_STATUS[job.status],
+        "job_id": job.id,
+        "attempts": job.attempts,
+        "queued_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+async def wait_for_status(db: Session, user_id: UUID, wait: float) -> dict:
+    """
+    Returns get_status once the analysis is no longer queued or running, or
+    after wait seconds. Wakes up on the job's state changes instead of
+    polling the database.
+    """
+    deadline = time.monotonic() + min(wait, ANALYSIS_STATUS_MAX_WAIT_SECONDS)
+    with job_events.listener.subscribe(user_id) as changed:
+        while True:
+            changed.clear()
+            status = await run_in_threadpool(get_status, db, user_id)
+            remaining = deadline - time.monotonic()
+            if status["status"] not in PENDING_STATUSES or remaining <= 0:
+                return status
+            try:
+                await asyncio.wait_for(
+                    changed.wait(),
+                    min(remaining, ANALYSIS_STATUS_RECHECK_SECONDS),
+                )
+            except asyncio.TimeoutError:
+                pass
@@ -1,14 +1,28 @@
+import os
 from uuid import UUID
 
 from app import schemas
-from app.services import embedding, llm, vector_search
+from app.services import embedding_cache, llm, vector_search
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+# Retrieve context with hybrid (lexical + vector) search instead of vector
+# search alone.
+RAG_HYBRID_SEARCH = os.getenv("RAG_HYBRID_SEARCH", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Diversify the vector search results with MMR (see vector_search.mmr_search)
+RAG_MMR = os.getenv("RAG_MMR", "false").lower() in ("1", "true", "yes")
 
-def generate_answer(
+
+async def generate_answer(
     db: Session,
     query_text: str,
     user_id: UUID,
+    hybrid: bool | None = None,
+    diversify: bool | None = None,
 ) -> schemas.GeneratedAnswer:
     """
     Generates an answer to the user's query using RAG.
@@ -22,18 +36,46 @@ def generate_answer(
         db: Database session.
         query_text: The user's query.
         user_id: The user ID.
+        hybrid: Use hybrid_search for step 2 (defaults to RAG_HYBRID_SEARCH).
+        diversify: Use mmr_search for step 2 (defaults to RAG_MMR). Ignored
+            when hybrid search is used.
 
     Returns:
         schemas.GeneratedAnswer: The structured answer.
     """
-    # 1. Generate Embedding
-    query_vec = embedding.get_embedding(query_text)
+    # 1. Generate Embedding (repeated queries are served from memory)
+    query_vec = await embedding_cache.get_query_embedding_async(query_text)
 
-    # 2. Vector Search
+    # 2. Vector Search (optionally fused with exact-term matches or diversified)
     # Limit to top 5 results for context
-    search_results = vector_search.search_similar_items(
-        db, query_vec, user_id, limit=5, similarity_threshold=0.3
-    )
+    if RAG_HYBRID_SEARCH if hybrid is None else hybrid:
+        search_results = await run_in_threadpool(
+            vector_search.hybrid_search,
+            db,
+            query_text,
+            query_vec,
+            user_id,
+            limit=5,
+            similarity_threshold=0.3,
+        )
+    elif RAG_MMR if diversify is None else diversify:
+        search_results = await run_in_threadpool(
+            vector_search.mmr_search,
+            db,
+            query_vec,
+            user_id,
+            limit=5,
+            similarity_threshold=0.3,
+        )
+    else:
+        search_results = await run_in_threadpool(
+            vector_search.search_similar_items,
+            db,
+            query_vec,
+            user_id,
+            limit=5,
+            similarity_threshold=0.3,
+        )
 
     if not search_results:
         return schemas.GeneratedAnswer(
@@ -71,7 +113,7 @@ def generate_answer(
     """
 
     # 4. Generate Structured Response
-    response = llm.generate_structured_response(
+    response = await llm.generate_structured_response_async(
         prompt=prompt,
         response_model=schemas.GeneratedAnswer,
         system_instruction=system_instruction,
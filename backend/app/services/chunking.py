@@ -0,0 +1,120 @@
+"""
+Sentence-aware chunking of long texts for embedding.
+
+A memo is embedded as several overlapping chunks instead of one vector: a
+long text averaged into a single embedding matches nothing precisely, and
+texts over the model's input limit cannot be embedded at all. Chunks end on
+Japanese sentence terminators (。！？), so a chunk never cuts a sentence in
+half unless that sentence alone exceeds the chunk size.
+"""
+
+import os
+import re
+from collections.abc import Iterable, Iterator
+
+# Target chunk size in characters. Japanese runs about one token per
+# character, so 400 characters stay far below the embedding input limit.
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "400"))
+# Trailing sentences of a chunk repeated at the start of the next one, up to
+# this many characters, so a statement spanning a boundary is kept whole.
+CHUNK_OVERLAP_CHARS = int(os.getenv("CHUNK_OVERLAP_CHARS", "100"))
+
+# A sentence runs up to its terminators plus closing brackets (「…。」) and
+# line breaks, or up to a line break. ASCII ! and ? are accepted too; "." is
+# not, since it also appears in numbers and abbreviations.
+_SENTENCE = re.compile(r"[^。！？!?\n]*(?:[。！？!?]+[」』）)]*\n*|\n+)")
+
+
+def iter_sentences(stream: str | Iterable[str]) -> Iterator[str]:
+    """
+    Yields the sentences of a text, including their terminators and line
+    breaks, so that joining them gives back the text.
+
+    The text may arrive in pieces (e.g. a request body being read); a
+    sentence is yielded as soon as a later piece shows it has ended.
+    """
+    if isinstance(stream, str):
+        stream = (stream,)
+    buffer = ""
+    for piece in stream:
+        buffer += piece
+        end = 0
+        for match in _SENTENCE.finditer(buffer):
+            # The next piece may continue the terminators, brackets or breaks
+            if match.end() == len(buffer):
+                break
+            yield match.group()
+            end = match.end()
+        buffer = buffer[end:]
+    end = 0
+    for match in _SENTENCE.finditer(buffer):
+        yield match.group()
+        end = match.end()
+    if buffer[end:]:
+        yield buffer[end:]
+
+
+def _bounded(sentences: Iterable[str], max_chars: int) -> Iterator[str]:
+    # Sentences longer than a chunk are cut into chunk-sized pieces
+    for sentence in sentences:
+        for start in range(0, len(sentence), max_chars):
+            yield sentence[start : start + max_chars]
+
+
+def iter_chunks(
+    stream: str | Iterable[str],
+    max_chars: int = CHUNK_MAX_CHARS,
+    overlap_chars: int = CHUNK_OVERLAP_CHARS,
+) -> Iterator[str]:
+    """
+    Yields chunks of at most max_chars characters made of whole sentences.
+    Each chunk after the first starts with the previous chunk's trailing
+    sentences, up to overlap_chars characters. Leading and trailing
+    whitespace is stripped; blank chunks are skipped.
+
+    Args:
+        stream: The text, or an iterable of its pieces
+        max_chars: Maximum chunk length
+        overlap_chars: Maximum length repeated from the previous chunk
+
+    Returns:
+        An iterator over the chunks, in text order
+    """
+    if max_chars <= 0:
+        raise ValueError("max_chars must be positive")
+    window: list[str] = []
+    size = 0
+    for sentence in _bounded(iter_sentences(stream), max_chars):
+        if window and size + len(sentence) > max_chars:
+            chunk = "".join(window).strip()
+            if chunk:
+                yield chunk
+            # Carry the trailing sentences over, as far as they fit both the
+            # overlap and the room left for the new sentence
+            budget = min(overlap_chars, max_chars - len(sentence))
+            kept: list[str] = []
+            size = 0
+            for previous in reversed(window):
+                if size + len(previous) > budget:
+                    break
+                kept.append(previous)
+                size += len(previous)
+            window = kept[::-1]
+        window.append(sentence)
+        size += len(sentence)
+    if window:
+        chunk = "".join(window).strip()
+        if chunk:
+            yield chunk
+
+
+def chunk_text(
+    text: str,
+    max_chars: int = CHUNK_MAX_CHARS,
+    overlap_chars: int = CHUNK_OVERLAP_CHARS,
+) -> list[str]:
+    """
+    Returns iter_chunks(text) as a list. Texts up to max_chars characters
+    give a single chunk.
+    """
+    return list(iter_chunks(text, max_chars, overlap_chars))
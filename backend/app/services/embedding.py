@@ -1,25 +1,151 @@
+import asyncio
+import base64
+import os
+
+import numpy as np
 import openai
-from app.core.openai import client
+from app.core.openai import async_client, client, get_async_semaphore
+from app.core.vector import EMBEDDING_DIMENSIONS
 from fastapi import HTTPException
 
+# OpenAI accepts at most 2048 inputs and ~300k tokens per embeddings request.
+MAX_BATCH_INPUTS = 2048
+# Token budget per request, estimated as one token per character. This is
+# conservative for Japanese text and very conservative for English.
+MAX_BATCH_TOKENS = 300_000
+
+# "float" returns embeddings as lists of Python floats. "base64" asks the API
+# for packed float32 bytes and decodes them straight into NumPy float32 arrays,
+# skipping per-element float parsing; the arrays are bound to pgvector as is
+# (see app.core.vector).
+EMBEDDING_ENCODING_FORMAT = os.getenv("EMBEDDING_ENCODING_FORMAT", "float")
+
+
+# Native size of text-embedding-3-small. Other sizes are requested through
+# the API's dimensions parameter (see EMBEDDING_DIMENSIONS).
+NATIVE_DIMENSIONS = 1536
+
+
+def _request_options(encoding_format: str | None) -> dict:
+    options = {}
+    if (encoding_format or EMBEDDING_ENCODING_FORMAT) == "base64":
+        options["encoding_format"] = "base64"
+    if EMBEDDING_DIMENSIONS != NATIVE_DIMENSIONS:
+        options["dimensions"] = EMBEDDING_DIMENSIONS
+    return options
+
+
+def decode_embedding(data) -> list[float] | np.ndarray:
+    """
+    Returns a base64 embedding as a read-only float32 array over the decoded
+    bytes; float lists are returned unchanged.
+    """
+    if isinstance(data, str):
+        return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+    return data
+
 
-def get_embedding(text: str, model: str = "text-embedding-3-small") -> list[float]:
+def get_embedding(
+    text: str,
+    model: str = "text-embedding-3-small",
+    encoding_format: str | None = None,
+) -> list[float] | np.ndarray:
     """
     Generates an embedding for the given text using OpenAI's API.
 
     Args:
         text (str): The text to embed.
         model (str): The model to use. Defaults to "text-embedding-3-small".
+        encoding_format (str | None): "float" or "base64". Defaults to
+            EMBEDDING_ENCODING_FORMAT.
+
+    Returns:
+        list[float] | np.ndarray: The embedding vector (a float32 array in
+        base64 mode).
+
+    Raises:
+        HTTPException: If the API call fails.
+    """
+    try:
+        response = client.embeddings.create(
+            input=text, model=model, **_request_options(encoding_format)
+        )
+        return decode_embedding(response.data[0].embedding)
+    except openai.APIStatusError as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=f"OpenAI API Error: {exc!s}",
+        ) from exc
+    except Exception as exc:
+        raise HTTPException(
+            status_code=500,
+            detail=f"OpenAI API Error: {exc!s}",
+        ) from exc
+
+
+def _split_batches(
+    texts: list[str], max_inputs: int, max_tokens: int
+) -> list[list[int]]:
+    """
+    Groups text indices into batches that fit the per-request limits.
+    """
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for index, text in enumerate(texts):
+        tokens = max(len(text), 1)
+        if current and (
+            len(current) >= max_inputs or current_tokens + tokens > max_tokens
+        ):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def get_embeddings(
+    texts: list[str],
+    model: str = "text-embedding-3-small",
+    max_inputs: int = MAX_BATCH_INPUTS,
+    max_tokens: int = MAX_BATCH_TOKENS,
+    encoding_format: str | None = None,
+) -> list[list[float] | np.ndarray]:
+    """
+    Generates embeddings for several texts with as few API calls as possible.
+
+    Texts are sent in one request when they fit the request limits, otherwise
+    they are split into consecutive batches. The API may return items in any
+    order, so results are mapped back using each item's index.
+
+    Args:
+        texts (list[str]): The texts to embed.
+        model (str): The model to use. Defaults to "text-embedding-3-small".
+        max_inputs (int): Maximum number of texts per request.
+        max_tokens (int): Estimated token budget per request.
+        encoding_format (str | None): "float" or "base64". Defaults to
+            EMBEDDING_ENCODING_FORMAT.
 
     Returns:
-        list[float]: The embedding vector.
+        list[list[float] | np.ndarray]: One embedding vector per text, in
+        input order.
 
     Raises:
         HTTPException: If the API call fails.
     """
+    embeddings: list[list[float] | None] = [None] * len(texts)
     try:
-        response = client.embeddings.create(input=text, model=model)
-        return response.data[0].embedding
+        for batch in _split_batches(texts, max_inputs, max_tokens):
+            response = client.embeddings.create(
+                input=[texts[i] for i in batch],
+                model=model,
+                **_request_options(encoding_format),
+            )
+            for item in response.data:
+                embeddings[batch[item.index]] = decode_embedding(item.embedding)
     except openai.APIStatusError as exc:
         raise HTTPException(
             status_code=503,
@@ -30,3 +156,93 @@ def get_embedding(text: str, model: str = "text-embedding-3-small") -> list[floa
             status_code=500,
             detail=f"OpenAI API Error: {exc!s}",
         ) from exc
+
+    if any(vector is None for vector in embeddings):
+        raise HTTPException(
+            status_code=503,
+            detail="OpenAI API Error: embeddings response is missing items",
+        )
+    return embeddings
+
+
+async def get_embedding_async(
+    text: str,
+    model: str = "text-embedding-3-small",
+    encoding_format: str | None = None,
+) -> list[float] | np.ndarray:
+    """
+    Async variant of get_embedding that does not hold a worker thread while
+    waiting on the network. Concurrent requests are bounded by
+    OPENAI_MAX_CONCURRENCY.
+
+    Raises:
+        HTTPException: If the API call fails.
+    """
+    try:
+        async with get_async_semaphore():
+            response = await async_client.embeddings.create(
+                input=text, model=model, **_request_options(encoding_format)
+            )
+        return decode_embedding(response.data[0].embedding)
+    except openai.APIStatusError as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=f"OpenAI API Error: {exc!s}",
+        ) from exc
+    except Exception as exc:
+        raise HTTPException(
+            status_code=500,
+            detail=f"OpenAI API Error: {exc!s}",
+        ) from exc
+
+
+async def get_embeddings_async(
+    texts: list[str],
+    model: str = "text-embedding-3-small",
+    max_inputs: int = MAX_BATCH_INPUTS,
+    max_tokens: int = MAX_BATCH_TOKENS,
+    encoding_format: str | None = None,
+) -> list[list[float] | np.ndarray]:
+    """
+    Async variant of get_embeddings. When the texts need several requests,
+    the batches are sent concurrently.
+
+    Raises:
+        HTTPException: If the API call fails.
+    """
+    embeddings: list[list[float] | None] = [None] * len(texts)
+
+    async def embed_batch(batch: list[int]):
+        async with get_async_semaphore():
+            response = await async_client.embeddings.create(
+                input=[texts[i] for i in batch],
+                model=model,
+                **_request_options(encoding_format),
+            )
+        for item in response.data:
+            embeddings[batch[item.index]] = decode_embedding(item.embedding)
+
+    try:
+        await asyncio.gather(
+            *(
+                embed_batch(batch)
+                for batch in _split_batches(texts, max_inputs, max_tokens)
+            )
+        )
+    except openai.APIStatusError as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=f"OpenAI API Error: {exc!s}",
+        ) from exc
+    except Exception as exc:
+        raise HTTPException(
+            status_code=500,
+            detail=f"OpenAI API Error: {exc!s}",
+        ) from exc
+
+    if any(vector is None for vector in embeddings):
+        raise HTTPException(
+            status_code=503,
+            detail="OpenAI API Error: embeddings response is missing items",
+        )
+    return embeddings
@@ -0,0 +1,247 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from datetime import timedelta
+
+import numpy as np
+from app import crud
+from app.core.cache import TTLCache
+from app.services import embedding
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+DEFAULT_MODEL = "text-embedding-3-small"
+
+# Eviction policy: drop entries unused for this many days, and keep at most
+# this many entries (least recently used first).
+EMBEDDING_CACHE_MAX_AGE_DAYS = int(os.getenv("EMBEDDING_CACHE_MAX_AGE_DAYS", "30"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+# In-process cache for chat query embeddings. Set the size to 0 to disable it.
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(
+    os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600")
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class CacheStats:
+    """
+    Process-wide hit/miss counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+stats = CacheStats()
+query_cache = TTLCache(
+    maxsize=QUERY_EMBEDDING_CACHE_SIZE, ttl=QUERY_EMBEDDING_CACHE_TTL_SECONDS
+)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text so that trivially different saves share a cache entry.
+    Applies NFKC (full-width/half-width folding) and collapses whitespace.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def content_hash(text: str) -> str:
+    """
+    Returns the SHA-256 hex digest of the normalized text.
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def get_embeddings_cached(
+    db: Session, texts: list[str], model: str = DEFAULT_MODEL
+) -> list[list[float]]:
+    """
+    Returns embeddings for the texts, calling OpenAI only for cache misses.
+
+    Misses are embedded in one batched call and stored in the
+    `embedding_cache` table, keyed by model, output dimensions
+    (EMBEDDING_DIMENSIONS) and text hash. The normalized text is embedded,
+    so a cached vector depends only on its key.
+
+    Args:
+        db: Database session.
+        texts: The texts to embed.
+        model: The embedding model.
+
+    Returns:
+        One embedding vector per text, in input order.
+    """
+    dimensions = embedding.EMBEDDING_DIMENSIONS
+    hashes = [content_hash(text) for text in texts]
+    cached = crud.get_cached_embeddings(db, model, dimensions, set(hashes))
+
+    missing: dict[str, str] = {}
+    for text, text_hash in zip(texts, hashes, strict=True):
+        if text_hash not in cached and text_hash not in missing:
+            missing[text_hash] = normalize_text(text)
+
+    if missing:
+        vectors = embedding.get_embeddings(list(missing.values()), model=model)
+        new_entries = dict(zip(missing.keys(), vectors, strict=True))
+        crud.create_cached_embeddings(db, model, dimensions, new_entries)
+        cached.update(new_entries)
+
+    stats.record(hits=len(texts) - len(missing), misses=len(missing))
+    return [cached[text_hash] for text_hash in hashes]
+
+
+def get_embedding_cached(
+    db: Session, text: str, model: str = DEFAULT_MODEL
+) -> list[float]:
+    """
+    Single-text variant of get_embeddings_cached.
+    """
+    return get_embeddings_cached(db, [text], model=model)[0]
+
+
+async def get_embeddings_cached_async(
+    db: Session, texts: list[str], model: str = DEFAULT_MODEL
+) -> list[list[float]]:
+    """
+    Async variant of get_embeddings_cached. Cache reads and writes run in the
+    threadpool; the OpenAI call for misses is awaited on the event loop.
+    """
+    dimensions = embedding.EMBEDDING_DIMENSIONS
+    hashes = [content_hash(text) for text in texts]
+    cached = await run_in_threadpool(
+        crud.get_cached_embeddings, db, model, dimensions, set(hashes)
+    )
+
+    missing: dict[str, str] = {}
+    for text, text_hash in zip(texts, hashes, strict=True):
+        if text_hash not in cached and text_hash not in missing:
+            missing[text_hash] = normalize_text(text)
+
+    if missing:
+        vectors = await embedding.get_embeddings_async(
+            list(missing.values()), model=model
+        )
+        new_entries = dict(zip(missing.keys(), vectors, strict=True))
+        await run_in_threadpool(
+            crud.create_cached_embeddings, db, model, dimensions, new_entries
+        )
+        cached.update(new_entries)
+
+    stats.record(hits=len(texts) - len(missing), misses=len(missing))
+    return [cached[text_hash] for text_hash in hashes]
+
+
+def _copy(vector):
+    # Callers get their own copy, so the memoized vector cannot be modified
+    if isinstance(vector, np.ndarray):
+        return vector.copy()
+    return list(vector)
+
+
+def _query_key(text: str, model: str):
+    return (model, embedding.EMBEDDING_DIMENSIONS, normalize_text(text))
+
+
+def get_query_embedding(text: str, model: str = DEFAULT_MODEL) -> list[float]:
+    """
+    Returns the embedding of a search query, memoized in process memory.
+
+    Chat queries are short and often repeated, so they are served from a
+    bounded LRU+TTL cache instead of the database-backed cache.
+
+    Args:
+        text: The query text.
+        model: The embedding model.
+
+    Returns:
+        The embedding vector.
+    """
+    key = _query_key(text, model)
+    vector = query_cache.get(key)
+    if vector is None:
+        vector = embedding.get_embedding(text, model=model)
+        query_cache.set(key, vector)
+    return _copy(vector)
+
+
+async def get_query_embedding_async(
+    text: str, model: str = DEFAULT_MODEL
+) -> list[float]:
+    """
+    Async variant of get_query_embedding.
+    """
+    key = _query_key(text, model)
+    vector = query_cache.get(key)
+    if vector is None:
+        vector = await embedding.get_embedding_async(text, model=model)
+        query_cache.set(key, vector)
+    return _copy(vector)
+
+
+async def get_query_embeddings_async(
+    texts: list[str], model: str = DEFAULT_MODEL
+) -> list[list[float]]:
+    """
+    Returns the embeddings of several search queries, in input order. Queries
+    missing from the memo are embedded together in one API call.
+    """
+    keys = [_query_key(text, model) for text in texts]
+    vectors = {key: query_cache.get(key) for key in keys}
+    missing = {key: text for key, text in zip(keys, texts, strict=True)}
+    missing = {key: text for key, text in missing.items() if vectors[key] is None}
+    if missing:
+        embedded = await embedding.get_embeddings_async(
+            list(missing.values()), model=model
+        )
+        for key, vector in zip(missing, embedded, strict=True):
+            vectors[key] = vector
+            query_cache.set(key, vector)
+    return [_copy(vectors[key]) for key in keys]
+
+
+def evict(db: Session) -> int:
+    """
+    Applies the configured eviction policy. Returns the number of evicted rows.
+    """
+    return crud.evict_embedding_cache(
+        db,
+        max_age=timedelta(days=EMBEDDING_CACHE_MAX_AGE_DAYS),
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+    )
+
+
+def get_cache_stats() -> dict:
+    """
+    Returns the process-wide hit/miss counters.
+    """
+    return stats.snapshot()
+
+
+def get_query_cache_stats() -> dict:
+    """
+    Returns size and hit/miss counters of the query embedding cache.
+    """
+    return query_cache.stats()
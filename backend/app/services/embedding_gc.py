@@ -0,0 +1,54 @@
+import logging
+import os
+import time
+from datetime import timedelta
+
+from app import crud
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+ORPHAN_SWEEP_BATCH_SIZE = int(os.getenv("ORPHAN_SWEEP_BATCH_SIZE", "500"))
+# Grace period before an unreferenced embedding counts as orphaned
+ORPHAN_SWEEP_MIN_AGE_MINUTES = int(os.getenv("ORPHAN_SWEEP_MIN_AGE_MINUTES", "10"))
+
+
+def sweep_orphaned_embeddings(
+    db: Session,
+    batch_size: int = ORPHAN_SWEEP_BATCH_SIZE,
+    min_age: timedelta = timedelta(minutes=ORPHAN_SWEEP_MIN_AGE_MINUTES),
+    pause_seconds: float = 0.0,
+    max_batches: int | None = None,
+) -> dict:
+    """
+    Deletes answer embeddings that no UserAnswer references, in batches.
+
+    Each batch is its own short transaction and skips rows locked by
+    concurrent writers, so the sweep can run alongside the web app.
+
+    Args:
+        db: Database session.
+        batch_size: Rows deleted per transaction.
+        min_age: Only rows older than this are considered.
+        pause_seconds: Sleep between batches to limit load.
+        max_batches: Stop after this many batches (None = until done).
+
+    Returns:
+        dict with the number of batches, deleted rows and reclaimed bytes.
+    """
+    report = {"batches": 0, "rows": 0, "bytes": 0}
+    while max_batches is None or report["batches"] < max_batches:
+        rows, size = crud.delete_orphaned_rag_embeddings(db, batch_size, min_age)
+        report["batches"] += 1
+        report["rows"] += rows
+        report["bytes"] += size
+        if rows < batch_size:
+            break
+        if pause_seconds:
+            time.sleep(pause_seconds)
+
+    logger.info(
+        f"Orphaned embedding sweep deleted {report['rows']} rows "
+        f"({report['bytes']} bytes) in {report['batches']} batches"
+    )
+    return report
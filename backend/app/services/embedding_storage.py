@@ -0,0 +1,366 @@
+"""
+Converts stored embeddings to another storage mode (EMBEDDING_STORAGE /
+EMBEDDING_DIMENSIONS in app.core.vector).
+
+text-embedding-3 vectors can be shortened by keeping their leading elements
+and re-normalizing, which is what the API's dimensions parameter does, so
+existing rows are converted in place instead of being re-embedded. Going to
+more dimensions than are stored needs re-embedding and is refused.
+
+The conversion has two phases around the deploy of the new settings:
+
+1. (backfill_embeddings, while the app keeps writing with the old settings)
+   A new column of the target type is added, and a trigger clears it when a
+   row's embedding is updated.
+2. Rows are converted in short batches, each committed on its own.
+3. (swap_embeddings, with every process of the old settings stopped) Under a
+   write lock, rows written in the meantime are converted, the old column
+   and its index are dropped and the new column takes its name. The binary
+   signatures (embedding_bits), if any, keep their leading bits, and
+   embedding_cache entries move to the new dimensions key. The app binds
+   embeddings with the configured type and dimensions, so an app on the old
+   settings fails against the swapped column and one on the new settings
+   fails against the old column: start it again only after this.
+4. (rebuild_index, the app may already run) The HNSW index is rebuilt with
+   CREATE INDEX CONCURRENTLY. This also happens on its own when
+   VECTOR_SEARCH_METRIC changes its operator class.
+
+Dropped columns keep their space until the rows are rewritten; run
+VACUUM FULL or pg_repack afterwards to return it to the operating system.
+"""
+
+import os
+import re
+
+from app.core.vector import (
+    VECTOR_SEARCH_METRIC,
+    distance_ops,
+    embedding_type,
+    shorten_embedding,
+)
+from sqlalchemy import bindparam, column, text
+from sqlalchemy.orm import Session
+
+EMBEDDING_STORAGE_BATCH_SIZE = int(os.getenv("EMBEDDING_STORAGE_BATCH_SIZE", "500"))
+
+# halfvec columns and indexes need pgvector 0.7.0+
+HALFVEC_MIN_VERSION = (0, 7, 0)
+
+_COLUMN_TYPE = re.compile(r"^(vector|halfvec)\((\d+)\)$")
+_CONVERTED_COLUMN = "embedding_converted"
+
+
+_pgvector_versions: dict[str, tuple[int, ...]] = {}
+
+
+def pgvector_version(db: Session) -> tuple[int, ...]:
+    """
+    The server's pgvector version, e.g. (0, 7, 4), looked up once per database.
+    """
+    url = str(db.get_bind().engine.url)
+    if url not in _pgvector_versions:
+        version = db.execute(
+            text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        ).scalar_one()
+        _pgvector_versions[url] = tuple(int(part) for part in version.split("."))
+    return _pgvector_versions[url]
+
+
+def column_storage(db: Session, table: str) -> tuple[str, int]:
+    """
+    Returns the (storage, dimensions) of table.embedding.
+    """
+    declared = db.execute(
+        text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = CAST(:table AS regclass) AND attname = 'embedding' "
+            "AND NOT attisdropped"
+        ),
+        {"table": table},
+    ).scalar_one()
+    match = _COLUMN_TYPE.match(declared)
+    if match is None:
+        raise ValueError(f"Unsupported embedding column type: {declared}")
+    return match.group(1), int(match.group(2))
+
+
+def _has_column(db: Session, table: str, name: str) -> bool:
+    return (
+        db.execute(
+            text(
+                "SELECT 1 FROM pg_attribute WHERE attrelid = CAST(:table AS regclass) "
+                "AND attname = :name AND NOT attisdropped"
+            ),
+            {"table": table, "name": name},
+        ).scalar()
+        is not None
+    )
+
+
+def _convert_pending(
+    db: Session,
+    table: str,
+    source,
+    target,
+    dimensions: int,
+    batch_size: int,
+    commit: bool,
+) -> int:
+    """
+    Fills the converted column for rows where it is NULL, in id order.
+    Returns the number of rows converted.
+    """
+    select_batch = text(
+        f"SELECT id, embedding FROM {table} "
+        f"WHERE {_CONVERTED_COLUMN} IS NULL AND id > :last_id "
+        "ORDER BY id LIMIT :limit"
+    ).columns(column("id"), column("embedding", source))
+    update_batch = text(
+        f"UPDATE {table} SET {_CONVERTED_COLUMN} = :embedding WHERE id = :row_id"
+    ).bindparams(bindparam("embedding", type_=target))
+
+    converted = 0
+    last_id = "00000000-0000-0000-0000-000000000000"
+    while True:
+        rows = db.execute(select_batch, {"last_id": last_id, "limit": batch_size})
+        rows = rows.all()
+        if not rows:
+            return converted
+        db.execute(
+            update_batch,
+            [
+                {
+                    "row_id": row.id,
+                    "embedding": shorten_embedding(row.embedding, dimensions),
+                }
+                for row in rows
+            ],
+        )
+        if commit:
+            db.commit()
+        converted += len(rows)
+        last_id = rows[-1].id
+
+
+def _plan_conversion(db: Session, table: str, storage: str, dimensions: int):
+    """
+    Returns the report started for the conversion of table.embedding to
+    storage(dimensions) and whether there is anything to convert.
+
+    Raises:
+        ValueError: If the target has more dimensions than are stored.
+        RuntimeError: If halfvec is requested and pgvector is too old.
+    """
+    current_storage, current_dimensions = column_storage(db, table)
+    report = {
+        "from": f"{current_storage}({current_dimensions})",
+        "to": f"{storage}({dimensions})",
+        "rows": 0,
+    }
+    if (current_storage, current_dimensions) == (storage, dimensions):
+        return report, False
+    if dimensions > current_dimensions:
+        raise ValueError(
+            f"Cannot convert {report['from']} to {report['to']}: "
+            "more dimensions need re-embedding"
+        )
+    if storage == "halfvec" and pgvector_version(db) < HALFVEC_MIN_VERSION:
+        raise RuntimeError("halfvec storage needs pgvector 0.7.0 or later")
+    return report, True
+
+
+def backfill_embeddings(
+    db: Session,
+    table: str,
+    storage: str,
+    dimensions: int,
+    batch_size: int = EMBEDDING_STORAGE_BATCH_SIZE,
+) -> dict:
+    """
+    First phase of the conversion of table.embedding to storage(dimensions):
+    fills the converted column (steps 1 and 2 of the module docstring). The
+    embedding column is left as it is, so the app keeps running with the old
+    settings meanwhile. Can be re-run; converted rows are skipped.
+
+    Returns:
+        dict with the previous type, the new type and the converted row count.
+    """
+    report, needed = _plan_conversion(db, table, storage, dimensions)
+    if not needed:
+        return report
+    source = embedding_type(*column_storage(db, table))
+    target = embedding_type(storage, dimensions)
+    trigger = f"{table}_{_CONVERTED_COLUMN}_reset"
+
+    db.execute(
+        text(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS "
+            f"{_CONVERTED_COLUMN} {storage}({dimensions})"
+        )
+    )
+    db.execute(
+        text(
+            f"CREATE OR REPLACE FUNCTION {trigger}() RETURNS trigger "
+            "LANGUAGE plpgsql AS "
+            f"$$ BEGIN NEW.{_CONVERTED_COLUMN} := NULL; RETURN NEW; END $$"
+        )
+    )
+    db.execute(text(f"DROP TRIGGER IF EXISTS {trigger} ON {table}"))
+    db.execute(
+        text(
+            f"CREATE TRIGGER {trigger} BEFORE UPDATE OF embedding ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {trigger}()"
+        )
+    )
+    db.commit()
+
+    report["rows"] = _convert_pending(
+        db, table, source, target, dimensions, batch_size, commit=True
+    )
+    return report
+
+
+def swap_embeddings(
+    db: Session,
+    table: str,
+    storage: str,
+    dimensions: int,
+    index_name: str | None = None,
+    batch_size: int = EMBEDDING_STORAGE_BATCH_SIZE,
+) -> dict:
+    """
+    Second phase: converts the rows written since backfill_embeddings and
+    swaps the columns in one transaction (step 3 of the module docstring).
+    From the commit on, the column only accepts the new shape, so no process
+    running with the old settings may be left. Drops index_name; rebuild it
+    with rebuild_index.
+
+    Returns:
+        dict with the previous type, the new type and the converted row count.
+
+    Raises:
+        RuntimeError: If backfill_embeddings has not been run.
+    """
+    report, needed = _plan_conversion(db, table, storage, dimensions)
+    if not needed:
+        return report
+    if not _has_column(db, table, _CONVERTED_COLUMN):
+        raise RuntimeError(f"{table}: run the backfill before the swap")
+    current_storage, current_dimensions = column_storage(db, table)
+    source = embedding_type(current_storage, current_dimensions)
+    target = embedding_type(storage, dimensions)
+    trigger = f"{table}_{_CONVERTED_COLUMN}_reset"
+
+    # Block writers, catch up on rows written during the backfill
+    db.execute(text(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE"))
+    report["rows"] = _convert_pending(
+        db, table, source, target, dimensions, batch_size, commit=False
+    )
+    if index_name is not None:
+        db.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+    db.execute(text(f"DROP TRIGGER {trigger} ON {table}"))
+    db.execute(text(f"DROP FUNCTION {trigger}()"))
+    db.execute(text(f"ALTER TABLE {table} DROP COLUMN embedding"))
+    db.execute(
+        text(f"ALTER TABLE {table} RENAME COLUMN {_CONVERTED_COLUMN} TO embedding")
+    )
+    db.execute(text(f"ALTER TABLE {table} ALTER COLUMN embedding SET NOT NULL"))
+    if dimensions != current_dimensions and _has_column(db, table, "embedding_bits"):
+        # Sign bits survive truncation and re-normalization: keep the leading
+        # ones (casting to a shorter bit(n) truncates on the right)
+        db.execute(
+            text(
+                f"ALTER TABLE {table} ALTER COLUMN embedding_bits "
+                f"TYPE bit({dimensions}) USING embedding_bits::bit({dimensions})"
+            )
+        )
+    if _has_column(db, table, "dimensions"):
+        # Cache entries keyed by output size: the shortened vectors are what
+        # the API returns for the new size
+        db.execute(
+            text(f"UPDATE {table} SET dimensions = :dimensions"),
+            {"dimensions": dimensions},
+        )
+    db.commit()
+    return report
+
+
+def convert_embeddings(
+    db: Session,
+    table: str,
+    storage: str,
+    dimensions: int,
+    index_name: str | None = None,
+    batch_size: int = EMBEDDING_STORAGE_BATCH_SIZE,
+) -> dict:
+    """
+    Converts table.embedding to storage(dimensions): backfill_embeddings,
+    swap_embeddings and rebuild_index in a row. Only for when no app process
+    runs with the old settings during the swap.
+
+    Args:
+        db: Database session. Commits after every batch.
+        table: Table with an id primary key and an embedding column.
+        storage: "vector" or "halfvec".
+        dimensions: Target number of dimensions.
+        index_name: HNSW index on the column, rebuilt for the new type or
+            VECTOR_SEARCH_METRIC (see rebuild_index).
+        batch_size: Rows converted per transaction.
+
+    Returns:
+        dict with the previous type, the new type, the converted row count
+        and, with index_name, whether the index was rebuilt.
+
+    Raises:
+        ValueError: If the target has more dimensions than are stored.
+        RuntimeError: If halfvec is requested and pgvector is too old.
+    """
+    report = backfill_embeddings(db, table, storage, dimensions, batch_size)
+    swapped = swap_embeddings(db, table, storage, dimensions, index_name, batch_size)
+    report["rows"] += swapped["rows"]
+    if index_name is not None:
+        report["index_rebuilt"] = rebuild_index(db, table, index_name, storage)
+    return report
+
+
+def rebuild_index(
+    db: Session,
+    table: str,
+    index_name: str,
+    storage: str,
+    metric: str = VECTOR_SEARCH_METRIC,
+) -> bool:
+    """
+    (Re)builds the HNSW index on table.embedding unless it already uses the
+    operator class for storage and metric. The new index is built
+    CONCURRENTLY under a temporary name and then replaces the old one, so
+    searches keep an index throughout.
+
+    Returns:
+        True if an index was built.
+    """
+    ops = distance_ops(storage, metric)
+    definition = db.execute(
+        text("SELECT indexdef FROM pg_indexes WHERE indexname = :name"),
+        {"name": index_name},
+    ).scalar()
+    db.commit()
+    if definition is not None and ops in definition:
+        return False
+
+    with (
+        db.get_bind()
+        .connect()
+        .execution_options(isolation_level="AUTOCOMMIT") as connection
+    ):
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}_new"))
+        connection.execute(
+            text(
+                f"CREATE INDEX CONCURRENTLY {index_name}_new "
+                f"ON {table} USING hnsw (embedding {ops}) "
+                "WITH (m = 16, ef_construction = 64)"
+            )
+        )
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+        connection.execute(text(f"ALTER INDEX {index_name}_new RENAME TO {index_name}"))
+    return True
@@ -0,0 +1,74 @@
+"""
+Chunked ingestion of free texts (memos) into rag_embeddings.
+"""
+
+import os
+import uuid
+from collections.abc import Iterable
+from itertools import islice
+
+from app import crud
+from app.services import chunking, embedding_cache
+from sqlalchemy.orm import Session
+
+# Chunks embedded and inserted together. Bounds the chunks, vectors and rows
+# held in memory for a long text.
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+
+
+def ingest_text(
+    db: Session,
+    user_id: uuid.UUID,
+    text: str | Iterable[str],
+    source_type: str = "memo",
+    weight: float = 1.0,
+) -> tuple[uuid.UUID, list[uuid.UUID]]:
+    """
+    Splits the text into chunks (see services.chunking) and stores one
+    RagEmbedding row per chunk. Chunks are consumed from the chunker in
+    batches of INGEST_BATCH_SIZE, each embedded in one batched call and
+    inserted before the next is read. The rows share a new source_id, which
+    search uses to collapse chunk hits back to their text.
+
+    The embedding cache commits the session, so earlier batches may already
+    be committed when a later one fails; they are deleted again before the
+    error is re-raised.
+
+    Args:
+        db: Database session
+        user_id: Owner of the text
+        text: The text to store, or an iterable of its pieces
+        source_type: source_type of the rows
+        weight: Search weight of the rows
+
+    Returns:
+        The source_id and the ids of the chunk rows, in text order
+    """
+    chunks = chunking.iter_chunks(text)
+    source_id = uuid.uuid4()
+    ids = []
+    try:
+        while batch := list(islice(chunks, INGEST_BATCH_SIZE)):
+            embeddings = embedding_cache.get_embeddings_cached(db, batch)
+            ids += crud.bulk_create_rag_embeddings(
+                db,
+                [
+                    {
+                        "user_id": user_id,
+                        "content": chunk,
+                        "embedding": vector,
+                        "source_type": source_type,
+                        "source_id": source_id,
+                        "weight": weight,
+                    }
+                    for chunk, vector in zip(batch, embeddings, strict=True)
+                ],
+            )
+    except Exception:
+        db.rollback()
+        if ids:
+            crud.delete_rag_embeddings_by_source(db, user_id, source_id)
+            db.commit()
+        raise
+    db.commit()
+    return source_id, ids
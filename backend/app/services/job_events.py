@@ -0,0 +1,79 @@
+"""
+Notifications of analysis job state changes, for status long-polling.
+
+Jobs change state in worker processes, so the change is published with
+Postgres NOTIFY on CHANNEL, with the user id as payload (sent by the crud
+functions that change a job, delivered on commit). Each web process keeps a
+single LISTEN connection, read by a background thread, and wakes the
+requests waiting on that user. Waiting requests therefore hold no database
+connection of their own.
+"""
+
+import asyncio
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from uuid import UUID
+
+from app.core.pg_listen import PgListener
+from app.database import engine
+
+CHANNEL = "analysis_jobs"
+
+_Waiter = tuple[asyncio.AbstractEventLoop, asyncio.Event]
+
+
+class JobEventListener:
+    """
+    Fans NOTIFY messages on CHANNEL out to asyncio waiters, per user.
+    The listener thread starts with the first subscription.
+    """
+
+    def __init__(self, engine):
+        self._lock = threading.Lock()
+        self._waiters: dict[str, set[_Waiter]] = {}
+        # Wakes everyone after a reconnect: changes may have been missed
+        self._listener = PgListener(
+            engine, CHANNEL, self.publish, on_reset=self.publish
+        )
+
+    @contextmanager
+    def subscribe(self, user_id: UUID) -> Iterator[asyncio.Event]:
+        """
+        Yields an event that is set whenever a job of the user changes state.
+        Subscribe before reading the state, so no change is missed in between.
+        Must be used from a running event loop.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        key = str(user_id)
+        self._listener.start()
+        with self._lock:
+            self._waiters.setdefault(key, set()).add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self._lock:
+                waiters = self._waiters[key]
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[key]
+
+    def publish(self, user_id: str | UUID | None = None) -> None:
+        """
+        Wakes the waiters of user_id, or all waiters if it is None.
+        """
+        with self._lock:
+            if user_id is None:
+                waiters = [w for group in self._waiters.values() for w in group]
+            else:
+                waiters = list(self._waiters.get(str(user_id), ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's loop has been closed
+                pass
+
+
+# Process-wide listener on the application's engine
+listener = JobEventListener(engine)
@@ -0,0 +1,31 @@
+"""
+Character bigrams for the lexical search channel.
+
+Japanese has no spaces between words, so instead of a tokenizer the text is
+split into overlapping two-character grams ("粘り強さ" -> 粘り, り強, 強さ).
+rag_embeddings.content_bigrams stores them and a GIN index answers
+"rows sharing any of these grams" without a full scan.
+"""
+
+import re
+import unicodedata
+
+# Runs of letters and digits (any script). Punctuation and spaces end a run,
+# so grams never span "。" or "、".
+_WORD_RUN = re.compile(r"\w+")
+
+
+def text_bigrams(text: str) -> list[str]:
+    """
+    Returns the distinct character bigrams of text, in first-seen order.
+    Text is NFKC-normalized and lowercased first, so full-width "ＰＹＴＨＯＮ"
+    and "python" share grams. One-character runs are kept as they are.
+    """
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    grams: dict[str, None] = {}
+    for run in _WORD_RUN.findall(normalized):
+        if len(run) == 1:
+            grams[run] = None
+        for i in range(len(run) - 1):
+            grams[run[i : i + 2]] = None
+    return list(grams)
@@ -1,5 +1,5 @@
 import openai
-from app.core.openai import client
+from app.core.openai import async_client, client, get_async_semaphore
 from pydantic import BaseModel
 
 
@@ -72,3 +72,78 @@ def generate_structured_response(
         raise RuntimeError(f"OpenAI API Error: {exc!s}") from exc
     except Exception as exc:
         raise RuntimeError(f"OpenAI API Error: {exc!s}") from exc
+
+
+async def generate_response_async(
+    prompt: str,
+    model_name: str = "gpt-4o-mini",
+    system_instruction: str | None = "You are a helpful assistant.",
+    temperature: float | None = None,
+) -> str:
+    """
+    Async variant of generate_response. Concurrent requests are bounded by
+    OPENAI_MAX_CONCURRENCY.
+
+    Args:
+        prompt (str): The user's input prompt.
+        model_name (str): The model to use. Defaults to "gpt-4o-mini".
+        system_instruction (str | None): System instruction for the AI.
+            No system message is sent when None.
+        temperature (float | None): Sampling temperature. API default when None.
+
+    Returns:
+        str: The generated response text.
+
+    Raises:
+        RuntimeError: If the API call fails.
+    """
+    messages = [{"role": "user", "content": prompt}]
+    if system_instruction is not None:
+        messages.insert(0, {"role": "system", "content": system_instruction})
+    kwargs = {} if temperature is None else {"temperature": temperature}
+    try:
+        async with get_async_semaphore():
+            response = await async_client.chat.completions.create(
+                model=model_name, messages=messages, **kwargs
+            )
+        return response.choices[0].message.content
+    except openai.APIStatusError as exc:
+        raise RuntimeError(f"OpenAI API Error: {exc!s}") from exc
+    except Exception as exc:
+        raise RuntimeError(f"OpenAI API Error: {exc!s}") from exc
+
+
+async def generate_structured_response_async(
+    prompt: str,
+    response_model: type[BaseModel],
+    model_name: str = "gpt-4o-mini",
+    system_instruction: str = "You are a helpful assistant.",
+    openai_client: openai.AsyncOpenAI | None = None,
+) -> BaseModel:
+    """
+    Async variant of generate_structured_response. Concurrent requests are
+    bounded by OPENAI_MAX_CONCURRENCY.
+
+    Args:
+        openai_client (openai.AsyncOpenAI | None): Client to use instead of
+            the shared async_client, e.g. one from create_async_client.
+
+    Raises:
+        RuntimeError: If the API call fails.
+    """
+    openai_client = openai_client or async_client
+    try:
+        async with get_async_semaphore():
+            completion = await openai_client.beta.chat.completions.parse(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": system_instruction},
+                    {"role": "user", "content": prompt},
+                ],
+                response_format=response_model,
+            )
+        return completion.choices[0].message.parsed
+    except openai.APIStatusError as exc:
+        raise RuntimeError(f"OpenAI API Error: {exc!s}") from exc
+    except Exception as exc:
+        raise RuntimeError(f"OpenAI API Error: {exc!s}") from exc
@@ -0,0 +1,226 @@
+"""
+Per-user in-memory vector index.
+
+A user's RAG corpus is small (tens to a few thousand rows), so it fits in a
+contiguous float32 matrix. Queries are scored with one matrix-vector product
+instead of a pgvector round-trip. Indexes are dropped whenever the CRUD layer
+writes the user's rag_embeddings rows (see invalidate_on_commit). Writes made
+by other processes (other web workers, the analysis worker, CLI scripts) are
+caught by the user's corpus_version, which every write bumps: a cached index
+is only used while the version it was built at is current.
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from uuid import UUID
+
+import numpy as np
+from app import models
+from app.core.cache import TTLCache
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+# Number of users whose index is kept in memory. 0 disables the cache.
+VECTOR_INDEX_CACHE_SIZE = int(os.getenv("VECTOR_INDEX_CACHE_SIZE", "256"))
+VECTOR_INDEX_TTL_SECONDS = float(os.getenv("VECTOR_INDEX_TTL_SECONDS", "600"))
+# Users with more rows than this are left to the database search.
+VECTOR_INDEX_MAX_ROWS = int(os.getenv("VECTOR_INDEX_MAX_ROWS", "20000"))
+
+_DIRTY_USERS_KEY = "vector_index_dirty_users"
+
+
+@dataclass(frozen=True)
+class UserVectorIndex:
+    """
+    Embeddings of one user, L2-normalized so that a dot product is the cosine
+    similarity that pgvector's <=> operator is based on.
+
+    parents numbers each row's parent (the chunks of one memo share a
+    source_id); search returns the best row of each parent only.
+    """
+
+    ids: list[UUID]
+    contents: list[str]
+    source_types: list[str]
+    source_ids: list[UUID | None]
+    matrix: np.ndarray  # (rows, dimensions) float32, C-contiguous
+    weights: np.ndarray  # (rows,) float32
+    parents: np.ndarray  # (rows,) int64
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(
+        self, query_embedding, limit: int, similarity_threshold: float = 0.0
+    ) -> list[tuple[int, float]]:
+        """
+        Returns (row position, similarity * weight) pairs, best first.
+        """
+        if limit <= 0 or not self.ids:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        scores = (self.matrix @ (query / norm)) * self.weights
+
+        if self.parents[-1] < len(self.parents) - 1:
+            # Some rows share a parent: keep the first of each in score order
+            order = np.argsort(-scores, kind="stable")
+            _, first = np.unique(self.parents[order], return_index=True)
+            top = order[np.sort(first)][:limit]
+        elif limit < len(scores):
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (int(position), float(scores[position]))
+            for position in top
+            if scores[position] >= similarity_threshold
+        ]
+
+
+# Marker for users whose corpus exceeds VECTOR_INDEX_MAX_ROWS
+TOO_LARGE = object()
+
+# user_id -> (corpus_version, UserVectorIndex or TOO_LARGE)
+index_cache = TTLCache(maxsize=VECTOR_INDEX_CACHE_SIZE, ttl=VECTOR_INDEX_TTL_SECONDS)
+
+# Bumped on every invalidation. A load that raced with a write is not cached,
+# because it may have read the rows from before the write.
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def build_index(rows) -> UserVectorIndex:
+    """
+    Builds an index from (id, content, source_type, weight, embedding,
+    source_id) rows.
+    """
+    rows = list(rows)
+    # Parents are numbered in order of first appearance, so the last number
+    # is below len(rows) - 1 exactly when some rows share a parent
+    numbers: dict = {}
+    parents = np.array(
+        [
+            numbers.setdefault(row[0] if row[5] is None else row[5], len(numbers))
+            for row in rows
+        ],
+        dtype=np.int64,
+    )
+    if rows:
+        matrix = np.ascontiguousarray(
+            np.stack([np.asarray(row[4], dtype=np.float32) for row in rows])
+        )
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # Zero vectors have no direction; leave them at similarity 0
+        matrix /= np.where(norms == 0, 1.0, norms)
+    else:
+        matrix = np.empty((0, 0), dtype=np.float32)
+    return UserVectorIndex(
+        ids=[row[0] for row in rows],
+        contents=[row[1] for row in rows],
+        source_types=[row[2] for row in rows],
+        source_ids=[row[5] for row in rows],
+        matrix=matrix,
+        weights=np.array(
+            [1.0 if row[3] is None else row[3] for row in rows], dtype=np.float32
+        ),
+        parents=parents,
+    )
+
+
+def load_index(db: Session, user_id: UUID, max_rows: int | None = None):
+    """
+    Reads the user's rows into an index, or returns TOO_LARGE if the user has
+    more than max_rows (default VECTOR_INDEX_MAX_ROWS).
+    """
+    if max_rows is None:
+        max_rows = VECTOR_INDEX_MAX_ROWS
+    rows = db.execute(
+        select(
+            models.RagEmbedding.id,
+            models.RagEmbedding.content,
+            models.RagEmbedding.source_type,
+            models.RagEmbedding.weight,
+            models.RagEmbedding.embedding,
+            models.RagEmbedding.source_id,
+        )
+        .filter(models.RagEmbedding.user_id == user_id)
+        .limit(max_rows + 1)
+    ).all()
+    if len(rows) > max_rows:
+        return TOO_LARGE
+    return build_index(rows)
+
+
+def get_index(
+    db: Session, user_id: UUID, corpus_version: int | None = None
+) -> UserVectorIndex | None:
+    """
+    Returns the user's cached index, loading it on a miss or when the user's
+    corpus_version has changed since it was built. Pass the version if the
+    caller has read it already; otherwise it is looked up here (one
+    primary-key lookup). Returns None when the corpus is too large for an
+    in-memory index.
+    """
+    version = corpus_version
+    if version is None:
+        version = db.execute(
+            select(models.User.corpus_version).where(models.User.id == user_id)
+        ).scalar_one_or_none()
+    cached = index_cache.get(user_id)
+    if cached is not None and cached[0] == version:
+        index = cached[1]
+    else:
+        with _generation_lock:
+            generation = _generation
+        # Read after the version: a write in between makes the entry look
+        # stale on the next lookup, never fresh
+        index = load_index(db, user_id)
+        with _generation_lock:
+            if generation == _generation:
+                index_cache.set(user_id, (version, index))
+    return None if index is TOO_LARGE else index
+
+
+def invalidate(*user_ids: UUID):
+    """
+    Drops the cached indexes of the given users.
+    """
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        for user_id in user_ids:
+            index_cache.pop(user_id)
+
+
+def invalidate_on_commit(db: Session, *user_ids: UUID):
+    """
+    Drops the users' indexes now and again once the session commits, so a
+    concurrent reader cannot cache rows from before the write.
+    """
+    invalidate(*user_ids)
+    db.info.setdefault(_DIRTY_USERS_KEY, set()).update(user_ids)
+
+
+def has_pending_writes(db: Session, user_id: UUID) -> bool:
+    """
+    Whether the session has uncommitted writes to the user's rows.
+    """
+    return user_id in db.info.get(_DIRTY_USERS_KEY, ())
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    dirty = session.info.pop(_DIRTY_USERS_KEY, None)
+    if dirty:
+        invalidate(*dirty)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _invalidate_rolled_back(session, previous_transaction):
+    # Drops anything this session cached from its own uncommitted writes
+    _invalidate_committed(session)
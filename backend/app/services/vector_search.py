@@ -1,8 +1,463 @@
+import hashlib
+import os
+from functools import lru_cache
 from uuid import UUID
 
-from app import models, schemas
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+import numpy as np
+from app import crud, models, schemas
+from app.core import vector
+from app.core.cache import TTLCache
+from app.core.vector import (
+    EMBEDDING_DIMENSIONS,
+    binary_quantize,
+    embedding_type,
+    normalize_embedding,
+)
+from app.services import embedding_storage, lexical, vector_index
+from pgvector.sqlalchemy import BIT
+from sqlalchemy import (
+    ARRAY,
+    Integer,
+    Text,
+    any_,
+    bindparam,
+    cast,
+    column,
+    func,
+    select,
+    text,
+    true,
+    values,
+)
+from sqlalchemy.orm import Session, aliased
+
+# HNSW candidate list size per query (pgvector default: 40). Higher values
+# improve recall at the cost of latency.
+VECTOR_SEARCH_EF_SEARCH = int(os.getenv("VECTOR_SEARCH_EF_SEARCH", "100"))
+# Keep scanning the HNSW graph when filters (user_id) remove candidates:
+# "off", "relaxed_order" or "strict_order". Requires pgvector 0.8.0+.
+VECTOR_SEARCH_ITERATIVE_SCAN = os.getenv(
+    "VECTOR_SEARCH_ITERATIVE_SCAN", "relaxed_order"
+)
+
+# Approximate (index) search fetches limit * multiplier nearest candidates by
+# raw distance, then applies weights and the threshold in Python.
+VECTOR_SEARCH_CANDIDATE_MULTIPLIER = int(
+    os.getenv("VECTOR_SEARCH_CANDIDATE_MULTIPLIER", "4")
+)
+# Users with at most this many rows are searched exactly: a user_id index
+# scan plus sort is cheap and avoids filtered-HNSW recall loss.
+VECTOR_SEARCH_EXACT_MAX_ROWS = int(os.getenv("VECTOR_SEARCH_EXACT_MAX_ROWS", "5000"))
+
+# Binary prefilter: shortlist limit * multiplier rows by Hamming distance of
+# the 1-bit signatures (rag_embeddings.embedding_bits), then rank the
+# shortlist exactly on the full vectors. When enabled, "auto" uses it instead
+# of the HNSW search on full vectors for large corpora.
+VECTOR_SEARCH_BINARY_PREFILTER = os.getenv(
+    "VECTOR_SEARCH_BINARY_PREFILTER", "false"
+).lower() in {"1", "true", "yes"}
+VECTOR_SEARCH_BINARY_CANDIDATE_MULTIPLIER = int(
+    os.getenv("VECTOR_SEARCH_BINARY_CANDIDATE_MULTIPLIER", "20")
+)
+
+# "database" searches with pgvector. "memory" serves users small enough for
+# services/vector_index from a cached in-process matrix.
+VECTOR_SEARCH_BACKEND = os.getenv("VECTOR_SEARCH_BACKEND", "database")
+
+# Results of search_similar_items, keyed by the user's corpus_version. A write
+# bumps the version, so stale entries are simply never looked up again.
+# Set the size to 0 to disable the cache.
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "2048"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "600"))
+
+retrieval_cache = TTLCache(
+    maxsize=RETRIEVAL_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL_SECONDS
+)
+
+# Whether a user's corpus is small enough for the exact plan, keyed by their
+# corpus_version, so plan_search counts rows only after a write.
+SEARCH_PLAN_CACHE_SIZE = int(os.getenv("SEARCH_PLAN_CACHE_SIZE", "4096"))
+
+search_plan_cache = TTLCache(
+    maxsize=SEARCH_PLAN_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL_SECONDS
+)
+
+# MMR diversification: candidates fetched before re-ranking, and the
+# relevance/diversity trade-off (1 = relevance only).
+MMR_POOL_SIZE = int(os.getenv("MMR_POOL_SIZE", "20"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+
+# Hybrid search: candidates taken from each channel, and the k constant of
+# reciprocal rank fusion (score = sum of 1 / (k + rank) over the channels).
+HYBRID_SEARCH_CANDIDATES = int(os.getenv("HYBRID_SEARCH_CANDIDATES", "50"))
+HYBRID_SEARCH_RRF_K = int(os.getenv("HYBRID_SEARCH_RRF_K", "60"))
+
+_ITERATIVE_SCAN_MODES = {"off", "relaxed_order", "strict_order"}
+_SEARCH_MODES = {"auto", "exact", "approximate", "binary"}
+_SEARCH_BACKENDS = {"database", "memory"}
+
+
+def _supports_iterative_scan(db: Session) -> bool:
+    """
+    Whether the server's pgvector has hnsw.iterative_scan (0.8.0+).
+    Older versions reject the setting, so it is only sent when supported.
+    """
+    return embedding_storage.pgvector_version(db) >= (0, 8)
+
+
+def apply_search_settings(
+    db: Session,
+    ef_search: int | None = None,
+    iterative_scan: str | None = None,
+):
+    """
+    Sets HNSW search parameters for the current transaction only (SET LOCAL),
+    so they never leak into other queries on the pooled connection.
+
+    Args:
+        db: Database session
+        ef_search: hnsw.ef_search value, or None to keep the server default
+        iterative_scan: hnsw.iterative_scan mode, or None to keep the default
+    """
+    if ef_search is not None:
+        db.execute(
+            text("SELECT set_config('hnsw.ef_search', :value, true)"),
+            {"value": str(ef_search)},
+        )
+    if iterative_scan is not None:
+        if iterative_scan not in _ITERATIVE_SCAN_MODES:
+            raise ValueError(f"Invalid iterative_scan mode: {iterative_scan}")
+        if _supports_iterative_scan(db):
+            db.execute(
+                text("SELECT set_config('hnsw.iterative_scan', :value, true)"),
+                {"value": iterative_scan},
+            )
+
+
+def count_user_items(db: Session, user_id: UUID, cap: int) -> int:
+    """
+    Counts the user's rows, stopping at cap + 1 so large corpora stay cheap.
+    """
+    capped = (
+        select(models.RagEmbedding.id)
+        .filter(models.RagEmbedding.user_id == user_id)
+        .limit(cap + 1)
+        .subquery()
+    )
+    return db.execute(select(func.count()).select_from(capped)).scalar_one()
+
+
+def plan_search(
+    db: Session, user_id: UUID, mode: str = "auto", corpus_version: int | None = None
+) -> str:
+    """
+    Chooses "exact", "approximate" or "binary" search for the user.
+
+    Args:
+        db: Database session
+        user_id: The user whose corpus is searched
+        mode: "auto" decides from the corpus size (large corpora use
+            "binary" when VECTOR_SEARCH_BINARY_PREFILTER is set); other
+            modes are returned as is
+        corpus_version: The user's corpus_version if already read; the
+            corpus size is counted once per version (search_plan_cache)
+
+    Returns:
+        The search mode to use
+    """
+    if mode not in _SEARCH_MODES:
+        raise ValueError(f"Invalid search mode: {mode}")
+    if mode != "auto":
+        return mode
+    if corpus_version is None:
+        corpus_version = crud.get_corpus_version(db, user_id)
+    key = (user_id, corpus_version, VECTOR_SEARCH_EXACT_MAX_ROWS)
+    small = search_plan_cache.get(key)
+    if small is None:
+        size = count_user_items(db, user_id, VECTOR_SEARCH_EXACT_MAX_ROWS)
+        small = size <= VECTOR_SEARCH_EXACT_MAX_ROWS
+        # Uncommitted writes share the version of a write that may follow
+        # a rollback
+        if not vector_index.has_pending_writes(db, user_id):
+            search_plan_cache.set(key, small)
+    if small:
+        return "exact"
+    return "binary" if VECTOR_SEARCH_BINARY_PREFILTER else "approximate"
+
+
+def _inner_product() -> bool:
+    return vector.VECTOR_SEARCH_METRIC == "inner_product"
+
+
+def _query_vector(query_embedding):
+    """
+    The inner product equals cosine similarity only for unit vectors; stored
+    rows are normalized at write time, the query is normalized here.
+    """
+    if _inner_product():
+        return normalize_embedding(query_embedding)
+    return query_embedding
+
+
+def _distance(query_embedding):
+    """
+    Distance expression for ORDER BY, servable by the HNSW index (built with
+    core.vector.distance_ops for the same metric).
+    """
+    if _inner_product():
+        # <#> returns the negative inner product
+        return models.RagEmbedding.embedding.max_inner_product(query_embedding)
+    # <=> returns cosine distance, 1 - cosine similarity
+    return models.RagEmbedding.embedding.cosine_distance(query_embedding)
+
+
+def _similarity(distance):
+    """
+    Converts a _distance value (SQL expression or number) to similarity.
+    """
+    if _inner_product():
+        return -distance
+    return 1 - distance
+
+
+def _parent_id():
+    """
+    The chunks of one text share source_id; other rows are their own parent.
+    """
+    return func.coalesce(models.RagEmbedding.source_id, models.RagEmbedding.id)
+
+
+def _ranked_by_parent(columns, score, *filters):
+    """
+    Subquery of the rows matching filters with their score, where
+    parent_rank = 1 marks the best-scoring row of each parent. Correlated
+    with everything but rag_embeddings, so it also works inside LATERAL.
+    """
+    parent_rank = func.row_number().over(
+        partition_by=_parent_id(), order_by=score.desc()
+    )
+    return (
+        select(*columns, score.label("score"), parent_rank.label("parent_rank"))
+        .filter(*filters)
+        .correlate_except(models.RagEmbedding)
+        .subquery("ranked")
+    )
+
+
+def _best_rows(db, score, limit, *filters):
+    """
+    Top rows by score among those matching filters, one per parent.
+    """
+    ranked = _ranked_by_parent([models.RagEmbedding], score, *filters)
+    row = aliased(models.RagEmbedding, ranked)
+    stmt = (
+        select(row, ranked.c.score)
+        .filter(ranked.c.parent_rank == 1)
+        .order_by(ranked.c.score.desc())
+        .limit(limit)
+    )
+    return [(item[0], item[1]) for item in db.execute(stmt).all()]
+
+
+def _collapse_chunks(items, limit, result=lambda item: item):
+    """
+    Keeps the first item of each parent (items are best first), up to limit.
+    result maps an item to its SearchResult.
+    """
+    seen = set()
+    kept = []
+    for item in items:
+        found = result(item)
+        parent = found.source_id or found.id
+        if parent in seen:
+            continue
+        seen.add(parent)
+        kept.append(item)
+        if len(kept) == limit:
+            break
+    return kept
+
+
+def _exact_search(db, query_embedding, user_id, limit, similarity_threshold):
+    """
+    Ranks every row of the user by weighted similarity inside the database,
+    keeping the best chunk of each text.
+    """
+    similarity_expr = _similarity(_distance(query_embedding))
+
+    # Apply weight (default to 1.0 if null)
+    # weighted_score = similarity * weight
+    weighted_score = similarity_expr * func.coalesce(models.RagEmbedding.weight, 1.0)
+
+    return _best_rows(
+        db,
+        weighted_score,
+        limit,
+        models.RagEmbedding.user_id == user_id,
+        weighted_score >= similarity_threshold,
+    )
+
+
+def _approximate_search(
+    db, query_embedding, user_id, limit, similarity_threshold, candidates
+):
+    """
+    Two-stage search that lets the HNSW index serve the database query.
+
+    Stage one orders by the raw distance operator, which the index can
+    serve, and fetches `candidates` rows. Stage two applies the weight,
+    threshold, one row per parent and final top-k in Python. Items whose
+    weight lifts them in from beyond the candidate pool are missed, which is
+    why the pool is a multiple of limit.
+    """
+    distance = _distance(query_embedding)
+    stmt = (
+        select(models.RagEmbedding, distance.label("distance"))
+        .filter(models.RagEmbedding.user_id == user_id)
+        .order_by(distance)
+        .limit(candidates)
+    )
+
+    scored = []
+    for rag_item, item_distance in db.execute(stmt).all():
+        weight = rag_item.weight if rag_item.weight is not None else 1.0
+        score = _similarity(item_distance) * weight
+        if score >= similarity_threshold:
+            scored.append((rag_item, score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return _collapse_chunks(scored, limit, result=lambda item: item[0])
+
+
+def _hamming_distance(db: Session, query_bits):
+    """
+    Hamming distance between embedding_bits and the query signature. pgvector
+    0.7.0+ has the <~> operator, which the bit HNSW index can serve; older
+    servers count the differing bits with core PostgreSQL functions.
+    """
+    bits = models.RagEmbedding.embedding_bits
+    if embedding_storage.pgvector_version(db) >= (0, 7):
+        return bits.hamming_distance(query_bits)
+    return func.bit_count(bits.op("#")(query_bits))
+
+
+def _in_shortlist(shortlist):
+    """
+    id = ANY(ARRAY(shortlist)): the shortlist is collected first and its rows
+    fetched by primary key. A plain join or IN lets the planner hash-join
+    instead, computing full-vector distances for every row of the user.
+    """
+    return models.RagEmbedding.id == any_(func.array(shortlist.scalar_subquery()))
+
+
+def _binary_search(
+    db, query_embedding, user_id, limit, similarity_threshold, candidates
+):
+    """
+    Shortlists `candidates` rows by Hamming distance of the sign bits, then
+    ranks the shortlist by weighted similarity on the full vectors. The first
+    stage reads only the 1-bit signatures (1/32 the size of the vectors), so
+    the full vectors are fetched for the shortlist alone.
+    """
+    hamming = _hamming_distance(db, binary_quantize(query_embedding))
+    shortlist = (
+        select(models.RagEmbedding.id)
+        .filter(models.RagEmbedding.user_id == user_id)
+        .order_by(hamming)
+        .limit(candidates)
+    )
+
+    similarity_expr = _similarity(_distance(query_embedding))
+    weighted_score = similarity_expr * func.coalesce(models.RagEmbedding.weight, 1.0)
+    return _best_rows(
+        db,
+        weighted_score,
+        limit,
+        _in_shortlist(shortlist),
+        weighted_score >= similarity_threshold,
+    )
+
+
+def _search(
+    db: Session,
+    query_embedding,
+    user_id: UUID,
+    limit: int,
+    similarity_threshold: float,
+    ef_search: int | None,
+    iterative_scan: str | None,
+    mode: str,
+    backend: str | None,
+    corpus_version: int | None = None,
+) -> list[tuple[schemas.SearchResult, np.ndarray]]:
+    """
+    Runs search_similar_items and also returns each result's embedding, which
+    every plan has already loaded with the row. corpus_version is the user's
+    current one, if the caller has read it already.
+    """
+    backend = backend or VECTOR_SEARCH_BACKEND
+    if backend not in _SEARCH_BACKENDS:
+        raise ValueError(f"Invalid search backend: {backend}")
+    if backend == "memory":
+        if corpus_version is None:
+            corpus_version = crud.get_corpus_version(db, user_id)
+        index = vector_index.get_index(db, user_id, corpus_version)
+        if index is not None:
+            return [
+                (
+                    schemas.SearchResult(
+                        id=index.ids[position],
+                        content=index.contents[position],
+                        source_type=index.source_types[position],
+                        similarity=score,
+                        source_id=index.source_ids[position],
+                    ),
+                    index.matrix[position],
+                )
+                for position, score in index.search(
+                    query_embedding, limit, similarity_threshold
+                )
+            ]
+
+    query_embedding = _query_vector(query_embedding)
+    plan = plan_search(db, user_id, mode, corpus_version)
+    if plan == "exact":
+        results = _exact_search(
+            db, query_embedding, user_id, limit, similarity_threshold
+        )
+    elif plan == "binary":
+        candidates = limit * VECTOR_SEARCH_BINARY_CANDIDATE_MULTIPLIER
+        if ef_search is not None:
+            ef_search = max(ef_search, candidates)
+        apply_search_settings(db, ef_search=ef_search, iterative_scan=iterative_scan)
+        results = _binary_search(
+            db, query_embedding, user_id, limit, similarity_threshold, candidates
+        )
+    else:
+        candidates = limit * VECTOR_SEARCH_CANDIDATE_MULTIPLIER
+        # ef_search below the candidate count would cap the result size
+        if ef_search is not None:
+            ef_search = max(ef_search, candidates)
+        apply_search_settings(db, ef_search=ef_search, iterative_scan=iterative_scan)
+        results = _approximate_search(
+            db, query_embedding, user_id, limit, similarity_threshold, candidates
+        )
+
+    search_results = []
+    for rag_item, score in results:
+        search_results.append(
+            (
+                schemas.SearchResult(
+                    id=rag_item.id,
+                    content=rag_item.content,
+                    source_type=rag_item.source_type,
+                    similarity=score,
+                    source_id=rag_item.source_id,
+                ),
+                rag_item.embedding,
+            )
+        )
+
+    return search_results
 
 
 def search_similar_items(
@@ -11,10 +466,20 @@ def search_similar_items(
     user_id: UUID,
     limit: int = 5,
     similarity_threshold: float = 0.0,
+    ef_search: int | None = VECTOR_SEARCH_EF_SEARCH,
+    iterative_scan: str | None = VECTOR_SEARCH_ITERATIVE_SCAN,
+    mode: str = "auto",
+    backend: str | None = None,
 ) -> list[schemas.SearchResult]:
     """
     Search for similar items in the database using vector similarity.
-    Uses Cosine Distance (<=>) operator provided by pgvector.
+    Uses pgvector's cosine distance (<=>) operator, or the inner product (<#>)
+    when VECTOR_SEARCH_METRIC is "inner_product".
+
+    Results are ranked by similarity * weight. Small corpora are ranked
+    exactly; large ones use the HNSW index for candidates and re-rank them.
+    Chunks of one text (rows sharing source_id) are collapsed to the best
+    scoring one, so a long memo takes a single result slot.
 
     Args:
         db: Database session
@@ -22,46 +487,470 @@ def search_similar_items(
         user_id: The user ID to filter results by
         limit: Maximum number of results to return
         similarity_threshold: Minimum similarity score (0-1) to include in results
+        ef_search: HNSW ef_search for this query (None = server default)
+        iterative_scan: HNSW iterative scan mode for this query
+            (None = server default)
+        mode: "auto", "exact", "approximate" or "binary" (see plan_search)
+        backend: "database" or "memory" (defaults to VECTOR_SEARCH_BACKEND).
+            The memory backend falls back to the database for large corpora.
 
     Returns:
         List of SearchResult Pydantic models
     """
-    # pgvector's <=> operator returns cosine distance
-    # (0 = identical, 1 = opposite, 2 = opposite direction)
-    # We want similarity, which is 1 - distance for normalized vectors.
-    # However, pgvector's cosine distance is 1 - cosine_similarity.
-    # So, similarity = 1 - (embedding <=> query_embedding)
+    backend = backend or VECTOR_SEARCH_BACKEND
+    # The memory backend checks the corpus version itself (vector_index.get_index)
+    # and answers from memory, so it gains nothing from this cache. Uncommitted
+    # writes of this session are not cached, since they may still roll back.
+    cache_key = None
+    corpus_version = None
+    if (
+        retrieval_cache.maxsize > 0
+        and backend == "database"
+        and not vector_index.has_pending_writes(db, user_id)
+    ):
+        corpus_version = crud.get_corpus_version(db, user_id)
+        cache_key = (
+            user_id,
+            corpus_version,
+            _embedding_hash(query_embedding),
+            limit,
+            similarity_threshold,
+            ef_search,
+            iterative_scan,
+            mode,
+            vector.VECTOR_SEARCH_METRIC,
+        )
+        cached = retrieval_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
 
-    similarity_expr = 1 - models.RagEmbedding.embedding.cosine_distance(query_embedding)
+    results = [
+        result
+        for result, _ in _search(
+            db,
+            query_embedding,
+            user_id,
+            limit,
+            similarity_threshold,
+            ef_search,
+            iterative_scan,
+            mode,
+            backend,
+            corpus_version,
+        )
+    ]
+    if cache_key is not None:
+        retrieval_cache.set(cache_key, tuple(results))
+    return results
 
-    # Apply weight (default to 1.0 if null)
-    # weighted_score = similarity * weight
-    from sqlalchemy import func
 
-    weighted_score = similarity_expr * func.coalesce(models.RagEmbedding.weight, 1.0)
+def _embedding_hash(query_embedding) -> str:
+    vector = np.asarray(query_embedding, dtype=np.float32)
+    return hashlib.sha256(vector.tobytes()).hexdigest()
 
-    stmt = (
-        select(models.RagEmbedding, weighted_score.label("score"))
-        .filter(models.RagEmbedding.user_id == user_id)
-        .filter(weighted_score >= similarity_threshold)
-        .order_by(weighted_score.desc())
-        .limit(limit)
+
+def maximal_marginal_relevance(
+    embeddings,
+    scores,
+    limit: int,
+    lambda_mult: float = MMR_LAMBDA,
+) -> list[int]:
+    """
+    Picks up to limit candidates by Maximal Marginal Relevance: each step
+    takes the candidate maximizing
+
+        lambda_mult * score - (1 - lambda_mult) * max cosine to those picked
+
+    so a near-duplicate of an already picked item loses to a slightly less
+    relevant but different one. lambda_mult = 1 keeps the relevance order.
+
+    Args:
+        embeddings: Candidate vectors, one row per candidate
+        scores: Relevance of each candidate (similarity * weight)
+        limit: Number of candidates to pick
+        lambda_mult: Trade-off between relevance (1) and diversity (0)
+
+    Returns:
+        Positions of the picked candidates, in pick order
+    """
+    if limit <= 0 or len(scores) == 0:
+        return []
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1.0, norms)
+    # Candidate-to-candidate cosine similarities, computed once
+    redundancy = matrix @ matrix.T
+    relevance = lambda_mult * np.asarray(scores, dtype=np.float32)
+
+    picked: list[int] = []
+    max_redundancy = np.full(len(scores), -np.inf, dtype=np.float32)
+    available = np.ones(len(scores), dtype=bool)
+    for _ in range(min(limit, len(scores))):
+        if picked:
+            marginal = relevance - (1 - lambda_mult) * max_redundancy
+        else:
+            marginal = relevance.copy()
+        marginal[~available] = -np.inf
+        best = int(np.argmax(marginal))
+        picked.append(best)
+        available[best] = False
+        np.maximum(max_redundancy, redundancy[best], out=max_redundancy)
+    return picked
+
+
+def mmr_search(
+    db: Session,
+    query_embedding: list[float],
+    user_id: UUID,
+    limit: int = 5,
+    similarity_threshold: float = 0.0,
+    pool_size: int = MMR_POOL_SIZE,
+    lambda_mult: float = MMR_LAMBDA,
+    ef_search: int | None = VECTOR_SEARCH_EF_SEARCH,
+    iterative_scan: str | None = VECTOR_SEARCH_ITERATIVE_SCAN,
+    mode: str = "auto",
+    backend: str | None = None,
+) -> list[schemas.SearchResult]:
+    """
+    Like search_similar_items, but diversifies the results with Maximal
+    Marginal Relevance. The top pool_size candidates are fetched together with
+    their vectors in the same query, then re-ranked in memory so that
+    near-duplicates (a re-submitted answer, a memo paraphrasing an answer) do
+    not fill the context.
+
+    Args:
+        pool_size: Candidates considered before re-ranking (at least limit)
+        lambda_mult: Trade-off between relevance (1) and diversity (0)
+        Other arguments as in search_similar_items.
+
+    Returns:
+        List of SearchResult Pydantic models, in MMR pick order
+    """
+    candidates = _search(
+        db,
+        query_embedding,
+        user_id,
+        max(pool_size, limit),
+        similarity_threshold,
+        ef_search,
+        iterative_scan,
+        mode,
+        backend,
+    )
+    if not candidates:
+        return []
+    picked = maximal_marginal_relevance(
+        [vector for _, vector in candidates],
+        [result.similarity for result, _ in candidates],
+        limit,
+        lambda_mult,
+    )
+    return [candidates[position][0] for position in picked]
+
+
+def batch_search(
+    db: Session,
+    query_embeddings: list[list[float]],
+    user_id: UUID,
+    limit: int = 5,
+    similarity_threshold: float = 0.0,
+    ef_search: int | None = VECTOR_SEARCH_EF_SEARCH,
+    iterative_scan: str | None = VECTOR_SEARCH_ITERATIVE_SCAN,
+    mode: str = "auto",
+    backend: str | None = None,
+) -> list[list[schemas.SearchResult]]:
+    """
+    Runs search_similar_items for several queries at once. The database
+    backend scores all of them in one statement: the query vectors are a
+    VALUES list, and a LATERAL subquery takes each query's top rows.
+
+    Args:
+        query_embeddings: One embedding vector per query
+        Other arguments as in search_similar_items.
+
+    Returns:
+        One list of SearchResult per query, in query order
+    """
+    if not query_embeddings:
+        return []
+    backend = backend or VECTOR_SEARCH_BACKEND
+    if backend not in _SEARCH_BACKENDS:
+        raise ValueError(f"Invalid search backend: {backend}")
+    corpus_version = None
+    if backend == "memory":
+        corpus_version = crud.get_corpus_version(db, user_id)
+        index = vector_index.get_index(db, user_id, corpus_version)
+        if index is not None:
+            return [
+                [
+                    schemas.SearchResult(
+                        id=index.ids[position],
+                        content=index.contents[position],
+                        source_type=index.source_types[position],
+                        similarity=score,
+                        source_id=index.source_ids[position],
+                    )
+                    for position, score in index.search(
+                        query_embedding, limit, similarity_threshold
+                    )
+                ]
+                for query_embedding in query_embeddings
+            ]
+
+    plan = plan_search(db, user_id, mode, corpus_version)
+    queries = values(
+        column("position", Integer),
+        column("embedding", embedding_type()),
+        column("bits", BIT(EMBEDDING_DIMENSIONS)),
+        name="queries",
+    ).data(
+        [
+            (
+                position,
+                _query_vector(query_embedding),
+                binary_quantize(query_embedding) if plan == "binary" else None,
+            )
+            for position, query_embedding in enumerate(query_embeddings)
+        ]
     )
+    # VALUES leaves the bound vectors untyped, so cast them back
+    query_vector = cast(queries.c.embedding, embedding_type())
+    distance = _distance(query_vector)
+    score = _similarity(distance) * func.coalesce(models.RagEmbedding.weight, 1.0)
+    columns = [
+        models.RagEmbedding.id,
+        models.RagEmbedding.content,
+        models.RagEmbedding.source_type,
+        models.RagEmbedding.source_id,
+    ]
+    user_rows = models.RagEmbedding.user_id == user_id
 
-    results = db.execute(stmt).all()
+    if plan == "approximate":
+        # Same two stages as the approximate plan: nearest candidates by raw
+        # distance per query, weights, threshold and parents applied below
+        candidates = limit * VECTOR_SEARCH_CANDIDATE_MULTIPLIER
+        if ef_search is not None:
+            ef_search = max(ef_search, candidates)
+        apply_search_settings(db, ef_search=ef_search, iterative_scan=iterative_scan)
+        hits = select(*columns, score.label("score")).filter(user_rows)
+        hits = hits.order_by(distance).limit(candidates)
+    else:
+        filters = [user_rows, score >= similarity_threshold]
+        if plan == "binary":
+            # Per query: shortlist by Hamming distance, then rank exactly
+            candidates = limit * VECTOR_SEARCH_BINARY_CANDIDATE_MULTIPLIER
+            if ef_search is not None:
+                ef_search = max(ef_search, candidates)
+            apply_search_settings(
+                db, ef_search=ef_search, iterative_scan=iterative_scan
+            )
+            hamming = _hamming_distance(
+                db, cast(queries.c.bits, BIT(EMBEDDING_DIMENSIONS))
+            )
+            shortlist = (
+                select(models.RagEmbedding.id)
+                .filter(user_rows)
+                .order_by(hamming)
+                .limit(candidates)
+                .correlate_except(models.RagEmbedding)
+            )
+            filters.append(_in_shortlist(shortlist))
+        ranked = _ranked_by_parent(columns, score, *filters)
+        hits = (
+            select(*(ranked.c[c.key] for c in columns), ranked.c.score)
+            .filter(ranked.c.parent_rank == 1)
+            .order_by(ranked.c.score.desc())
+            .limit(limit)
+        )
+    hits = hits.lateral("hits")
 
-    search_results: list[schemas.SearchResult] = []
-    for row in results:
-        rag_item: models.RagEmbedding = row[0]
-        score: float = row[1]
+    stmt = (
+        select(queries.c.position, hits)
+        .select_from(queries.join(hits, true()))
+        .order_by(queries.c.position, hits.c.score.desc())
+    )
 
-        search_results.append(
+    grouped: list[list[schemas.SearchResult]] = [[] for _ in query_embeddings]
+    for row in db.execute(stmt):
+        if row.score < similarity_threshold:
+            continue
+        grouped[row.position].append(
             schemas.SearchResult(
-                id=rag_item.id,
-                content=rag_item.content,
-                source_type=rag_item.source_type,
-                similarity=score,
+                id=row.id,
+                content=row.content,
+                source_type=row.source_type,
+                similarity=row.score,
+                source_id=row.source_id,
             )
         )
+    return [_collapse_chunks(results, limit) for results in grouped]
 
-    return search_results
+
+# Both channels run in one statement. The vector channel follows the search
+# plan: for the exact plan it ranks every row of the user by
+# similarity * weight, which the HNSW index cannot serve; otherwise it takes
+# the nearest candidates by raw distance (index-friendly) and ranks them by
+# similarity * weight, like the approximate plan. The lexical channel ranks
+# rows sharing query bigrams by the number of shared grams, shorter texts
+# first on ties. {distance}, {vector_order} and {similarity} are filled in
+# per metric and plan.
+_HYBRID_SEARCH_SQL = """
+    WITH vector_candidates AS (
+        SELECT id, weight, {distance} AS distance
+        FROM rag_embeddings
+        WHERE user_id = :user_id
+        ORDER BY {vector_order}
+        LIMIT :candidates
+    ),
+    vector_ranked AS (
+        SELECT id, row_number() OVER (
+            ORDER BY {similarity} * coalesce(weight, 1.0) DESC
+        ) AS rank
+        FROM vector_candidates
+    ),
+    lexical_candidates AS (
+        SELECT
+            id,
+            cardinality(content_bigrams) AS grams,
+            (
+                SELECT count(*)
+                FROM unnest(content_bigrams) AS gram
+                WHERE gram = ANY(:query_bigrams)
+            ) AS overlap
+        FROM rag_embeddings
+        WHERE user_id = :user_id
+          AND content_bigrams && :query_bigrams
+    ),
+    lexical_ranked AS (
+        SELECT id, row_number() OVER (ORDER BY overlap DESC, grams) AS rank
+        FROM lexical_candidates
+        ORDER BY rank
+        LIMIT :candidates
+    )
+    SELECT
+        r.id,
+        r.content,
+        r.source_type,
+        r.source_id,
+        {row_similarity} * coalesce(r.weight, 1.0) AS similarity,
+        v.rank AS vector_rank,
+        l.rank AS lexical_rank
+    FROM vector_ranked v
+    FULL OUTER JOIN lexical_ranked l ON l.id = v.id
+    JOIN rag_embeddings r ON r.id = coalesce(v.id, l.id)
+    """
+
+# (distance operator, similarity from distance) per metric
+_HYBRID_SEARCH_METRICS = {
+    "cosine": ("<=>", "(1 - {})"),
+    "inner_product": ("<#>", "(-{})"),
+}
+
+
+@lru_cache(maxsize=4)
+def _hybrid_search_sql(metric: str, exact: bool):
+    operator, similarity = _HYBRID_SEARCH_METRICS[metric]
+    distance = f"embedding {operator} :query_embedding"
+    if exact:
+        weighted = f"{similarity.format(f'({distance})')} * coalesce(weight, 1.0)"
+        vector_order = f"{weighted} DESC"
+    else:
+        vector_order = distance
+    return text(
+        _HYBRID_SEARCH_SQL.format(
+            distance=distance,
+            vector_order=vector_order,
+            similarity=similarity.format("distance"),
+            row_similarity=similarity.format(
+                f"(r.embedding {operator} :query_embedding)"
+            ),
+        )
+    ).bindparams(
+        bindparam("query_embedding", type_=embedding_type()),
+        bindparam("query_bigrams", type_=ARRAY(Text)),
+    )
+
+
+def reciprocal_rank_fusion(ranks: list[int | None], k: int = HYBRID_SEARCH_RRF_K):
+    """
+    Sums 1 / (k + rank) over the channels that returned the item.
+    """
+    return sum(1.0 / (k + rank) for rank in ranks if rank is not None)
+
+
+def hybrid_search(
+    db: Session,
+    query_text: str,
+    query_embedding: list[float],
+    user_id: UUID,
+    limit: int = 5,
+    similarity_threshold: float = 0.0,
+    candidates: int = HYBRID_SEARCH_CANDIDATES,
+    rrf_k: int = HYBRID_SEARCH_RRF_K,
+    ef_search: int | None = VECTOR_SEARCH_EF_SEARCH,
+    iterative_scan: str | None = VECTOR_SEARCH_ITERATIVE_SCAN,
+    mode: str = "auto",
+) -> list[schemas.SearchResult]:
+    """
+    Combines vector search with a lexical (character bigram) channel over
+    rag_embeddings.content, fusing both rankings with reciprocal rank fusion.
+    Exact terms such as club names, technologies and numbers are found even
+    when their embeddings are not close to the query's.
+
+    Both channels run in one statement. The vector channel follows
+    plan_search: small corpora are ranked exactly, larger ones through the
+    HNSW index (the binary plan uses it too), whose settings are then set in
+    a statement of their own beforehand.
+
+    Args:
+        db: Database session
+        query_text: The query text, used for the lexical channel
+        query_embedding: The embedding vector of the query text
+        user_id: The user ID to filter results by
+        limit: Maximum number of results to return
+        similarity_threshold: Minimum similarity * weight for items found only
+            by the vector channel. Lexical matches are always kept.
+        candidates: Candidates taken from each channel
+        rrf_k: Reciprocal rank fusion constant; larger values flatten the
+            advantage of top ranks
+        ef_search: HNSW ef_search for the vector channel
+        iterative_scan: HNSW iterative scan mode for the vector channel
+        mode: Search plan for the vector channel, as in search_similar_items
+
+    Returns:
+        List of SearchResult Pydantic models, best fused rank first, one per
+        parent text. The similarity field holds the weighted vector
+        similarity.
+    """
+    exact = plan_search(db, user_id, mode) == "exact"
+    if not exact:
+        if ef_search is not None:
+            ef_search = max(ef_search, candidates)
+        apply_search_settings(db, ef_search=ef_search, iterative_scan=iterative_scan)
+    rows = db.execute(
+        _hybrid_search_sql(vector.VECTOR_SEARCH_METRIC, exact),
+        {
+            "query_embedding": _query_vector(query_embedding),
+            "query_bigrams": lexical.text_bigrams(query_text),
+            "user_id": user_id,
+            "candidates": candidates,
+        },
+    ).all()
+
+    fused = [
+        (reciprocal_rank_fusion([row.vector_rank, row.lexical_rank], rrf_k), row)
+        for row in rows
+        if row.lexical_rank is not None or row.similarity >= similarity_threshold
+    ]
+    fused.sort(key=lambda item: item[0], reverse=True)
+    results = [
+        schemas.SearchResult(
+            id=row.id,
+            content=row.content,
+            source_type=row.source_type,
+            similarity=row.similarity,
+            source_id=row.source_id,
+        )
+        for _, row in fused
+    ]
+    return _collapse_chunks(results, limit)
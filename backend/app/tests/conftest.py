@@ -1,7 +1,9 @@
 import os
 
 import pytest
+from app import models
 from app.database import Base, get_db
+from app.dependencies.auth import get_current_user
 from app.main import app
 from dotenv import load_dotenv
 from fastapi.testclient import TestClient
@@ -89,9 +91,21 @@ def db_session(test_db_setup):
 
 
 @pytest.fixture(scope="function")
-def client(db_session):
+def test_user(db_session):
     """
-    FastAPI TestClient with overridden dependency.
+    User that authenticated requests made through `client` act as.
+    """
+    user = models.User(email="user@example.com", name="Test User")
+    db_session.add(user)
+    db_session.commit()
+    db_session.refresh(user)
+    return user
+
+
+@pytest.fixture(scope="function")
+def client(db_session, test_user):
+    """
+    FastAPI TestClient with overridden dependencies.
     """
 
     def override_get_db():
@@ -100,7 +114,11 @@ def client(db_session):
         finally:
             pass
 
+    def override_get_current_user():
+        return test_user
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = override_get_current_user
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
@@ -0,0 +1,407 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from app import crud, models
+from app.services import analysis_jobs, job_events
+from app.workers import analysis as analysis_worker
+from sqlalchemy import delete, text
+from sqlalchemy.orm import Session, sessionmaker
+
+
+def _user(db_session: Session, email: str) -> models.User:
+    user = models.User(email=email, name="Job User")
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+@pytest.fixture(autouse=True)
+def no_debounce(monkeypatch):
+    # Jobs are due as soon as they are queued unless a test says otherwise
+    monkeypatch.setattr(analysis_jobs, "ANALYSIS_DEBOUNCE_SECONDS", 0)
+
+
+def _make_due(db_session: Session, job: models.AnalysisJob):
+    job.run_after = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db_session.commit()
+
+
+@pytest.fixture
+def committed_jobs(test_db_setup):
+    """
+    Queued jobs of two users committed outside a test transaction, so that
+    other connections can see (and lock) them.
+    """
+    factory = sessionmaker(bind=test_db_setup)
+    db = factory()
+    users = [_user(db, f"skip_locked_{i}@example.com") for i in range(2)]
+    jobs = [analysis_jobs.enqueue_analysis(db, user.id) for user in users]
+    yield factory, [job.id for job in jobs]
+    db.execute(delete(models.User).where(models.User.id.in_([u.id for u in users])))
+    db.commit()
+    db.close()
+
+
+def test_claim_skips_jobs_locked_by_other_workers(committed_jobs):
+    factory, job_ids = committed_jobs
+    first, second, third = factory(), factory(), factory()
+    try:
+        # first has not committed its claim yet, so the row is still locked
+        claimed = crud.claim_analysis_job(first, "worker-1")
+        other = crud.claim_analysis_job(second, "worker-2")
+        nothing = crud.claim_analysis_job(third, "worker-3")
+
+        assert claimed.id == job_ids[0]
+        assert other.id == job_ids[1]
+        assert nothing is None
+        assert (claimed.status, claimed.attempts) == ("running", 1)
+    finally:
+        for db in (first, second, third):
+            db.rollback()
+            db.close()
+
+
+@patch("app.services.analysis.analyze_user_answers")
+def test_run_next_job_marks_success(mock_analyze, db_session: Session):
+    user = _user(db_session, "job_success@example.com")
+    job = analysis_jobs.enqueue_analysis(db_session, user.id)
+
+    ran = analysis_jobs.run_next_job(db_session, "worker-1")
+
+    assert ran.id == job.id
+    mock_analyze.assert_called_once_with(user.id, db_session)
+    db_session.refresh(job)
+    assert job.status == "succeeded"
+    assert job.finished_at is not None
+    assert job.locked_by is None
+    assert analysis_jobs.run_next_job(db_session, "worker-1") is None
+
+
+@pytest.fixture
+def committed_user(test_db_setup):
+    """
+    Session outside a test transaction, for runs that roll back on failure.
+    """
+    db = sessionmaker(bind=test_db_setup)()
+    user = _user(db, "job_retry@example.com")
+    yield db, user
+    db.rollback()
+    db.execute(delete(models.User).where(models.User.id == user.id))
+    db.commit()
+    db.close()
+
+
+@patch("app.services.analysis.analyze_user_answers")
+def test_failed_job_backs_off_then_is_dead_lettered(
+    mock_analyze, committed_user, monkeypatch
+):
+    db, user = committed_user
+    monkeypatch.setattr(analysis_jobs, "ANALYSIS_JOB_MAX_ATTEMPTS", 2)
+    mock_analyze.side_effect = RuntimeError("LLM unavailable")
+    job = analysis_jobs.enqueue_analysis(db, user.id)
+
+    analysis_jobs.run_next_job(db, "worker-1")
+
+    db.refresh(job)
+    assert job.status == "queued"
+    assert job.last_error == "RuntimeError: LLM unavailable"
+    assert job.run_after > datetime.now(timezone.utc) + timedelta(seconds=20)
+    # Not due until the backoff has passed
+    assert analysis_jobs.run_next_job(db, "worker-1") is None
+
+    _make_due(db, job)
+    analysis_jobs.run_next_job(db, "worker-1")
+
+    db.refresh(job)
+    assert (job.status, job.attempts) == ("dead", 2)
+    assert job.finished_at is not None
+
+
+def test_backoff_grows_exponentially_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(analysis_jobs, "ANALYSIS_JOB_BACKOFF_SECONDS", 10)
+    monkeypatch.setattr(analysis_jobs, "ANALYSIS_JOB_BACKOFF_MAX_SECONDS", 60)
+
+    assert [analysis_jobs.backoff_seconds(n) for n in range(1, 6)] == [
+        10,
+        20,
+        40,
+        60,
+        60,
+    ]
+
+
+def _enqueue(db_session: Session, user: models.User, **kwargs) -> models.AnalysisJob:
+    options = {"max_attempts": 3, "delay": timedelta(0), "max_delay": timedelta(0)}
+    return crud.enqueue_analysis_job(db_session, user.id, **(options | kwargs))
+
+
+def test_expired_leases_are_released(db_session: Session):
+    retried = _enqueue(db_session, _user(db_session, "job_lease@example.com"))
+    exhausted = _enqueue(
+        db_session, _user(db_session, "job_lease_2@example.com"), max_attempts=1
+    )
+    for _ in range(2):
+        crud.claim_analysis_job(db_session, "lost-worker")
+    db_session.commit()
+
+    assert analysis_jobs.release_expired_jobs(db_session) == 0
+    for job in (retried, exhausted):
+        db_session.refresh(job)
+        job.locked_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    db_session.commit()
+
+    assert analysis_jobs.release_expired_jobs(db_session) == 2
+    db_session.refresh(retried)
+    db_session.refresh(exhausted)
+    assert (retried.status, retried.locked_by) == ("queued", None)
+    assert exhausted.status == "dead"
+    # The lost worker can no longer record an outcome
+    assert not crud.finish_analysis_job(
+        db_session, retried.id, "lost-worker", "succeeded"
+    )
+
+
+def test_triggers_coalesce_into_the_queued_job(db_session: Session):
+    user = _user(db_session, "job_coalesce@example.com")
+    jobs = [analysis_jobs.enqueue_analysis(db_session, user.id) for _ in range(4)]
+
+    assert {job.id for job in jobs} == {jobs[0].id}
+    assert jobs[0].coalesced_triggers == 3
+    assert analysis_jobs.saved_analysis_count(db_session) == 3
+    assert db_session.query(models.AnalysisJob).count() == 1
+
+
+def test_triggers_push_the_start_back_up_to_the_cap(db_session: Session):
+    user = _user(db_session, "job_debounce@example.com")
+    job = _enqueue(db_session, user, delay=timedelta(seconds=60))
+    first_run_after = job.run_after
+    assert first_run_after > job.created_at + timedelta(seconds=59)
+
+    job.run_after = job.created_at  # as if the quiet period had passed
+    db_session.commit()
+    _enqueue(
+        db_session,
+        user,
+        delay=timedelta(seconds=60),
+        max_delay=timedelta(seconds=90),
+    )
+    db_session.refresh(job)
+    assert job.run_after == first_run_after
+
+    _enqueue(
+        db_session,
+        user,
+        delay=timedelta(seconds=60),
+        max_delay=timedelta(seconds=30),
+    )
+    db_session.refresh(job)
+    assert job.run_after == job.created_at + timedelta(seconds=30)
+    assert crud.claim_analysis_job(db_session, "worker-1") is None
+
+
+def test_claim_waits_for_the_users_running_job(db_session: Session):
+    user = _user(db_session, "job_running@example.com")
+    running = _enqueue(db_session, user)
+    assert crud.claim_analysis_job(db_session, "worker-1").id == running.id
+    db_session.commit()
+
+    queued = _enqueue(db_session, user)
+    assert queued.id != running.id
+    assert crud.claim_analysis_job(db_session, "worker-2") is None
+
+    crud.finish_analysis_job(db_session, running.id, "worker-1", "succeeded")
+    assert crud.claim_analysis_job(db_session, "worker-2").id == queued.id
+
+
+def test_retry_is_coalesced_into_a_newer_queued_job(db_session: Session):
+    user = _user(db_session, "job_retry_coalesce@example.com")
+    failed = _enqueue(db_session, user)
+    crud.claim_analysis_job(db_session, "worker-1")
+    db_session.commit()
+    newer = _enqueue(db_session, user)
+
+    assert crud.finish_analysis_job(
+        db_session, failed.id, "worker-1", "queued", error="RuntimeError: boom"
+    )
+    db_session.refresh(failed)
+    db_session.refresh(newer)
+    assert failed.status == "coalesced"
+    assert failed.finished_at is not None
+    assert newer.status == "queued"
+
+
+def test_retry_coalesces_into_a_concurrently_queued_job(test_db_setup):
+    """
+    The worker requeues while an enqueue of the same user is in flight: the
+    retry's UPDATE waits on the uncommitted queued row and must coalesce
+    once it is committed, not violate the one queued job per user index.
+    """
+    factory = sessionmaker(bind=test_db_setup)
+    worker, enqueuer, observer = factory(), factory(), factory()
+    user = _user(worker, "job_retry_race@example.com")
+    failed = _enqueue(worker, user)
+    crud.claim_analysis_job(worker, "worker-1")
+    worker.commit()
+    outcome = {}
+
+    def requeue():
+        try:
+            outcome["updated"] = crud.finish_analysis_job(
+                worker, failed.id, "worker-1", "queued", error="RuntimeError: boom"
+            )
+        except Exception as e:
+            outcome["error"] = e
+
+    try:
+        # The enqueue's transaction stays open until the retry waits on it
+        enqueuer.commit = lambda: None
+        newer = _enqueue(enqueuer, user)
+        thread = threading.Thread(target=requeue)
+        thread.start()
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            waiting = observer.execute(
+                text(
+                    "SELECT count(*) FROM pg_stat_activity "
+                    "WHERE wait_event_type = 'Lock' AND query LIKE 'UPDATE%'"
+                )
+            ).scalar_one()
+            observer.rollback()
+            if waiting:
+                break
+            time.sleep(0.05)
+        assert waiting
+        Session.commit(enqueuer)
+        thread.join(10)
+
+        assert outcome == {"updated": True}
+        statuses = dict(
+            observer.execute(
+                text("SELECT id, status FROM analysis_jobs WHERE user_id = :user"),
+                {"user": user.id},
+            ).all()
+        )
+        assert statuses == {failed.id: "coalesced", newer.id: "queued"}
+    finally:
+        for db in (worker, enqueuer, observer):
+            db.rollback()
+        observer.execute(delete(models.User).where(models.User.id == user.id))
+        observer.commit()
+        for db in (worker, enqueuer, observer):
+            db.close()
+
+
+@patch("app.services.analysis.analyze_user_answers")
+def test_worker_drains_the_queue(mock_analyze, db_session: Session, monkeypatch):
+    monkeypatch.setattr(analysis_worker, "SessionLocal", lambda: db_session)
+    for i in range(3):
+        user = _user(db_session, f"job_worker_{i}@example.com")
+        analysis_jobs.enqueue_analysis(db_session, user.id)
+
+    processed = analysis_worker.work("worker-1", 0, threading.Event(), drain=True)
+
+    assert processed == 3
+    assert mock_analyze.call_count == 3
+    statuses = db_session.query(models.AnalysisJob.status).all()
+    assert [status for (status,) in statuses] == ["succeeded"] * 3
+
+
+def test_status_follows_the_job(db_session: Session):
+    user = _user(db_session, "job_status@example.com")
+    assert analysis_jobs.get_status(db_session, user.id) == {"status": "none"}
+
+    job = analysis_jobs.enqueue_analysis(db_session, user.id)
+    status = analysis_jobs.get_status(db_session, user.id)
+    assert (status["status"], status["job_id"]) == ("queued", job.id)
+    assert status["started_at"] is None
+
+    crud.claim_analysis_job(db_session, "worker-1")
+    db_session.commit()
+    # A newer queued job does not hide the running one
+    analysis_jobs.enqueue_analysis(db_session, user.id)
+    status = analysis_jobs.get_status(db_session, user.id)
+    assert (status["status"], status["attempts"]) == ("running", 1)
+    assert status["started_at"] is not None
+
+    crud.finish_analysis_job(db_session, job.id, "worker-1", "dead", error="boom")
+    assert analysis_jobs.get_status(db_session, user.id)["status"] == "queued"
+
+
+def test_status_endpoint_reports_failed_jobs(client, db_session, test_user):
+    assert client.get("/analysis/status").json()["status"] == "none"
+
+    job = analysis_jobs.enqueue_analysis(db_session, test_user.id)
+    crud.claim_analysis_job(db_session, "worker-1")
+    crud.finish_analysis_job(db_session, job.id, "worker-1", "dead", error="boom")
+
+    started = time.monotonic()
+    response = client.get("/analysis/status", params={"wait": 30})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["status"], body["job_id"]) == ("failed", str(job.id))
+    assert body["finished_at"] is not None
+    # Finished jobs are not waited on
+    assert time.monotonic() - started < 5
+    assert client.get("/analysis/status", params={"wait": 3600}).status_code == 422
+
+
+@pytest.fixture
+def job_listener(test_db_setup, monkeypatch):
+    """
+    A listener on the test database, connected before the test starts.
+    """
+    listener = job_events.JobEventListener(test_db_setup)
+    monkeypatch.setattr(job_events, "listener", listener)
+
+    async def subscribe_once():
+        with listener.subscribe("nobody"):
+            pass
+
+    asyncio.run(subscribe_once())
+    deadline = time.monotonic() + 10
+    with test_db_setup.connect() as connection:
+        while time.monotonic() < deadline:
+            listening = connection.execute(
+                text(
+                    "SELECT count(*) FROM pg_stat_activity "
+                    "WHERE query = :query AND datname = current_database()"
+                ),
+                {"query": f"LISTEN {job_events.CHANNEL}"},
+            ).scalar()
+            if listening:
+                break
+            time.sleep(0.05)
+    return listener
+
+
+def test_long_poll_wakes_when_the_job_finishes(
+    job_listener, committed_user, test_db_setup, monkeypatch
+):
+    # Without the notification the poll would only re-check after 30s
+    monkeypatch.setattr(analysis_jobs, "ANALYSIS_STATUS_RECHECK_SECONDS", 30)
+    writer, user = committed_user
+    reader = sessionmaker(bind=test_db_setup)()
+    job = analysis_jobs.enqueue_analysis(writer, user.id)
+    crud.claim_analysis_job(writer, "worker-1")
+    writer.commit()
+
+    async def scenario():
+        poll = asyncio.create_task(analysis_jobs.wait_for_status(reader, user.id, 20))
+        await asyncio.sleep(0.2)
+        assert not poll.done()
+        await asyncio.to_thread(
+            crud.finish_analysis_job, writer, job.id, "worker-1", "succeeded"
+        )
+        return await asyncio.wait_for(poll, 10)
+
+    try:
+        started = time.monotonic()
+        status = asyncio.run(scenario())
+        assert status["status"] == "succeeded"
+        assert time.monotonic() - started < 10
+    finally:
+        reader.close()
@@ -1,7 +1,14 @@
+import asyncio
+import json
+import threading
 import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch
 
+import openai
+import pytest
 from app import models, schemas
+from app.services import analysis
 from app.services.analysis import analyze_user_answers
 
 
@@ -64,3 +71,247 @@ def test_analyze_user_answers_success(mock_generate, db_session):
     )
     assert db_result is not None
     assert db_result.result_data["keywords"] == ["coding", "tech"]
+
+
+def _analysis_content(summary: str) -> schemas.AnalysisResultContent:
+    return schemas.AnalysisResultContent(
+        keywords=["coding"],
+        strengths=[
+            schemas.StrengthItem(strength="Coding", evidence="coding", confidence=0.9)
+        ],
+        values=["Growth"],
+        summary=summary,
+    )
+
+
+@patch("app.services.analysis.generate_structured_response")
+def test_unchanged_answers_skip_the_llm(mock_generate, db_session, monkeypatch):
+    user = models.User(email="fingerprint@example.com", name="Test User")
+    db_session.add(user)
+    questions = [
+        models.Question(category="test", question_text=f"Q{i}", display_order=i)
+        for i in range(2)
+    ]
+    db_session.add_all(questions)
+    db_session.commit()
+    answers = [
+        models.UserAnswer(user_id=user.id, question_id=question.id, answer_text=f"A{i}")
+        for i, question in enumerate(questions)
+    ]
+    db_session.add_all(answers)
+    db_session.commit()
+    mock_generate.return_value = _analysis_content("first")
+
+    first = analyze_user_answers(user.id, db_session)
+    # Re-saving the same text costs nothing
+    answers[0].answer_text = "A0"
+    db_session.commit()
+    again = analyze_user_answers(user.id, db_session)
+
+    assert mock_generate.call_count == 1
+    assert again.id == first.id
+    assert len(first.input_fingerprint) == 64
+
+    # An edit, or a different model, runs the analysis again
+    answers[1].answer_text = "A1 (edited)"
+    db_session.commit()
+    mock_generate.return_value = _analysis_content("edited")
+    edited = analyze_user_answers(user.id, db_session)
+    assert mock_generate.call_count == 2
+    assert edited.result_data["summary"] == "edited"
+    assert edited.input_fingerprint != first.input_fingerprint
+
+    monkeypatch.setattr(analysis, "ANALYSIS_MODEL", "gpt-4o")
+    analyze_user_answers(user.id, db_session)
+    assert mock_generate.call_count == 3
+    assert mock_generate.call_args.kwargs["model_name"] == "gpt-4o"
+    assert db_session.query(models.AnalysisResult).count() == 3
+
+
+def _answers_by_category(db_session, email: str, categories: list[str]):
+    user = models.User(email=email, name="Test User")
+    db_session.add(user)
+    questions = [
+        models.Question(category=category, question_text=f"Q{i}", display_order=i)
+        for i, category in enumerate(categories)
+    ]
+    db_session.add_all(questions)
+    db_session.commit()
+    answers = [
+        models.UserAnswer(user_id=user.id, question_id=question.id, answer_text=f"A{i}")
+        for i, question in enumerate(questions)
+    ]
+    db_session.add_all(answers)
+    db_session.commit()
+    return user, answers
+
+
+@patch("app.services.analysis.generate_structured_response")
+@patch("app.services.analysis.generate_structured_response_async")
+def test_map_reduce_reruns_only_edited_categories(
+    mock_map, mock_reduce, db_session, monkeypatch
+):
+    monkeypatch.setattr(analysis, "ANALYSIS_MODE", "map_reduce")
+    user, answers = _answers_by_category(
+        db_session, "map_reduce@example.com", ["childhood", "childhood", "values"]
+    )
+
+    in_flight = 0
+    most_in_flight = 0
+
+    async def analyze_category(prompt, **kwargs):
+        nonlocal in_flight, most_in_flight
+        in_flight += 1
+        most_in_flight = max(most_in_flight, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return _analysis_content(prompt.split('"')[1])
+
+    mock_map.side_effect = analyze_category
+    mock_reduce.return_value = _analysis_content("merged")
+
+    result = analyze_user_answers(user.id, db_session)
+
+    # One concurrent map call per category, then one reduce call
+    assert mock_map.call_count == 2
+    assert most_in_flight == 2
+    assert result.result_data["summary"] == "merged"
+    merge_prompt = mock_reduce.call_args.kwargs["prompt"]
+    assert merge_prompt.index("幼少期・学校生活") < merge_prompt.index("価値観")
+    childhood_prompt = mock_map.call_args_list[0].kwargs["prompt"]
+    assert "A0" in childhood_prompt and "A1" in childhood_prompt
+
+    # Editing a values answer re-runs the values category only
+    answers[2].answer_text = "A2 (edited)"
+    db_session.commit()
+    analyze_user_answers(user.id, db_session)
+
+    assert mock_map.call_count == 3
+    assert "A2 (edited)" in mock_map.call_args.kwargs["prompt"]
+    assert mock_reduce.call_count == 2
+    category_results = (
+        db_session.query(models.AnalysisResult.analysis_type)
+        .filter(models.AnalysisResult.analysis_type != "self_analysis")
+        .all()
+    )
+    assert sorted(t for (t,) in category_results) == [
+        "self_analysis:childhood",
+        "self_analysis:values",
+        "self_analysis:values",
+    ]
+
+
+@patch("app.services.analysis.generate_structured_response")
+@patch("app.services.analysis.generate_structured_response_async")
+def test_map_reduce_keeps_categories_that_succeeded(
+    mock_map, mock_reduce, db_session, monkeypatch
+):
+    monkeypatch.setattr(analysis, "ANALYSIS_MODE", "map_reduce")
+    user, _ = _answers_by_category(
+        db_session, "map_failure@example.com", ["childhood", "values", "future"]
+    )
+    outage = True
+
+    async def analyze_category(prompt, **kwargs):
+        if outage and "価値観" in prompt:
+            raise RuntimeError("OpenAI API Error: timeout")
+        return _analysis_content(prompt.split('"')[1])
+
+    mock_map.side_effect = analyze_category
+    mock_reduce.return_value = _analysis_content("merged")
+
+    with pytest.raises(RuntimeError, match="timeout"):
+        analyze_user_answers(user.id, db_session)
+    assert mock_map.call_count == 3
+    mock_reduce.assert_not_called()
+    saved = db_session.query(models.AnalysisResult.analysis_type).all()
+    assert sorted(t for (t,) in saved) == [
+        "self_analysis:childhood",
+        "self_analysis:future",
+    ]
+
+    # The retry only re-runs the category that failed
+    outage = False
+    result = analyze_user_answers(user.id, db_session)
+    assert mock_map.call_count == 4
+    assert "価値観" in mock_map.call_args.kwargs["prompt"]
+    assert result.result_data["summary"] == "merged"
+
+
+class _ChatCompletionHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so that clients reuse pooled connections across requests
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        content = _analysis_content("category").model_dump_json()
+        body = json.dumps(
+            {
+                "id": "chatcmpl-test",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }
+                ],
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def openai_server():
+    """
+    Local HTTP server answering every request with a chat completion.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatCompletionHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+@patch("app.services.analysis.generate_structured_response")
+def test_map_reduce_runs_back_to_back_in_one_thread(
+    mock_reduce, db_session, monkeypatch, openai_server
+):
+    # Each run has its own event loop; a client reused from a closed loop
+    # fails with "Event loop is closed", which retries would only hide
+    monkeypatch.setattr(analysis, "ANALYSIS_MODE", "map_reduce")
+    monkeypatch.setattr(
+        analysis,
+        "create_async_client",
+        lambda: openai.AsyncOpenAI(
+            api_key="test", base_url=openai_server, max_retries=0
+        ),
+    )
+    mock_reduce.return_value = _analysis_content("merged")
+    user, answers = _answers_by_category(
+        db_session, "back_to_back@example.com", ["childhood", "values"]
+    )
+
+    for run in range(2):
+        for answer in answers:
+            answer.answer_text = f"run {run}"
+        db_session.commit()
+        result = analyze_user_answers(user.id, db_session)
+        assert result.result_data["summary"] == "merged"
+
+    category_results = (
+        db_session.query(models.AnalysisResult)
+        .filter(models.AnalysisResult.analysis_type != "self_analysis")
+        .count()
+    )
+    assert category_results == 4
@@ -2,6 +2,7 @@ from unittest.mock import patch
 from uuid import uuid4
 
 from app import schemas
+from app.services import embedding_cache
 
 
 def test_generate_answer_success(client):
@@ -21,11 +22,13 @@ def test_generate_answer_success(client):
         referenced_memo_ids=[mock_search_result.id],
     )
 
+    embedding_cache.query_cache.clear()
+
     # Patch services
     with (
-        patch("app.services.embedding.get_embedding") as mock_get_embedding,
+        patch("app.services.embedding.get_embedding_async") as mock_get_embedding,
         patch("app.services.vector_search.search_similar_items") as mock_search,
-        patch("app.services.llm.generate_structured_response") as mock_llm,
+        patch("app.services.llm.generate_structured_response_async") as mock_llm,
     ):
         # Setup mocks
         mock_get_embedding.return_value = mock_embedding
@@ -43,6 +46,88 @@ def test_generate_answer_success(client):
         assert data["referenced_memo_ids"] == [str(mock_search_result.id)]
 
         # Verify calls
-        mock_get_embedding.assert_called_once_with(query_text)
+        mock_get_embedding.assert_called_once()
+        assert mock_get_embedding.call_args.args[0] == query_text
         mock_search.assert_called_once()
         mock_llm.assert_called_once()
+
+        # A repeated query reuses the cached embedding
+        response = client.post("/chat/answer", json={"query_text": query_text})
+        assert response.status_code == 200
+        mock_get_embedding.assert_called_once()
+
+
+def test_generate_answer_hybrid_opt_in(client, monkeypatch):
+    """
+    With RAG_HYBRID_SEARCH on, context comes from hybrid_search.
+    """
+    from app.services import answer_generation
+
+    embedding_cache.query_cache.clear()
+    monkeypatch.setattr(answer_generation, "RAG_HYBRID_SEARCH", True)
+    mock_search_result = schemas.SearchResult(
+        id=uuid4(), content="軽音サークルの部長", source_type="memo", similarity=0.4
+    )
+
+    with (
+        patch("app.services.embedding.get_embedding_async") as mock_get_embedding,
+        patch("app.services.vector_search.search_similar_items") as mock_search,
+        patch("app.services.vector_search.hybrid_search") as mock_hybrid,
+        patch("app.services.llm.generate_structured_response_async") as mock_llm,
+    ):
+        mock_get_embedding.return_value = [0.1] * 1536
+        mock_hybrid.return_value = [mock_search_result]
+        mock_llm.return_value = schemas.GeneratedAnswer(
+            reasoning="...", answer_text="部長です。", referenced_memo_ids=[]
+        )
+
+        response = client.post("/chat/answer", json={"query_text": "軽音サークル"})
+
+        assert response.status_code == 200
+        mock_search.assert_not_called()
+        mock_hybrid.assert_called_once()
+        assert mock_hybrid.call_args.args[1] == "軽音サークル"
+
+
+def test_batch_search_endpoint(client, db_session, test_user):
+    """
+    Several queries are embedded in one call and answered per query.
+    """
+    from app import crud
+
+    embedding_cache.query_cache.clear()
+    crud.create_rag_embedding(
+        db_session,
+        user_id=test_user.id,
+        content="Pythonでアプリを作った",
+        embedding=[1.0, 0.0] + [0.0] * 1534,
+    )
+    crud.create_rag_embedding(
+        db_session,
+        user_id=test_user.id,
+        content="サッカー部の副キャプテン",
+        embedding=[0.0, 1.0] + [0.0] * 1534,
+    )
+
+    with patch("app.services.embedding.get_embeddings_async") as mock_embed:
+        mock_embed.return_value = [
+            [1.0, 0.0] + [0.0] * 1534,
+            [0.0, 1.0] + [0.0] * 1534,
+        ]
+        response = client.post(
+            "/chat/search/batch",
+            json={"queries": ["技術", "部活動"], "limit": 1},
+        )
+
+    assert response.status_code == 200
+    mock_embed.assert_called_once()
+    assert mock_embed.call_args.args[0] == ["技術", "部活動"]
+    data = response.json()["results"]
+    assert [group["query_text"] for group in data] == ["技術", "部活動"]
+    assert [group["results"][0]["content"] for group in data] == [
+        "Pythonでアプリを作った",
+        "サッカー部の副キャプテン",
+    ]
+
+    response = client.post("/chat/search/batch", json={"queries": ["技術", ""]})
+    assert response.status_code == 422
@@ -0,0 +1,202 @@
+import asyncio
+import time
+import uuid
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from app import crud, models
+from app.core import security
+from app.core.pg_listen import PgListener
+from app.dependencies import auth
+from app.dependencies.auth import get_current_user
+from fastapi import HTTPException
+from sqlalchemy import delete, update
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture(scope="module")
+def test_user_events(test_db_setup):
+    listener = PgListener(
+        test_db_setup,
+        models.USERS_CHANGED_CHANNEL,
+        auth.invalidate_user,
+        on_reset=auth.user_cache.clear,
+    )
+    assert listener.wait_connected(10)
+    return listener
+
+
+@pytest.fixture(autouse=True)
+def user_events(test_user_events, monkeypatch):
+    # Listen on the test database, where the tests change users
+    monkeypatch.setattr(auth, "user_events", test_user_events)
+
+
+def test_get_current_user_does_not_block_event_loop():
+    """
+    Slow user lookups run off the event loop, so other coroutines keep going.
+    """
+    auth.user_cache.clear()
+    token = security.create_access_token(data={"sub": "slow@example.com"})
+    user = models.User(id=uuid.uuid4(), email="slow@example.com", name="Slow")
+
+    def slow_lookup(db, email):
+        time.sleep(0.3)
+        return user
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        users = await asyncio.gather(
+            *(get_current_user(token, db=MagicMock()) for _ in range(5))
+        )
+        ticker_task.cancel()
+        return users, ticks
+
+    with patch("app.crud.get_user_by_email", side_effect=slow_lookup):
+        started = time.perf_counter()
+        users, ticks = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+
+    assert [current_user.id for current_user in users] == [user.id] * 5
+    # Lookups overlap instead of running one after another (5 x 0.3s)
+    assert elapsed < 1.0
+    # The loop kept serving other work while the lookups were in flight
+    assert ticks >= 10
+
+
+def test_get_current_user_invalid_token():
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(get_current_user("not-a-token", db=MagicMock()))
+    assert excinfo.value.status_code == 401
+
+
+def test_get_current_user_cached_per_token(db_session):
+    user = models.User(email="cached@example.com", name="Cached User")
+    db_session.add(user)
+    db_session.commit()
+    token = security.create_access_token(data={"sub": user.email})
+    auth.user_cache.clear()
+
+    with patch(
+        "app.crud.get_user_by_email", wraps=crud.get_user_by_email
+    ) as mock_lookup:
+        first = asyncio.run(get_current_user(token, db=db_session))
+        second = asyncio.run(get_current_user(token, db=db_session))
+
+        mock_lookup.assert_called_once()
+        assert first == second
+        assert first.id == user.id
+        assert first.name == "Cached User"
+
+        # Changing the user invalidates its cached sessions
+        user.name = "Renamed User"
+        db_session.commit()
+        third = asyncio.run(get_current_user(token, db=db_session))
+
+        assert mock_lookup.call_count == 2
+        assert third.name == "Renamed User"
+
+
+def test_cached_user_never_outlives_token():
+    auth.user_cache.clear()
+    token = security.create_access_token(
+        data={"sub": "short@example.com"}, expires_delta=timedelta(seconds=2)
+    )
+    user = models.User(id=uuid.uuid4(), email="short@example.com", name="Short")
+
+    with (
+        patch("app.crud.get_user_by_email", return_value=user),
+        patch("app.core.cache.time.monotonic") as mock_time,
+    ):
+        mock_time.return_value = 1000.0
+        asyncio.run(get_current_user(token, db=MagicMock()))
+        key = auth._token_key("short@example.com", token)
+        assert auth.user_cache.get(key) is not None
+
+        # The cache TTL is minutes, but the token expires after two seconds
+        mock_time.return_value = 1003.0
+        assert auth.user_cache.get(key) is None
+
+
+def _wait_until_uncached(key, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if auth.user_cache.get(key) is None:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def committed_user(test_db_setup):
+    """
+    A user committed outside a test transaction, changed below through other
+    connections, as another process would.
+    """
+    db = sessionmaker(bind=test_db_setup)()
+    user = models.User(email="other_process@example.com", name="Other")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    yield db, user
+    db.rollback()
+    db.execute(delete(models.User).where(models.User.id == user_id))
+    db.commit()
+    db.close()
+
+
+def test_changes_from_other_processes_drop_cached_logins(committed_user, test_db_setup):
+    db, user = committed_user
+    user_id = user.id
+    token = security.create_access_token(data={"sub": user.email})
+    auth.user_cache.clear()
+    key = auth._token_key(user.email, token)
+    assert asyncio.run(get_current_user(token, db=db)).name == "Other"
+    assert auth.user_cache.get(key) is not None
+
+    # A corpus_version bump is not a change to the login
+    with test_db_setup.begin() as connection:
+        connection.execute(
+            update(models.User)
+            .where(models.User.id == user_id)
+            .values(corpus_version=models.User.corpus_version + 1)
+        )
+    assert not _wait_until_uncached(key, timeout=0.5)
+
+    # Bulk Core statements on another connection bypass the ORM listeners
+    with test_db_setup.begin() as connection:
+        connection.execute(
+            update(models.User).where(models.User.id == user_id).values(name="New")
+        )
+    assert _wait_until_uncached(key)
+    db.commit()
+    assert asyncio.run(get_current_user(token, db=db)).name == "New"
+
+    with test_db_setup.begin() as connection:
+        connection.execute(delete(models.User).where(models.User.id == user_id))
+    assert _wait_until_uncached(key)
+    db.commit()
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(get_current_user(token, db=db))
+    assert excinfo.value.status_code == 401
+
+
+def test_logins_are_not_cached_without_the_listener(monkeypatch):
+    auth.user_cache.clear()
+    monkeypatch.setattr(auth, "user_events", MagicMock(connected=False))
+    token = security.create_access_token(data={"sub": "unheard@example.com"})
+    user = models.User(id=uuid.uuid4(), email="unheard@example.com", name="Unheard")
+
+    with patch("app.crud.get_user_by_email", return_value=user):
+        asyncio.run(get_current_user(token, db=MagicMock()))
+
+    assert auth.user_cache.get(auth._token_key(user.email, token)) is None
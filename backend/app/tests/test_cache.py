@@ -0,0 +1,74 @@
+import threading
+from unittest.mock import patch
+
+from app.core.cache import TTLCache
+from app.services import embedding_cache
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Touch "a" so that "b" becomes least recently used
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = TTLCache(maxsize=10, ttl=60)
+    with patch("app.core.cache.time.monotonic") as mock_time:
+        mock_time.return_value = 1000.0
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=5)
+
+        mock_time.return_value = 1010.0
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+
+        mock_time.return_value = 1061.0
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_disabled_cache():
+    cache = TTLCache(maxsize=0, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_thread_safety():
+    cache = TTLCache(maxsize=50, ttl=60)
+
+    def worker(offset):
+        for i in range(1000):
+            cache.set((offset, i % 100), i)
+            cache.get((offset, (i + 1) % 100))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats["size"] == 50
+    assert stats["hits"] + stats["misses"] == 8000
+
+
+def test_query_embedding_cached():
+    embedding_cache.query_cache.clear()
+    with patch("app.services.embedding.get_embedding") as mock_get_embedding:
+        mock_get_embedding.return_value = [0.1] * 1536
+
+        first = embedding_cache.get_query_embedding("私の強みは何ですか？")
+        second = embedding_cache.get_query_embedding("私の強みは何ですか? ")
+
+        mock_get_embedding.assert_called_once()
+        assert first == second
+        assert embedding_cache.get_query_cache_stats()["hits"] >= 1
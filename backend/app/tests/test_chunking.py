@@ -0,0 +1,58 @@
+import pytest
+from app.services.chunking import chunk_text, iter_chunks, iter_sentences
+
+TEXT = (
+    "高校では吹奏楽部に所属していました。部長として60人をまとめました！"
+    "大変だったことは何か？「練習方法の対立」です。\n"
+    "話し合いを重ねて解決しました"
+)
+
+
+def test_iter_sentences_splits_on_terminators_and_line_breaks():
+    sentences = list(iter_sentences(TEXT))
+
+    assert sentences == [
+        "高校では吹奏楽部に所属していました。",
+        "部長として60人をまとめました！",
+        "大変だったことは何か？",
+        "「練習方法の対立」です。\n",
+        "話し合いを重ねて解決しました",
+    ]
+    assert "".join(sentences) == TEXT
+
+
+def test_iter_sentences_streams_pieces():
+    pieces = [TEXT[i : i + 7] for i in range(0, len(TEXT), 7)]
+
+    assert list(iter_sentences(pieces)) == list(iter_sentences(TEXT))
+    # Terminators split across pieces stay with their sentence
+    assert list(iter_sentences(["本当？", "！次へ。"])) == ["本当？！", "次へ。"]
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("  一文だけのメモ。 ", max_chars=100) == ["一文だけのメモ。"]
+    assert chunk_text("\n \n") == []
+
+
+def test_chunks_respect_size_and_overlap():
+    sentences = [f"これは{i:02d}番目の文です。" for i in range(30)]
+
+    chunks = chunk_text("".join(sentences), max_chars=60, overlap_chars=15)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 60 for chunk in chunks)
+    for previous, chunk in zip(chunks[:-1], chunks[1:], strict=True):
+        # Each chunk repeats the last sentence of the previous one
+        assert chunk.startswith(previous[-12:])
+    assert {s for s in sentences if not any(s in c for c in chunks)} == set()
+
+
+def test_long_sentence_is_cut_to_chunk_size():
+    chunks = list(iter_chunks("あ" * 250 + "。", max_chars=100, overlap_chars=0))
+
+    assert [len(chunk) for chunk in chunks] == [100, 100, 51]
+
+
+def test_max_chars_must_be_positive():
+    with pytest.raises(ValueError):
+        chunk_text("テキスト", max_chars=0)
@@ -0,0 +1,105 @@
+import base64
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from app import crud, models
+from app.core.vector import normalize_embedding, to_vector_literal
+from app.services.embedding import get_embeddings
+
+
+def _mock_response(inputs, reverse=False):
+    """
+    Builds a fake embeddings response whose vectors encode the input text.
+    """
+    items = [
+        MagicMock(index=i, embedding=[float(len(text))] * 1536)
+        for i, text in enumerate(inputs)
+    ]
+    if reverse:
+        items.reverse()
+    response = MagicMock()
+    response.data = items
+    return response
+
+
+def test_get_embeddings_single_request():
+    """
+    All texts are sent in one request and results are mapped back by index.
+    """
+    texts = ["a", "bb", "ccc"]
+    with patch("app.services.embedding.client.embeddings.create") as mock_create:
+        mock_create.side_effect = lambda input, model: _mock_response(
+            input, reverse=True
+        )
+
+        embeddings = get_embeddings(texts)
+
+        mock_create.assert_called_once()
+        assert mock_create.call_args.kwargs["input"] == texts
+        assert [vector[0] for vector in embeddings] == [1.0, 2.0, 3.0]
+
+
+def test_get_embeddings_splits_oversized_batches():
+    """
+    Batches exceeding the input or token limits are split into several calls.
+    """
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+    with patch("app.services.embedding.client.embeddings.create") as mock_create:
+        mock_create.side_effect = lambda input, model: _mock_response(input)
+
+        embeddings = get_embeddings(texts, max_inputs=2)
+
+        assert mock_create.call_count == 3
+        assert [vector[0] for vector in embeddings] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+        mock_create.reset_mock()
+        embeddings = get_embeddings(texts, max_tokens=6)
+
+        batches = [call.kwargs["input"] for call in mock_create.call_args_list]
+        assert batches == [["a", "bb", "ccc"], ["dddd"], ["eeeee"]]
+        assert [vector[0] for vector in embeddings] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_get_embeddings_empty():
+    with patch("app.services.embedding.client.embeddings.create") as mock_create:
+        assert get_embeddings([]) == []
+        mock_create.assert_not_called()
+
+
+def test_get_embeddings_base64_decodes_to_float32():
+    """
+    In base64 mode the packed float32 bytes become NumPy arrays directly.
+    """
+    vectors = np.random.default_rng(0).standard_normal((2, 1536)).astype(np.float32)
+    response = MagicMock()
+    response.data = [
+        MagicMock(index=i, embedding=base64.b64encode(vector.tobytes()).decode())
+        for i, vector in enumerate(vectors)
+    ]
+    with patch("app.services.embedding.client.embeddings.create") as mock_create:
+        mock_create.return_value = response
+
+        embeddings = get_embeddings(["a", "b"], encoding_format="base64")
+
+        assert mock_create.call_args.kwargs["encoding_format"] == "base64"
+    assert all(vector.dtype == np.float32 for vector in embeddings)
+    np.testing.assert_array_equal(np.stack(embeddings), vectors)
+
+
+def test_vector_literal_round_trips_float32(db_session):
+    vector = np.random.default_rng(1).standard_normal(1536).astype(np.float32)
+    literal = to_vector_literal(vector, 1536)
+    parsed = np.array(literal[1:-1].split(","), dtype=np.float32)
+    np.testing.assert_array_equal(parsed, vector)
+    with pytest.raises(ValueError):
+        to_vector_literal(vector, 3)
+
+    # Arrays are bound to pgvector as they are (after unit normalization)
+    user = models.User(email="float32@example.com", name="Float32 User")
+    db_session.add(user)
+    db_session.commit()
+    item = crud.create_rag_embedding(
+        db_session, user_id=user.id, content="memo", embedding=vector
+    )
+    np.testing.assert_array_equal(item.embedding, normalize_embedding(vector))
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from app import crud, models
+from app.services import embedding, embedding_cache
+from sqlalchemy.orm import Session
+
+
+def test_repeated_text_hits_cache(db_session: Session):
+    """
+    Re-embedding the same (normalized) text costs no API call.
+    """
+    with patch("app.services.embedding.get_embeddings") as mock_embeddings:
+        mock_embeddings.side_effect = lambda texts, model: [
+            [float(i + 1)] * 1536 for i in range(len(texts))
+        ]
+        before = embedding_cache.get_cache_stats()
+
+        first = embedding_cache.get_embeddings_cached(
+            db_session, ["私の強みは粘り強さです。", "別の回答"]
+        )
+        # Whitespace and full-width variants normalize to the same key
+        second = embedding_cache.get_embedding_cached(
+            db_session, "  私の強みは粘り強さです。 "
+        )
+
+        mock_embeddings.assert_called_once()
+        assert second == first[0]
+
+        after = embedding_cache.get_cache_stats()
+        assert after["misses"] - before["misses"] == 2
+        assert after["hits"] - before["hits"] == 1
+
+    entry = (
+        db_session.query(models.EmbeddingCache)
+        .filter_by(
+            content_hash=embedding_cache.content_hash("私の強みは粘り強さです。")
+        )
+        .one()
+    )
+    assert entry.hit_count == 1
+
+
+def test_duplicate_texts_embedded_once(db_session: Session):
+    with patch("app.services.embedding.get_embeddings") as mock_embeddings:
+        mock_embeddings.return_value = [[0.5] * 1536]
+
+        result = embedding_cache.get_embeddings_cached(db_session, ["same", "same"])
+
+        mock_embeddings.assert_called_once_with(
+            ["same"], model="text-embedding-3-small"
+        )
+        assert len(result) == 2
+
+
+def test_entries_are_keyed_by_output_dimensions(db_session: Session, monkeypatch):
+    """
+    A cached vector is only reused for the size it was requested at, in the
+    database and in the query memo alike.
+    """
+    text_hash = embedding_cache.content_hash("同じ文章")
+    crud.create_cached_embeddings(
+        db_session, embedding_cache.DEFAULT_MODEL, 768, {text_hash: [0.1] * 1536}
+    )
+    embedding_cache.query_cache.clear()
+    with (
+        patch("app.services.embedding.get_embeddings") as mock_embeddings,
+        patch("app.services.embedding.get_embedding") as mock_embedding,
+    ):
+        mock_embeddings.return_value = [[0.5] * 1536]
+        mock_embedding.side_effect = lambda text, model: [0.5] * (
+            embedding.EMBEDDING_DIMENSIONS
+        )
+
+        vector = embedding_cache.get_embedding_cached(db_session, "同じ文章")
+        embedding_cache.get_query_embedding("同じ質問")
+        monkeypatch.setattr(embedding, "EMBEDDING_DIMENSIONS", 768)
+        query = embedding_cache.get_query_embedding("同じ質問")
+
+    mock_embeddings.assert_called_once()
+    assert vector == [0.5] * 1536
+    assert mock_embedding.call_count == 2
+    assert len(query) == 768
+    assert sorted(
+        row.dimensions for row in db_session.query(models.EmbeddingCache)
+    ) == [768, 1536]
+
+
+def test_evict_by_age_and_size(db_session: Session):
+    now = datetime.now(timezone.utc)
+    for i, age_days in enumerate([100, 3, 2, 1]):
+        db_session.add(
+            models.EmbeddingCache(
+                model="m",
+                dimensions=1536,
+                content_hash=f"hash-{i}",
+                embedding=[0.1] * 1536,
+                last_used_at=now - timedelta(days=age_days),
+            )
+        )
+    db_session.commit()
+
+    deleted = crud.evict_embedding_cache(
+        db_session, max_age=timedelta(days=30), max_entries=2
+    )
+
+    assert deleted == 2
+    remaining = {row.content_hash for row in db_session.query(models.EmbeddingCache)}
+    assert remaining == {"hash-2", "hash-3"}
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+
+from app import models
+from app.services.embedding_gc import sweep_orphaned_embeddings
+from sqlalchemy.orm import Session
+
+
+def _embedding(user, content, source_type="episode", age=timedelta(hours=1)):
+    return models.RagEmbedding(
+        user_id=user.id,
+        source_type=source_type,
+        content=content,
+        embedding=[0.1] * 1536,
+        created_at=datetime.now(timezone.utc) - age,
+    )
+
+
+def test_sweep_deletes_only_unreferenced_answer_embeddings(db_session: Session):
+    user = models.User(email="gc@example.com", name="GC User")
+    question = models.Question(
+        category="test", question_text="Q?", display_order=1, weight=1.0
+    )
+    db_session.add_all([user, question])
+    db_session.commit()
+
+    referenced = _embedding(user, "current answer")
+    orphans = [_embedding(user, f"old answer {i}") for i in range(5)]
+    recent_orphan = _embedding(user, "just created", age=timedelta(seconds=1))
+    memo = _embedding(user, "memo", source_type="memo")
+    db_session.add_all([referenced, *orphans, recent_orphan, memo])
+    db_session.commit()
+    db_session.add(
+        models.UserAnswer(
+            user_id=user.id,
+            question_id=question.id,
+            answer_text="current answer",
+            embedding_id=referenced.id,
+        )
+    )
+    db_session.commit()
+
+    report = sweep_orphaned_embeddings(
+        db_session, batch_size=2, min_age=timedelta(minutes=10)
+    )
+
+    assert report["rows"] == 5
+    assert report["batches"] == 3
+    assert report["bytes"] > 5 * 1536 * 4
+    remaining = {row.content for row in db_session.query(models.RagEmbedding)}
+    assert remaining == {"current answer", "just created", "memo"}
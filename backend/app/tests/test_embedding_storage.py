@@ -0,0 +1,225 @@
+import numpy as np
+import pytest
+from app.core.vector import HalfVector, embedding_type, shorten_embedding
+from app.services import embedding, embedding_storage
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import sessionmaker
+
+TABLE = "embedding_storage_scratch"
+INDEX = "ix_embedding_storage_scratch_hnsw"
+
+
+@pytest.fixture
+def scratch_db(test_db_setup):
+    """
+    Session on a scratch table with vector(8) embeddings. The conversion
+    commits, so the table is created and dropped outside a test transaction.
+    """
+    db = sessionmaker(bind=test_db_setup)()
+    db.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    db.execute(
+        text(
+            f"CREATE TABLE {TABLE} (id uuid PRIMARY KEY DEFAULT gen_random_uuid(), "
+            "embedding vector(8) NOT NULL)"
+        )
+    )
+    db.execute(
+        text(
+            f"CREATE INDEX {INDEX} ON {TABLE} USING hnsw (embedding vector_cosine_ops)"
+        )
+    )
+    db.commit()
+    yield db
+    db.rollback()
+    db.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    db.commit()
+    db.close()
+
+
+def _insert(db, vectors):
+    db.execute(
+        text(f"INSERT INTO {TABLE} (embedding) VALUES (:embedding)"),
+        [{"embedding": str(list(map(float, v)))} for v in vectors],
+    )
+    db.commit()
+
+
+def _stored(db):
+    rows = db.execute(
+        text(f"SELECT embedding FROM {TABLE} ORDER BY id").columns(
+            embedding=embedding_type("vector", 4)
+        )
+    )
+    return np.stack([row.embedding for row in rows])
+
+
+def test_shorten_embedding_truncates_and_normalizes():
+    shortened = shorten_embedding([3.0, 4.0, 12.0], 2)
+
+    assert shortened.dtype == np.float32
+    assert shortened.tolist() == pytest.approx([0.6, 0.8])
+    assert shorten_embedding([0.0, 0.0, 1.0], 2).tolist() == [0.0, 0.0]
+
+
+def test_halfvec_type_reads_float32_arrays():
+    process = HalfVector(3).result_processor(None, None)
+
+    value = process("[1,2.5,-3]")
+
+    assert value.dtype == np.float32
+    assert value.tolist() == [1.0, 2.5, -3.0]
+    assert HalfVector(3).bind_processor(None)(np.array([1, 2, 3])) == "[1,2,3]"
+
+
+def test_request_options_ask_for_shortened_embeddings(monkeypatch):
+    assert "dimensions" not in embedding._request_options("float")
+
+    monkeypatch.setattr(embedding, "EMBEDDING_DIMENSIONS", 768)
+
+    assert embedding._request_options("base64") == {
+        "encoding_format": "base64",
+        "dimensions": 768,
+    }
+
+
+def test_convert_embeddings_shortens_rows_and_rebuilds_index(scratch_db):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((5, 8)).astype(np.float32)
+    _insert(scratch_db, vectors)
+
+    report = embedding_storage.convert_embeddings(
+        scratch_db, TABLE, "vector", 4, index_name=INDEX, batch_size=2
+    )
+
+    assert report == {
+        "from": "vector(8)",
+        "to": "vector(4)",
+        "rows": 5,
+        "index_rebuilt": True,
+    }
+    assert embedding_storage.column_storage(scratch_db, TABLE) == ("vector", 4)
+    stored = _stored(scratch_db)
+    expected = {tuple(shorten_embedding(v, 4).round(5)) for v in vectors}
+    assert {tuple(v.round(5)) for v in stored} == expected
+    index = scratch_db.execute(
+        text("SELECT indexdef FROM pg_indexes WHERE indexname = :name"),
+        {"name": INDEX},
+    ).scalar_one()
+    assert "hnsw" in index and "vector_cosine_ops" in index
+
+    again = embedding_storage.convert_embeddings(scratch_db, TABLE, "vector", 4)
+    assert again["rows"] == 0
+
+
+def test_rows_updated_during_backfill_are_reconverted(scratch_db, monkeypatch):
+    _insert(scratch_db, [[1, 0, 0, 0, 0, 0, 0, 0]])
+    convert_pending = embedding_storage._convert_pending
+
+    def write_after_backfill(db, *args, commit):
+        converted = convert_pending(db, *args, commit=commit)
+        if commit:
+            db.execute(text(f"UPDATE {TABLE} SET embedding = '[0,1,0,0,0,0,0,0]'"))
+            db.commit()
+        return converted
+
+    monkeypatch.setattr(embedding_storage, "_convert_pending", write_after_backfill)
+    embedding_storage.convert_embeddings(scratch_db, TABLE, "vector", 4)
+
+    assert _stored(scratch_db).tolist() == [[0.0, 1.0, 0.0, 0.0]]
+
+
+def test_backfill_leaves_the_column_to_the_running_app(scratch_db):
+    # Like embedding_cache, whose entries are keyed by their size
+    scratch_db.execute(
+        text(f"ALTER TABLE {TABLE} ADD COLUMN dimensions integer DEFAULT 8")
+    )
+    _insert(scratch_db, [[1, 0, 0, 0, 0, 0, 0, 0]])
+
+    report = embedding_storage.backfill_embeddings(scratch_db, TABLE, "vector", 4)
+
+    assert report["rows"] == 1
+    assert embedding_storage.column_storage(scratch_db, TABLE) == ("vector", 8)
+    # Writes of the app on the old settings still fit
+    _insert(scratch_db, [[0, 0, 1, 0, 0, 0, 0, 0]])
+    with pytest.raises(RuntimeError, match="backfill"):
+        embedding_storage.swap_embeddings(scratch_db, "rag_embeddings", "vector", 4)
+    scratch_db.rollback()
+
+    swapped = embedding_storage.swap_embeddings(
+        scratch_db, TABLE, "vector", 4, index_name=INDEX
+    )
+
+    assert swapped["rows"] == 1
+    assert sorted(_stored(scratch_db).tolist()) == [[0, 0, 1, 0], [1, 0, 0, 0]]
+    dimensions = scratch_db.execute(text(f"SELECT DISTINCT dimensions FROM {TABLE}"))
+    assert dimensions.scalars().all() == [4]
+
+
+def test_halfvec_conversion_round_trips(scratch_db):
+    if embedding_storage.pgvector_version(scratch_db) < (
+        embedding_storage.HALFVEC_MIN_VERSION
+    ):
+        pytest.skip("halfvec needs pgvector 0.7.0 or later")
+    _insert(scratch_db, [[3, 4, 0, 0, 1, 1, 1, 1]])
+
+    embedding_storage.convert_embeddings(
+        scratch_db, TABLE, "halfvec", 4, index_name=INDEX
+    )
+    halfvec = embedding_type("halfvec", 4)
+    scratch_db.execute(
+        text(f"INSERT INTO {TABLE} (embedding) VALUES (:embedding)").bindparams(
+            bindparam("embedding", type_=halfvec)
+        ),
+        {"embedding": np.array([0, 0, 0.6, 0.8], dtype=np.float32)},
+    )
+    scratch_db.commit()
+    rows = scratch_db.execute(
+        text(f"SELECT embedding FROM {TABLE}").columns(embedding=halfvec)
+    ).all()
+
+    assert embedding_storage.column_storage(scratch_db, TABLE) == ("halfvec", 4)
+    stored = sorted(row.embedding.tolist() for row in rows)
+    assert all(isinstance(row.embedding, np.ndarray) for row in rows)
+    assert stored[0] == pytest.approx([0, 0, 0.6, 0.8], abs=1e-3)
+    assert stored[1] == pytest.approx([0.6, 0.8, 0, 0], abs=1e-3)
+
+
+def test_convert_embeddings_refuses_unsupported_targets(scratch_db, monkeypatch):
+    with pytest.raises(ValueError, match="re-embedding"):
+        embedding_storage.convert_embeddings(scratch_db, TABLE, "vector", 16)
+
+    monkeypatch.setattr(embedding_storage, "pgvector_version", lambda db: (0, 6, 2))
+    with pytest.raises(RuntimeError, match="0.7.0"):
+        embedding_storage.convert_embeddings(scratch_db, TABLE, "halfvec", 4)
+
+    assert embedding_storage.column_storage(scratch_db, TABLE) == ("vector", 8)
+
+
+def test_convert_embeddings_truncates_signatures(scratch_db):
+    scratch_db.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN embedding_bits bit(8)"))
+    scratch_db.commit()
+    _insert(scratch_db, [[1, -1, 1, 1, -1, -1, 1, -1]])
+    scratch_db.execute(text(f"UPDATE {TABLE} SET embedding_bits = B'10110010'"))
+    scratch_db.commit()
+
+    embedding_storage.convert_embeddings(scratch_db, TABLE, "vector", 4)
+
+    bits = scratch_db.execute(
+        text(f"SELECT embedding_bits::text FROM {TABLE}")
+    ).scalar_one()
+    assert bits == "1011"
+
+
+def test_rebuild_index_follows_metric(scratch_db):
+    assert not embedding_storage.rebuild_index(scratch_db, TABLE, INDEX, "vector")
+
+    assert embedding_storage.rebuild_index(
+        scratch_db, TABLE, INDEX, "vector", metric="inner_product"
+    )
+    indexes = scratch_db.execute(
+        text("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = :table"),
+        {"table": TABLE},
+    ).all()
+    hnsw = [definition for name, definition in indexes if "hnsw" in definition]
+    assert hnsw == [next(d for name, d in indexes if name == INDEX)]
+    assert "vector_ip_ops" in hnsw[0]
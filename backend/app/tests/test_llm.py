@@ -1,8 +1,9 @@
+import asyncio
 from unittest.mock import MagicMock, patch
 
 import openai
 import pytest
-from app.services.llm import generate_response
+from app.services.llm import generate_response, generate_response_async
 from fastapi import HTTPException
 
 
@@ -46,3 +47,36 @@ def test_generate_response_api_error():
 
         assert excinfo.value.status_code == 429
         assert "Rate limit exceeded" in excinfo.value.detail
+
+
+def test_generate_response_async_bounded_concurrency():
+    """
+    Async requests share one client and never exceed OPENAI_MAX_CONCURRENCY.
+    """
+    in_flight = 0
+    max_in_flight = 0
+
+    async def slow_create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return MagicMock(choices=[MagicMock(message=MagicMock(content="ok"))])
+
+    async def run_many():
+        return await asyncio.gather(
+            *(generate_response_async(f"Prompt {i}") for i in range(20))
+        )
+
+    with (
+        patch("app.core.openai.OPENAI_MAX_CONCURRENCY", 3),
+        patch(
+            "app.services.llm.async_client.chat.completions.create",
+            side_effect=slow_create,
+        ),
+    ):
+        responses = asyncio.run(run_many())
+
+    assert responses == ["ok"] * 20
+    assert max_in_flight == 3
@@ -2,6 +2,7 @@ from unittest.mock import patch
 from uuid import uuid4
 
 from app import models
+from sqlalchemy import event
 
 
 def test_read_questions(client, db_session):
@@ -32,8 +33,8 @@ def test_submit_answers(client, db_session):
         "answers": [{"question_id": question_id, "answer_text": "This is an answer."}]
     }
 
-    with patch("app.routers.questionnaire.get_embedding") as mock_embedding:
-        mock_embedding.return_value = [0.1] * 1536
+    with patch("app.services.embedding.get_embeddings_async") as mock_embeddings:
+        mock_embeddings.return_value = [[0.1] * 1536]
 
         response = client.post("/answers/submit", json=payload)
         assert response.status_code == 200
@@ -50,6 +51,105 @@ def test_submit_answers(client, db_session):
         assert embedding.source_type == "episode"
         assert str(embedding.question_id) == question_id
 
+        # All answers are embedded in one batched call
+        mock_embeddings.assert_called_once()
+        assert mock_embeddings.call_args.args[0] == ["This is an answer."]
+
+        # The analysis is queued for the workers instead of run in-process
+        job = db_session.query(models.AnalysisJob).one()
+        assert job.user_id == answer.user_id
+        assert job.status == "queued"
+
+
+def test_submit_answers_bulk_upsert(client, db_session):
+    questions = [
+        models.Question(
+            category="test", question_text=f"Q{i}?", display_order=i, weight=1.0
+        )
+        for i in range(3)
+    ]
+    db_session.add_all(questions)
+    db_session.commit()
+
+    def submit(texts):
+        payload = {
+            "answers": [
+                {"question_id": str(question.id), "answer_text": text}
+                for question, text in zip(questions, texts, strict=True)
+            ]
+        }
+        return client.post("/answers/submit", json=payload)
+
+    statements = []
+
+    def count_statements(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with patch("app.services.embedding.get_embeddings_async") as mock_embeddings:
+        mock_embeddings.side_effect = lambda texts, model: [[0.1] * 1536] * len(texts)
+
+        assert submit(["a1", "b1", "c1"]).status_code == 200
+        first_ids = {
+            answer.question_id: answer.id
+            for answer in db_session.query(models.UserAnswer)
+        }
+
+        event.listen(db_session.bind, "before_cursor_execute", count_statements)
+        try:
+            assert submit(["a2", "b2", "c2"]).status_code == 200
+        finally:
+            event.remove(db_session.bind, "before_cursor_execute", count_statements)
+
+    # Existing answers are updated in place
+    answers = db_session.query(models.UserAnswer).all()
+    assert len(answers) == 3
+    assert {answer.question_id: answer.id for answer in answers} == first_ids
+    assert sorted(answer.answer_text for answer in answers) == ["a2", "b2", "c2"]
+
+    # Embeddings are replaced in place, so re-submits leave no orphaned vectors
+    embeddings = db_session.query(models.RagEmbedding).all()
+    assert len(embeddings) == 3
+    assert {answer.embedding_id for answer in answers} == {e.id for e in embeddings}
+    assert sorted(e.content for e in embeddings) == ["a2", "b2", "c2"]
+
+    # One statement each for embeddings and answers, regardless of answer count
+    assert not any("INSERT INTO rag_embeddings" in sql for sql in statements)
+    assert sum("UPDATE rag_embeddings" in sql for sql in statements) == 1
+    assert sum("INSERT INTO user_answers" in sql for sql in statements) == 1
+
+
+def test_submit_answers_duplicate_question_keeps_last(client, db_session):
+    question = models.Question(
+        category="test", question_text="Test Question?", display_order=1, weight=1.0
+    )
+    db_session.add(question)
+    db_session.commit()
+    payload = {
+        "answers": [
+            {"question_id": str(question.id), "answer_text": "first"},
+            {"question_id": str(question.id), "answer_text": "second"},
+        ]
+    }
+
+    with patch("app.services.embedding.get_embeddings_async") as mock_embeddings:
+        mock_embeddings.side_effect = lambda texts, model: [[0.1] * 1536] * len(texts)
+        response = client.post("/answers/submit", json=payload)
+
+    assert response.status_code == 200
+    answers = db_session.query(models.UserAnswer).all()
+    assert [answer.answer_text for answer in answers] == ["second"]
+
+
+def test_submit_answers_unknown_question(client, db_session):
+    payload = {"answers": [{"question_id": str(uuid4()), "answer_text": "Answer"}]}
+
+    with patch("app.services.embedding.get_embeddings_async") as mock_embeddings:
+        response = client.post("/answers/submit", json=payload)
+
+        assert response.status_code == 404
+        # Questions are validated before any embedding is requested
+        mock_embeddings.assert_not_called()
+
 
 def test_get_analysis(client, db_session):
     # Create a user and analysis result
@@ -86,3 +186,27 @@ def test_get_analysis_not_found(client, db_session):
     user_id = str(uuid4())
     response = client.get(f"/analysis/{user_id}")
     assert response.status_code == 404
+
+
+def test_answer_feedback(client, db_session):
+    question = models.Question(
+        category="test", question_text="Test Question?", display_order=1, weight=1.0
+    )
+    db_session.add(question)
+    db_session.commit()
+
+    with patch("app.services.llm.generate_response_async") as mock_llm:
+        mock_llm.return_value = (
+            "良い回答です。\n- 数字を入れましょう\n- 結果を書きましょう"
+        )
+
+        response = client.post(
+            f"/answers/{question.id}/feedback", json={"answer_text": "回答"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["suggestions"] == [
+            "数字を入れましょう",
+            "結果を書きましょう",
+        ]
+        mock_llm.assert_awaited_once()
@@ -1,6 +1,10 @@
 from unittest.mock import MagicMock, patch
 
+import pytest
 from app import models
+from app.services import ingest
+from sqlalchemy import delete
+from sqlalchemy.orm import sessionmaker
 
 TEST_USER_EMAIL = "user@example.com"
 
@@ -13,21 +17,22 @@ def test_create_memo_success(client, db_session):
     # Mock OpenAI client
     mock_embedding = [0.1] * 1536
 
-    # We need to patch the 'client' object in app.main, NOT openai.embeddings
+    # We need to patch the 'client' object used by the embedding service,
+    # NOT openai.embeddings
     # Because we switched to instantiating a client: client = openai.OpenAI(...)
-    with patch("app.main.client.embeddings.create") as mock_create:
+    with patch("app.services.embedding.client.embeddings.create") as mock_create:
         # Setup mock response
         mock_response = MagicMock()
-        mock_response.data = [MagicMock(embedding=mock_embedding)]
+        mock_response.data = [MagicMock(index=0, embedding=mock_embedding)]
         mock_create.return_value = mock_response
 
         response = client.post("/memos", json={"text": "This is a test memo."})
 
         assert response.status_code == 200
-        assert response.json() == {
-            "status": "success",
-            "message": "Memo saved successfully",
-        }
+        body = response.json()
+        assert body["status"] == "success"
+        assert body["message"] == "Memo saved successfully"
+        assert body["chunks"] == 1
 
         # Verify DB content
         # 1. User should exist
@@ -61,7 +66,7 @@ def test_create_memo_openai_error(client):
     """
     import openai
 
-    with patch("app.main.client.embeddings.create") as mock_create:
+    with patch("app.services.embedding.client.embeddings.create") as mock_create:
         # Simulate OpenAI API error (e.g. 401 Unauthorized)
         # APIStatusError requires message, response, body
         mock_response = MagicMock()
@@ -75,3 +80,104 @@ def test_create_memo_openai_error(client):
         # Should return 503 Service Unavailable (or 500) instead of 401
         assert response.status_code == 503
         assert "OpenAI API Error" in response.json()["detail"]
+
+
+def test_long_memo_is_stored_as_chunks(client, db_session):
+    """
+    A memo longer than one chunk is split on sentence ends, embedded in one
+    API call, and stored as rows sharing a source_id.
+    """
+    text = "".join(f"これは{i}番目の出来事についての文です。" for i in range(60))
+
+    def embeddings_response(input, model, **kwargs):
+        response = MagicMock()
+        response.data = [
+            MagicMock(index=i, embedding=[0.1] * 1536) for i in range(len(input))
+        ]
+        return response
+
+    with patch(
+        "app.services.embedding.client.embeddings.create",
+        side_effect=embeddings_response,
+    ) as mock_create:
+        response = client.post("/memos", json={"text": text})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["chunks"] > 1
+    assert mock_create.call_count == 1
+
+    rows = (
+        db_session.query(models.RagEmbedding)
+        .filter(models.RagEmbedding.source_id == body["source_id"])
+        .all()
+    )
+    assert len(rows) == body["chunks"]
+    assert all(row.content.endswith("。") for row in rows)
+    assert all(len(row.content) <= 400 for row in rows)
+
+
+def _sentences(count: int, consumed: list):
+    # Yields the memo one long sentence (one chunk) at a time, recording how
+    # far it has been read
+    for i in range(count):
+        consumed.append(i)
+        yield "出来事" * 100 + f"{i}。"
+
+
+def _user(db, email: str) -> models.User:
+    user = models.User(email=email, name="Ingest User")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_ingest_consumes_chunks_in_batches(db_session, monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_BATCH_SIZE", 2)
+    user = _user(db_session, "ingest_batches@example.com")
+    consumed = []
+    calls = []
+
+    def get_embeddings(texts, model):
+        calls.append((len(texts), len(consumed)))
+        return [[0.1] * 1536 for _ in texts]
+
+    with patch("app.services.embedding.get_embeddings", side_effect=get_embeddings):
+        source_id, ids = ingest.ingest_text(
+            db_session, user.id, _sentences(5, consumed)
+        )
+
+    assert len(ids) == 5
+    assert [size for size, _ in calls] == [2, 2, 1]
+    # The first batch is embedded before the memo has been read to the end
+    assert calls[0][1] < 5
+    rows = db_session.query(models.RagEmbedding).filter_by(source_id=source_id)
+    assert rows.count() == 5
+
+
+def test_failed_ingest_removes_stored_batches(test_db_setup, monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_BATCH_SIZE", 2)
+    db = sessionmaker(bind=test_db_setup)()
+    user = _user(db, "ingest_failure@example.com")
+    user_id = user.id
+    calls = []
+
+    def get_embeddings(texts, model):
+        calls.append(texts)
+        if len(calls) == 2:
+            raise RuntimeError("embedding failed")
+        return [[0.1] * 1536 for _ in texts]
+
+    try:
+        with (
+            patch("app.services.embedding.get_embeddings", side_effect=get_embeddings),
+            pytest.raises(RuntimeError),
+        ):
+            ingest.ingest_text(db, user_id, _sentences(5, []))
+
+        assert db.query(models.RagEmbedding).filter_by(user_id=user_id).count() == 0
+    finally:
+        db.rollback()
+        db.execute(delete(models.User).where(models.User.id == user_id))
+        db.commit()
+        db.close()
@@ -0,0 +1,201 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from app import crud, models
+from app.services import vector_index
+from app.services.vector_search import search_similar_items
+from sqlalchemy import delete, event
+from sqlalchemy.orm import Session, sessionmaker
+
+
+@pytest.fixture(autouse=True)
+def clear_index_cache():
+    vector_index.index_cache.clear()
+    yield
+    vector_index.index_cache.clear()
+
+
+def _vector(*head):
+    return list(head) + [0.0] * (1536 - len(head))
+
+
+def _user(db_session: Session, email: str):
+    user = models.User(email=email, name="Index User")
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+def _count_statements(db_session: Session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", before_cursor_execute)
+    return statements, lambda: event.remove(
+        db_session.bind, "before_cursor_execute", before_cursor_execute
+    )
+
+
+def test_memory_backend_matches_database(db_session: Session):
+    user = _user(db_session, "index_parity@example.com")
+    rng = np.random.default_rng(0)
+    for i in range(20):
+        crud.create_rag_embedding(
+            db_session,
+            user_id=user.id,
+            content=f"Item {i}",
+            embedding=rng.standard_normal(1536).tolist(),
+            weight=1.0 + (i % 3) / 10,
+        )
+    query = rng.standard_normal(1536).tolist()
+
+    expected = search_similar_items(
+        db_session, query, user.id, limit=5, backend="database", mode="exact"
+    )
+    results = search_similar_items(
+        db_session, query, user.id, limit=5, backend="memory"
+    )
+
+    assert [r.id for r in results] == [r.id for r in expected]
+    for result, reference in zip(results, expected, strict=True):
+        assert result.similarity == pytest.approx(reference.similarity, abs=1e-5)
+
+
+def test_cached_index_skips_database(db_session: Session):
+    user = _user(db_session, "index_hot@example.com")
+    crud.create_rag_embedding(
+        db_session, user_id=user.id, content="Memo", embedding=_vector(1.0)
+    )
+    query = _vector(1.0)
+    search_similar_items(db_session, query, user.id, backend="memory")
+
+    statements, stop = _count_statements(db_session)
+    try:
+        results = search_similar_items(db_session, query, user.id, backend="memory")
+    finally:
+        stop()
+
+    assert [r.content for r in results] == ["Memo"]
+    # Only the corpus_version check
+    assert len(statements) == 1
+    assert "corpus_version" in statements[0]
+
+
+def test_crud_writes_invalidate_index(db_session: Session):
+    user = _user(db_session, "index_writes@example.com")
+    item = crud.create_rag_embedding(
+        db_session, user_id=user.id, content="Old", embedding=_vector(1.0)
+    )
+    query = _vector(1.0)
+    assert [
+        r.content
+        for r in search_similar_items(db_session, query, user.id, backend="memory")
+    ] == ["Old"]
+
+    crud.update_rag_embedding(db_session, item, content="New", embedding=_vector(1.0))
+    assert [
+        r.content
+        for r in search_similar_items(db_session, query, user.id, backend="memory")
+    ] == ["New"]
+
+    crud.bulk_create_rag_embeddings(
+        db_session,
+        [{"user_id": user.id, "content": "Bulk", "embedding": _vector(0.9, 0.1)}],
+    )
+    db_session.commit()
+    results = search_similar_items(db_session, query, user.id, backend="memory")
+    assert [r.content for r in results] == ["New", "Bulk"]
+
+
+@pytest.fixture
+def committed_user(test_db_setup):
+    """
+    A user committed outside a test transaction, so that a second session
+    (standing in for another process) can write their rows.
+    """
+    db = sessionmaker(bind=test_db_setup)()
+    user = _user(db, "index_other_process@example.com")
+    yield db, user
+    db.execute(delete(models.User).where(models.User.id == user.id))
+    db.commit()
+    db.close()
+
+
+def test_writes_from_other_processes_rebuild_the_index(committed_user, test_db_setup):
+    writer, user = committed_user
+    crud.create_rag_embedding(
+        writer, user_id=user.id, content="Old", embedding=_vector(1.0)
+    )
+    reader = sessionmaker(bind=test_db_setup)()
+    query = _vector(1.0)
+    try:
+        results = search_similar_items(reader, query, user.id, backend="memory")
+        assert [r.content for r in results] == ["Old"]
+        reader.commit()
+
+        # Another process writes: its invalidation never reaches this cache
+        with patch.object(vector_index, "invalidate_on_commit"):
+            crud.create_rag_embedding(
+                writer, user_id=user.id, content="New", embedding=_vector(0.9, 0.1)
+            )
+        assert vector_index.index_cache.get(user.id) is not None
+
+        results = search_similar_items(reader, query, user.id, backend="memory")
+        assert [r.content for r in results] == ["Old", "New"]
+    finally:
+        reader.close()
+
+
+def test_load_racing_a_write_is_not_cached(db_session: Session, monkeypatch):
+    user = _user(db_session, "index_race@example.com")
+    load_index = vector_index.load_index
+
+    def load_during_write(db, user_id, *args):
+        index = load_index(db, user_id, *args)
+        vector_index.invalidate(user_id)
+        return index
+
+    monkeypatch.setattr(vector_index, "load_index", load_during_write)
+    vector_index.get_index(db_session, user.id)
+
+    assert vector_index.index_cache.get(user.id) is None
+
+
+def test_large_corpus_falls_back_to_database(db_session: Session, monkeypatch):
+    user = _user(db_session, "index_large@example.com")
+    for i in range(3):
+        crud.create_rag_embedding(
+            db_session, user_id=user.id, content=f"Item {i}", embedding=_vector(1.0, i)
+        )
+    monkeypatch.setattr(vector_index, "VECTOR_INDEX_MAX_ROWS", 2)
+
+    assert vector_index.get_index(db_session, user.id) is None
+    statements, stop = _count_statements(db_session)
+    try:
+        results = search_similar_items(
+            db_session, _vector(1.0), user.id, limit=3, backend="memory"
+        )
+    finally:
+        stop()
+    assert len(results) == 3
+    # The index and the search plan share one corpus_version lookup
+    assert len([s for s in statements if "corpus_version" in s]) == 1
+
+
+def test_index_search_threshold_and_zero_vectors():
+    index = vector_index.build_index(
+        [
+            ("a", "A", "memo", 1.0, _vector(1.0), None),
+            ("b", "B", "memo", None, _vector(0.0, 1.0), None),
+            ("z", "Z", "memo", 1.0, _vector(), None),
+        ]
+    )
+
+    assert index.search(_vector(1.0), limit=3, similarity_threshold=0.5) == [
+        (0, pytest.approx(1.0))
+    ]
+    assert [position for position, _ in index.search(_vector(1.0), limit=1)] == [0]
+    assert index.search(_vector(), limit=3) == []
@@ -1,5 +1,21 @@
-from app import models, schemas
-from app.services.vector_search import search_similar_items
+import uuid
+
+import pytest
+from app import crud, models, schemas
+from app.core import vector
+from app.services import vector_search
+from app.services.lexical import text_bigrams
+from app.services.vector_search import (
+    apply_search_settings,
+    batch_search,
+    hybrid_search,
+    maximal_marginal_relevance,
+    mmr_search,
+    plan_search,
+    reciprocal_rank_fusion,
+    search_similar_items,
+)
+from sqlalchemy import event, text
 from sqlalchemy.orm import Session
 
 
@@ -40,7 +56,7 @@ def test_search_similar_items(db_session: Session):
     # Query close to Item 1
     query_vec = [0.9, 0.1, 0.0] + [0.0] * 1533
 
-    results = search_similar_items(db_session, query_vec, limit=3)
+    results = search_similar_items(db_session, query_vec, user.id, limit=3)
 
     # 3. Verify Results
     assert len(results) == 3
@@ -83,6 +99,701 @@ def test_search_threshold(db_session: Session):
     query_vec = [1.0, 0.0, 0.0] + [0.0] * 1533
 
     # High threshold, should only get item1
-    results = search_similar_items(db_session, query_vec, similarity_threshold=0.9)
+    results = search_similar_items(
+        db_session, query_vec, user.id, similarity_threshold=0.9
+    )
     assert len(results) == 1
     assert results[0].content == "Match"
+
+
+def test_search_settings_are_transaction_local(db_session: Session):
+    """
+    Per-call HNSW settings apply to the current transaction only.
+    """
+    connection = db_session.connection()
+    default = connection.execute(text("SHOW hnsw.ef_search")).scalar()
+
+    nested = connection.begin_nested()
+    apply_search_settings(db_session, ef_search=321, iterative_scan="relaxed_order")
+    assert connection.execute(text("SHOW hnsw.ef_search")).scalar() == "321"
+    nested.rollback()
+
+    assert connection.execute(text("SHOW hnsw.ef_search")).scalar() == default
+
+
+def _weighted_items(db_session: Session, email: str):
+    user = models.User(email=email, name="Weight User")
+    db_session.add(user)
+    db_session.commit()
+
+    near = [1.0, 0.0, 0.0] + [0.0] * 1533
+    farther = [0.8, 0.6, 0.0] + [0.0] * 1533
+    db_session.add_all(
+        [
+            models.RagEmbedding(
+                user_id=user.id,
+                source_type="memo",
+                content="Near",
+                embedding=near,
+                weight=1.0,
+            ),
+            models.RagEmbedding(
+                user_id=user.id,
+                source_type="answer",
+                content="Weighted",
+                embedding=farther,
+                weight=2.0,
+            ),
+        ]
+    )
+    db_session.commit()
+    return user
+
+
+@pytest.mark.parametrize("mode", ["exact", "approximate", "binary"])
+def test_search_applies_weights(db_session: Session, mode):
+    """
+    Both plans rank by similarity * weight, not by raw distance.
+    """
+    user = _weighted_items(db_session, f"weights_{mode}@example.com")
+    query_vec = [1.0, 0.0, 0.0] + [0.0] * 1533
+
+    results = search_similar_items(db_session, query_vec, user.id, limit=2, mode=mode)
+
+    assert [r.content for r in results] == ["Weighted", "Near"]
+    assert results[0].similarity == pytest.approx(1.6)
+    assert results[1].similarity == pytest.approx(1.0)
+
+
+def _chunked_items(db_session: Session, email: str):
+    user = models.User(email=email, name="Chunk User")
+    db_session.add(user)
+    db_session.commit()
+
+    memo_id = uuid.uuid4()
+    crud.bulk_create_rag_embeddings(
+        db_session,
+        [
+            {
+                "user_id": user.id,
+                "content": f"Chunk {i}",
+                "embedding": [1.0, 0.1 * i, 0.0] + [0.0] * 1533,
+                "source_id": memo_id,
+            }
+            for i in range(4)
+        ],
+    )
+    db_session.commit()
+    crud.create_rag_embedding(
+        db_session,
+        user_id=user.id,
+        content="Other",
+        embedding=[0.6, 0.8, 0.0] + [0.0] * 1533,
+    )
+    return user, memo_id
+
+
+@pytest.mark.parametrize(
+    "mode, backend",
+    [
+        ("exact", "database"),
+        ("approximate", "database"),
+        ("binary", "database"),
+        ("auto", "memory"),
+    ],
+)
+def test_search_collapses_chunks_to_their_memo(db_session: Session, mode, backend):
+    user, memo_id = _chunked_items(db_session, f"chunks_{mode}_{backend}@example.com")
+    query_vec = [1.0, 0.0, 0.0] + [0.0] * 1533
+
+    results = search_similar_items(
+        db_session, query_vec, user.id, limit=2, mode=mode, backend=backend
+    )
+    grouped = batch_search(
+        db_session, [query_vec], user.id, limit=2, mode=mode, backend=backend
+    )
+
+    assert [r.content for r in results] == ["Chunk 0", "Other"]
+    assert results[0].source_id == memo_id
+    assert results[1].source_id is None
+    assert [r.id for r in grouped[0]] == [r.id for r in results]
+
+
+def test_hybrid_and_mmr_search_collapse_chunks(db_session: Session):
+    user, memo_id = _chunked_items(db_session, "chunks_hybrid@example.com")
+    query_vec = [1.0, 0.0, 0.0] + [0.0] * 1533
+
+    hybrid = hybrid_search(db_session, "Chunk", query_vec, user.id, limit=3)
+    mmr = mmr_search(db_session, query_vec, user.id, limit=3)
+
+    assert [r.content for r in hybrid] == ["Chunk 0", "Other"]
+    assert sorted(r.content for r in mmr) == ["Chunk 0", "Other"]
+
+
+def test_exact_and_approximate_plans_agree(db_session: Session):
+    user = models.User(email="parity@example.com", name="Parity User")
+    db_session.add(user)
+    db_session.commit()
+    for i in range(10):
+        vec = [1.0, i / 10, (i % 3) / 5] + [0.0] * 1533
+        db_session.add(
+            models.RagEmbedding(
+                user_id=user.id,
+                source_type="memo",
+                content=f"Item {i}",
+                embedding=vec,
+                weight=1.0 + (i % 2) / 10,
+            )
+        )
+    db_session.commit()
+    query_vec = [1.0, 0.3, 0.1] + [0.0] * 1533
+
+    exact = search_similar_items(db_session, query_vec, user.id, mode="exact")
+    approximate = search_similar_items(
+        db_session, query_vec, user.id, mode="approximate"
+    )
+
+    assert [r.id for r in approximate] == [r.id for r in exact]
+
+
+def test_plan_search_uses_corpus_size(db_session: Session, monkeypatch):
+    user = _weighted_items(db_session, "plan@example.com")
+
+    monkeypatch.setattr(vector_search, "VECTOR_SEARCH_EXACT_MAX_ROWS", 2)
+    assert plan_search(db_session, user.id) == "exact"
+
+    monkeypatch.setattr(vector_search, "VECTOR_SEARCH_EXACT_MAX_ROWS", 1)
+    assert plan_search(db_session, user.id) == "approximate"
+
+    monkeypatch.setattr(vector_search, "VECTOR_SEARCH_BINARY_PREFILTER", True)
+    assert plan_search(db_session, user.id) == "binary"
+
+    with pytest.raises(ValueError):
+        plan_search(db_session, user.id, mode="fastest")
+
+
+def _binary_items(db_session: Session, email: str):
+    """
+    "Close" has the higher cosine similarity to the all-positive query but
+    opposite signs in every dimension except the first; "Same signs" matches
+    every sign of the query.
+    """
+    user = models.User(email=email, name="Binary User")
+    db_session.add(user)
+    db_session.commit()
+    crud.bulk_create_rag_embeddings(
+        db_session,
+        [
+            {
+                "user_id": user.id,
+                "content": "Close",
+                "embedding": [1.0] + [-0.01] * 1535,
+            },
+            {
+                "user_id": user.id,
+                "content": "Same signs",
+                "embedding": [0.1] + [0.01] * 1535,
+            },
+        ],
+    )
+    db_session.commit()
+    return user
+
+
+def test_binary_search_rescores_shortlist_exactly(db_session: Session, monkeypatch):
+    user = _binary_items(db_session, "binary@example.com")
+    query_vec = [1.0] + [0.01] * 1535
+
+    exact = search_similar_items(db_session, query_vec, user.id, limit=2, mode="exact")
+    binary = search_similar_items(
+        db_session, query_vec, user.id, limit=2, mode="binary"
+    )
+    assert [r.content for r in exact] == ["Close", "Same signs"]
+    assert [r.id for r in binary] == [r.id for r in exact]
+    for result, reference in zip(binary, exact, strict=True):
+        assert result.similarity == pytest.approx(reference.similarity)
+
+    # A one-row shortlist holds only the nearest signature
+    monkeypatch.setattr(vector_search, "VECTOR_SEARCH_BINARY_CANDIDATE_MULTIPLIER", 1)
+    shortlisted = search_similar_items(
+        db_session, query_vec, user.id, limit=1, mode="binary"
+    )
+    assert [r.content for r in shortlisted] == ["Same signs"]
+    assert shortlisted[0].similarity == pytest.approx(exact[1].similarity)
+    grouped = batch_search(db_session, [query_vec], user.id, limit=1, mode="binary")
+    assert [r.content for r in grouped[0]] == ["Same signs"]
+
+
+def test_crud_writes_keep_signatures_in_sync(db_session: Session):
+    user = _binary_items(db_session, "binary_sync@example.com")
+    item = crud.create_rag_embedding(
+        db_session,
+        user_id=user.id,
+        content="Memo",
+        embedding=[1.0, -1.0] + [0.0] * 1534,
+    )
+    assert item.embedding_bits.startswith("10")
+
+    crud.update_rag_embedding(
+        db_session, item, content="Memo", embedding=[-1.0, 1.0] + [0.0] * 1534
+    )
+    assert item.embedding_bits.startswith("01")
+
+    crud.bulk_update_rag_embeddings(
+        db_session, user.id, [{"id": item.id, "embedding": [1.0] * 1536}]
+    )
+    db_session.commit()
+    db_session.refresh(item)
+    assert item.embedding_bits == "1" * 1536
+
+
+def test_binary_plan_finds_rows_written_without_signatures(
+    db_session: Session, monkeypatch
+):
+    """
+    Writers that leave embedding_bits out (an app version from before the
+    column, mid-deploy) get them from the database, so the binary shortlist
+    never drops their rows.
+    """
+    user = _binary_items(db_session, "binary_null@example.com")
+    query_vec = [1.0] + [0.01] * 1535
+    row_id = db_session.execute(
+        text(
+            "INSERT INTO rag_embeddings "
+            "(id, user_id, source_type, content, embedding) VALUES "
+            "(gen_random_uuid(), :user_id, 'memo', 'Old writer', :embedding) "
+            "RETURNING id"
+        ),
+        {"user_id": user.id, "embedding": str(query_vec)},
+    ).scalar_one()
+    crud.mark_corpus_changed(db_session, user.id)
+    db_session.commit()
+
+    bits = text("SELECT embedding_bits::text FROM rag_embeddings WHERE id = :id")
+    assert db_session.execute(bits, {"id": row_id}).scalar_one() == "1" * 1536
+    # Two of three rows are shortlisted; a NULL signature would sort last
+    monkeypatch.setattr(vector_search, "VECTOR_SEARCH_BINARY_CANDIDATE_MULTIPLIER", 2)
+    binary = search_similar_items(
+        db_session, query_vec, user.id, limit=1, mode="binary"
+    )
+    assert [r.content for r in binary] == ["Old writer"]
+
+    # Changing only the embedding refreshes stale signatures as well
+    db_session.execute(
+        text("UPDATE rag_embeddings SET embedding = :embedding WHERE id = :id"),
+        {"id": row_id, "embedding": str([-1.0] + [0.0] * 1535)},
+    )
+    db_session.commit()
+    assert db_session.execute(bits, {"id": row_id}).scalar_one() == "0" * 1536
+
+
+def test_crud_stores_unit_vectors(db_session: Session):
+    user = models.User(email="normalize@example.com", name="Normalize User")
+    db_session.add(user)
+    db_session.commit()
+
+    item = crud.create_rag_embedding(
+        db_session, user_id=user.id, content="Memo", embedding=[3.0, 4.0] + [0.0] * 1534
+    )
+    assert item.embedding[:3].tolist() == pytest.approx([0.6, 0.8, 0.0])
+
+    crud.bulk_update_rag_embeddings(
+        db_session, user.id, [{"id": item.id, "embedding": [0.0, 2.0] + [0.0] * 1534}]
+    )
+    db_session.commit()
+    db_session.refresh(item)
+    assert item.embedding[:2].tolist() == pytest.approx([0.0, 1.0])
+
+    for invalid in ([0.0] * 1536, [float("nan")] + [1.0] * 1535):
+        with pytest.raises(ValueError):
+            crud.create_rag_embedding(
+                db_session, user_id=user.id, content="Bad", embedding=invalid
+            )
+
+
+@pytest.mark.parametrize("mode", ["exact", "approximate", "binary"])
+def test_inner_product_metric_matches_cosine(db_session: Session, monkeypatch, mode):
+    user = models.User(email=f"ip_{mode}@example.com", name="IP User")
+    db_session.add(user)
+    db_session.commit()
+    crud.bulk_create_rag_embeddings(
+        db_session,
+        [
+            {
+                "user_id": user.id,
+                "content": f"Item {i}",
+                "embedding": [1.0, i / 4, (i % 3) / 2] + [0.0] * 1533,
+                "weight": 1.0 + (i % 2) / 10,
+            }
+            for i in range(8)
+        ],
+    )
+    db_session.commit()
+    query_vec = [2.0, 0.6, 0.4] + [0.0] * 1533
+
+    def run():
+        return (
+            search_similar_items(db_session, query_vec, user.id, limit=3, mode=mode),
+            batch_search(db_session, [query_vec], user.id, limit=3, mode=mode)[0],
+            hybrid_search(db_session, "Item", query_vec, user.id, limit=3),
+        )
+
+    cosine = run()
+    monkeypatch.setattr(vector, "VECTOR_SEARCH_METRIC", "inner_product")
+    inner_product = run()
+
+    for results, expected in zip(inner_product, cosine, strict=True):
+        assert [r.id for r in results] == [r.id for r in expected]
+        for result, reference in zip(results, expected, strict=True):
+            assert result.similarity == pytest.approx(reference.similarity, abs=1e-5)
+
+
+def test_text_bigrams():
+    assert text_bigrams("粘り強さ") == ["粘り", "り強", "強さ"]
+    # NFKC folds full-width letters; punctuation splits runs
+    assert text_bigrams("ＰＹ。c") == ["py", "c"]
+    assert text_bigrams("ですです") == ["です", "すで"]
+
+
+def test_reciprocal_rank_fusion():
+    assert reciprocal_rank_fusion([1, None], k=60) == pytest.approx(1 / 61)
+    assert reciprocal_rank_fusion([1, 2], k=60) > reciprocal_rank_fusion([1, None])
+
+
+def test_hybrid_search_finds_exact_terms(db_session: Session):
+    """
+    A memo that is far from the query in embedding space is still returned
+    when it contains the query's exact term.
+    """
+    user = models.User(email="hybrid@example.com", name="Hybrid User")
+    db_session.add(user)
+    db_session.commit()
+
+    query_vec = [1.0, 0.0, 0.0] + [0.0] * 1533
+    for i in range(5):
+        crud.create_rag_embedding(
+            db_session,
+            user_id=user.id,
+            content=f"アルバイトの話 {i}",
+            embedding=[1.0, 0.1 * i, 0.0] + [0.0] * 1533,
+        )
+    term_item = crud.create_rag_embedding(
+        db_session,
+        user_id=user.id,
+        content="軽音サークルで部長を務めた",
+        embedding=[0.0, 0.0, 1.0] + [0.0] * 1533,
+    )
+
+    vector_only = search_similar_items(
+        db_session, query_vec, user.id, limit=3, mode="exact"
+    )
+    assert term_item.id not in [r.id for r in vector_only]
+
+    results = hybrid_search(db_session, "軽音サークル", query_vec, user.id, limit=3)
+
+    assert results[0].id == term_item.id
+    assert results[0].similarity == pytest.approx(0.0)
+    assert len(results) == 3
+
+
+def test_hybrid_search_threshold_keeps_lexical_matches(db_session: Session):
+    user = models.User(email="hybrid_threshold@example.com", name="Hybrid User")
+    db_session.add(user)
+    db_session.commit()
+
+    crud.create_rag_embedding(
+        db_session,
+        user_id=user.id,
+        content="関係ない話",
+        embedding=[0.0, 1.0] + [0.0] * 1534,
+    )
+    crud.create_rag_embedding(
+        db_session,
+        user_id=user.id,
+        content="TOEIC 900点",
+        embedding=[0.0, 0.0, 1.0] + [0.0] * 1533,
+    )
+
+    results = hybrid_search(
+        db_session,
+        "toeic",
+        [1.0] + [0.0] * 1535,
+        user.id,
+        similarity_threshold=0.5,
+    )
+
+    assert [r.content for r in results] == ["TOEIC 900点"]
+
+
+def test_hybrid_search_follows_the_exact_plan(db_session: Session):
+    """
+    The HNSW index returns the nearest rows of all users before the user
+    filter, so a small corpus surrounded by closer rows of others loses its
+    vector candidates unless the exact plan is used.
+    """
+    other = models.User(email="hybrid_crowd@example.com", name="Crowd User")
+    user = models.User(email="hybrid_recall@example.com", name="Recall User")
+    db_session.add_all([other, user])
+    db_session.commit()
+    for i in range(300):
+        db_session.add(
+            models.RagEmbedding(
+                user_id=other.id,
+                source_type="memo",
+                content=f"Crowd {i}",
+                embedding=[1.0, i / 300, 0.0] + [0.0] * 1533,
+            )
+        )
+    for i in range(8):
+        db_session.add(
+            models.RagEmbedding(
+                user_id=user.id,
+                source_type="memo",
+                content=f"Item {i}",
+                embedding=[0.2, 0.0, 1.0, i / 8] + [0.0] * 1532,
+                weight=1.0 + (i % 2) / 10,
+            )
+        )
+    db_session.commit()
+    # Lets the planner serve the user's ORDER BY from the HNSW index, as it
+    # does on large tables
+    db_session.execute(text("SET LOCAL enable_sort = off"))
+    query_vec = [1.0, 0.0, 0.0] + [0.0] * 1533
+
+    exact = search_similar_items(db_session, query_vec, user.id, mode="exact")
+    hybrid = hybrid_search(
+        db_session, "該当なし", query_vec, user.id, candidates=10, ef_search=10
+    )
+    approximate = hybrid_search(
+        db_session,
+        "該当なし",
+        query_vec,
+        user.id,
+        candidates=10,
+        ef_search=10,
+        mode="approximate",
+    )
+
+    assert plan_search(db_session, user.id) == "exact"
+    assert [r.id for r in hybrid] == [r.id for r in exact]
+    assert len(approximate) < len(exact)
+
+
+def test_maximal_marginal_relevance_skips_near_duplicates():
+    embeddings = [
+        [1.0, 0.0, 0.0],
+        [0.99, 0.01, 0.0],  # near-duplicate of the first
+        [0.6, 0.0, 0.8],
+    ]
+    scores = [0.95, 0.94, 0.80]
+
+    assert maximal_marginal_relevance(embeddings, scores, 2, lambda_mult=0.5) == [
+        0,
+        2,
+    ]
+    # lambda 1 keeps the relevance order
+    assert maximal_marginal_relevance(embeddings, scores, 3, lambda_mult=1.0) == [
+        0,
+        1,
+        2,
+    ]
+    assert maximal_marginal_relevance([], [], 3) == []
+
+
+@pytest.mark.parametrize("backend", ["database", "memory"])
+def test_mmr_search_diversifies_context(db_session: Session, backend):
+    user = models.User(email=f"mmr_{backend}@example.com", name="MMR User")
+    db_session.add(user)
+    db_session.commit()
+
+    answer = [1.0, 0.0, 0.0] + [0.0] * 1533
+    for content in ["回答", "回答（再提出）", "回答の言い換えメモ"]:
+        crud.create_rag_embedding(
+            db_session, user_id=user.id, content=content, embedding=answer
+        )
+    crud.create_rag_embedding(
+        db_session,
+        user_id=user.id,
+        content="別のエピソード",
+        embedding=[0.8, 0.6, 0.0] + [0.0] * 1533,
+    )
+    query_vec = [1.0, 0.1, 0.0] + [0.0] * 1533
+
+    plain = search_similar_items(
+        db_session, query_vec, user.id, limit=2, backend=backend
+    )
+    assert "別のエピソード" not in [r.content for r in plain]
+
+    results = mmr_search(
+        db_session, query_vec, user.id, limit=2, lambda_mult=0.5, backend=backend
+    )
+
+    assert len(results) == 2
+    assert results[0].content in {"回答", "回答（再提出）", "回答の言い換えメモ"}
+    assert results[1].content == "別のエピソード"
+
+
+@pytest.mark.parametrize("mode", ["exact", "approximate", "binary"])
+def test_batch_search_matches_single_searches(db_session: Session, mode):
+    user = _weighted_items(db_session, f"batch_{mode}@example.com")
+    crud.create_rag_embedding(
+        db_session,
+        user_id=user.id,
+        content="Other",
+        embedding=[0.0, 0.0, 1.0] + [0.0] * 1533,
+    )
+    queries = [
+        [1.0, 0.0, 0.0] + [0.0] * 1533,
+        [0.0, 0.0, 1.0] + [0.0] * 1533,
+        [0.0, 1.0, 0.0] + [0.0] * 1533,
+    ]
+
+    grouped = batch_search(
+        db_session, queries, user.id, limit=2, similarity_threshold=0.1, mode=mode
+    )
+
+    assert len(grouped) == 3
+    for query, results in zip(queries, grouped, strict=True):
+        expected = search_similar_items(
+            db_session, query, user.id, limit=2, similarity_threshold=0.1, mode=mode
+        )
+        assert [r.id for r in results] == [r.id for r in expected]
+        for result, reference in zip(results, expected, strict=True):
+            assert result.similarity == pytest.approx(reference.similarity)
+    assert grouped[1][0].content == "Other"
+
+
+def test_batch_search_runs_one_statement(db_session: Session):
+    user_id = _weighted_items(db_session, "batch_statements@example.com").id
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", before_cursor_execute)
+    try:
+        batch_search(
+            db_session,
+            [[1.0] + [0.0] * 1535, [0.0, 1.0] + [0.0] * 1534],
+            user_id,
+            mode="exact",
+        )
+    finally:
+        event.remove(db_session.bind, "before_cursor_execute", before_cursor_execute)
+
+    assert len(statements) == 1
+    assert "LATERAL" in statements[0]
+
+
+def _statements(db_session: Session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", before_cursor_execute)
+    return statements, lambda: event.remove(
+        db_session.bind, "before_cursor_execute", before_cursor_execute
+    )
+
+
+def test_corpus_writes_bump_version(db_session: Session):
+    user = models.User(email="corpus_version@example.com", name="Version User")
+    db_session.add(user)
+    db_session.commit()
+    assert crud.get_corpus_version(db_session, user.id) == 0
+
+    item = crud.create_rag_embedding(
+        db_session, user_id=user.id, content="A", embedding=[1.0] + [0.0] * 1535
+    )
+    assert crud.get_corpus_version(db_session, user.id) == 1
+
+    crud.update_rag_embedding(
+        db_session, item, content="B", embedding=[1.0] + [0.0] * 1535
+    )
+    assert crud.get_corpus_version(db_session, user.id) == 2
+
+    crud.bulk_update_rag_embeddings(db_session, user.id, [{"id": item.id, "weight": 2}])
+    crud.bulk_create_rag_embeddings(
+        db_session,
+        [{"user_id": user.id, "content": "C", "embedding": [0.0, 1.0] + [0.0] * 1534}],
+    )
+    db_session.commit()
+    assert crud.get_corpus_version(db_session, user.id) == 4
+
+
+def test_search_results_are_cached_per_corpus_version(db_session: Session):
+    user = models.User(email="retrieval_cache@example.com", name="Cache User")
+    db_session.add(user)
+    db_session.commit()
+    user_id = user.id
+    crud.create_rag_embedding(
+        db_session, user_id=user_id, content="Old", embedding=[1.0] + [0.0] * 1535
+    )
+    query_vec = [1.0] + [0.0] * 1535
+    first = search_similar_items(db_session, query_vec, user_id)
+
+    statements, stop = _statements(db_session)
+    try:
+        second = search_similar_items(db_session, query_vec, user_id)
+    finally:
+        stop()
+    # Only the corpus_version lookup reaches the database
+    assert second == first
+    assert len(statements) == 1
+
+    crud.create_rag_embedding(
+        db_session, user_id=user_id, content="New", embedding=[1.0] + [0.0] * 1535
+    )
+    results = search_similar_items(db_session, query_vec, user_id)
+    assert sorted(r.content for r in results) == ["New", "Old"]
+
+
+def test_search_plan_is_cached_per_corpus_version(db_session: Session, monkeypatch):
+    monkeypatch.setattr(vector_search.retrieval_cache, "maxsize", 0)
+    user = _weighted_items(db_session, "plan_cache@example.com")
+    query_vec = [1.0] + [0.0] * 1535
+    search_similar_items(db_session, query_vec, user.id)
+
+    statements, stop = _statements(db_session)
+    try:
+        search_similar_items(db_session, query_vec, user.id)
+    finally:
+        stop()
+    # The corpus_version lookup and the search; no count
+    assert len(statements) == 2
+    assert "corpus_version" in statements[0]
+
+    monkeypatch.setattr(vector_search, "VECTOR_SEARCH_EXACT_MAX_ROWS", 2)
+    assert plan_search(db_session, user.id) == "exact"
+    crud.create_rag_embedding(
+        db_session, user_id=user.id, content="Third", embedding=query_vec
+    )
+    assert plan_search(db_session, user.id) == "approximate"
+
+
+def test_uncommitted_writes_are_not_cached(db_session: Session):
+    """
+    A search inside a write transaction that later rolls back must not
+    leave results under the version the next committed write will reuse.
+    """
+    user = models.User(email="retrieval_pending@example.com", name="Pending User")
+    db_session.add(user)
+    db_session.commit()
+    user_id = user.id
+    query_vec = [1.0] + [0.0] * 1535
+
+    savepoint = db_session.begin_nested()
+    crud.bulk_create_rag_embeddings(
+        db_session,
+        [{"user_id": user_id, "content": "Rolled back", "embedding": query_vec}],
+    )
+    results = search_similar_items(db_session, query_vec, user_id)
+    assert [r.content for r in results] == ["Rolled back"]
+    savepoint.rollback()
+
+    crud.create_rag_embedding(
+        db_session, user_id=user_id, content="Committed", embedding=query_vec
+    )
+    results = search_similar_items(db_session, query_vec, user_id)
+    assert [r.content for r in results] == ["Committed"]
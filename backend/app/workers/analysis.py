@@ -0,0 +1,113 @@
+"""
+Run self-analysis jobs from the analysis_jobs queue
+
+Starts --workers processes that claim due jobs (FOR UPDATE SKIP LOCKED), so
+any number of workers, on any number of hosts, can share the queue.
+SIGINT/SIGTERM lets each worker finish its current job before exiting.
+
+Usage:
+    python -m app.workers.analysis --workers 4
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from app.database import SessionLocal
+from app.services import analysis_jobs
+
+logger = logging.getLogger(__name__)
+
+# Seconds a worker sleeps when the queue has no due job
+ANALYSIS_WORKER_POLL_SECONDS = float(os.getenv("ANALYSIS_WORKER_POLL_SECONDS", "2"))
+
+
+def work(worker_id: str, poll_interval: float, stop, drain: bool = False) -> int:
+    """
+    Runs jobs until stop is set. With drain, returns once no job is due.
+    Returns the number of jobs run.
+    """
+    db = SessionLocal()
+    processed = 0
+    try:
+        while not stop.is_set():
+            try:
+                analysis_jobs.release_expired_jobs(db)
+                job = analysis_jobs.run_next_job(db, worker_id)
+            except Exception:
+                # Database unavailable and the like: keep the worker alive
+                logger.exception(f"Worker {worker_id} could not poll the queue")
+                db.rollback()
+                stop.wait(poll_interval)
+                continue
+            if job is not None:
+                processed += 1
+            elif drain:
+                break
+            else:
+                stop.wait(poll_interval)
+    finally:
+        db.close()
+    return processed
+
+
+def _worker_main(index: int, poll_interval: float, stop, drain: bool):
+    # Only the parent handles signals and sets stop. A signal sent to the
+    # whole process group (Ctrl-C, a service manager) must not abort a
+    # running job, and setting stop here could deadlock with stop.wait().
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    processed = work(worker_id, poll_interval, stop, drain)
+    print(f"✅ Worker {worker_id} stopped after {processed} jobs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--poll-interval", type=float, default=ANALYSIS_WORKER_POLL_SECONDS
+    )
+    parser.add_argument(
+        "--drain",
+        action="store_true",
+        help="Exit once the queue has no due job instead of polling forever",
+    )
+    args = parser.parse_args()
+
+    # spawn: each worker opens its own database connections
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    processes = [
+        context.Process(
+            target=_worker_main,
+            args=(index, args.poll_interval, stop, args.drain),
+            name=f"analysis-worker-{index}",
+        )
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def request_stop(signum, frame):
+        print("Stopping workers after their current job...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    while any(process.is_alive() for process in processes):
+        time.sleep(0.5)
+    failed = [process.name for process in processes if process.exitcode != 0]
+    if failed:
+        print(f"❌ Workers exited with errors: {', '.join(failed)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
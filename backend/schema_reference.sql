@@ -7,6 +7,7 @@ CREATE TABLE users (
     major           TEXT,
     desired_roles   TEXT[],
     job_axis_raw    TEXT,
+    corpus_version  BIGINT NOT NULL DEFAULT 0,  -- rag_embeddings更新ごとに加算（検索結果キャッシュのキー）
     created_at      TIMESTAMP WITH TIME ZONE DEFAULT now()
 );
 
@@ -115,9 +116,13 @@ CREATE TABLE rag_embeddings (
     user_id         UUID REFERENCES users(id) ON DELETE CASCADE,
     source_type     TEXT,
     source_id       UUID,
-    embedding       vector(1536),
+    embedding       vector(1536),  -- EMBEDDING_STORAGE/EMBEDDING_DIMENSIONSで変更可（halfvec(768)等）
+    embedding_bits  BIT(1536),  -- embeddingの符号ビット（二値化プレフィルタ用）
     content         TEXT,
+    content_bigrams TEXT[] NOT NULL DEFAULT '{}',  -- 文字bigram（キーワード検索用）
     created_at      TIMESTAMP WITH TIME ZONE DEFAULT now()
 );
 
-CREATE INDEX ON rag_embeddings USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+CREATE INDEX ix_rag_embeddings_embedding_hnsw ON rag_embeddings USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+CREATE INDEX ix_rag_embeddings_embedding_bits_hnsw ON rag_embeddings USING hnsw (embedding_bits bit_hamming_ops) WITH (m = 16, ef_construction = 64);  -- pgvector 0.7.0以上
+CREATE INDEX ix_rag_embeddings_content_bigrams ON rag_embeddings USING gin (content_bigrams);
@@ -0,0 +1,129 @@
+"""
+Recall and latency benchmark: binary-quantized prefilter vs exact and HNSW
+search.
+
+Stores --rows synthetic embeddings (Gaussian clusters, like topical memos) for
+a scratch user inside a transaction that is rolled back at the end, then runs
+--queries searches through search_similar_items in each mode:
+
+- exact:        weighted similarity over every row of the user
+- approximate:  HNSW candidates on the full vectors, re-ranked
+- binary:       shortlist by Hamming distance of the sign bits, re-ranked on
+                the full vectors (one line per candidate multiplier)
+
+Recall@k is measured against exact search. Needs DATABASE_URL only.
+
+Usage:
+    python scripts/benchmark_binary_prefilter.py --rows 5000 --k 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+load_dotenv()
+
+# Add parent directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud, models  # noqa: E402
+from app.core.vector import EMBEDDING_DIMENSIONS  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.services import vector_search  # noqa: E402
+
+
+def synthesize(rng, centers: np.ndarray, rows: int, spread: float) -> np.ndarray:
+    assigned = centers[rng.integers(len(centers), size=rows)]
+    vectors = assigned + spread * rng.standard_normal(assigned.shape)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def run(db, queries, user_id, k, mode):
+    latencies = []
+    found = []
+    for query in queries:
+        started = time.perf_counter()
+        results = vector_search.search_similar_items(
+            db, query, user_id, limit=k, mode=mode
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        found.append([r.id for r in results])
+    return found, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--spread", type=float, default=1.0)
+    parser.add_argument("--multipliers", default="5,10,20,40")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        print("❌ DATABASE_URL must be set")
+        sys.exit(1)
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((args.clusters, EMBEDDING_DIMENSIONS))
+    vectors = synthesize(rng, centers, args.rows, args.spread)
+    queries = synthesize(rng, centers, args.queries, args.spread)
+
+    db = SessionLocal()
+    transaction = db.begin()
+    try:
+        user = models.User(
+            email=f"bench-{uuid.uuid4().hex[:8]}@example.com", name="Benchmark"
+        )
+        db.add(user)
+        db.flush()
+        for start in range(0, args.rows, 1000):
+            crud.bulk_create_rag_embeddings(
+                db,
+                [
+                    {"user_id": user.id, "content": f"Row {start + i}", "embedding": v}
+                    for i, v in enumerate(vectors[start : start + 1000])
+                ],
+            )
+        db.execute(text("ANALYZE rag_embeddings"))
+
+        reference, latencies = run(db, queries, user.id, args.k, "exact")
+        lines = [("exact", reference, latencies)]
+        found, latencies = run(db, queries, user.id, args.k, "approximate")
+        lines.append(("approximate", found, latencies))
+        for multiplier in (int(m) for m in args.multipliers.split(",")):
+            vector_search.VECTOR_SEARCH_BINARY_CANDIDATE_MULTIPLIER = multiplier
+            found, latencies = run(db, queries, user.id, args.k, "binary")
+            lines.append((f"binary x{multiplier}", found, latencies))
+    finally:
+        transaction.rollback()
+        db.close()
+
+    print(
+        f"{args.rows} rows, {args.queries} queries, {EMBEDDING_DIMENSIONS} dims, "
+        f"top {args.k}"
+    )
+    for label, found, latencies in lines:
+        recall = statistics.mean(
+            len(set(ids) & set(expected)) / max(len(expected), 1)
+            for ids, expected in zip(found, reference, strict=True)
+        )
+        print(
+            f"  {label:<13} recall@{args.k} {recall:.3f}  "
+            f"p50 {statistics.median(latencies):6.1f} ms  "
+            f"p95 {np.percentile(latencies, 95):6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
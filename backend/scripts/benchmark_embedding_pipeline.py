@@ -0,0 +1,85 @@
+"""
+Micro-benchmark: per-row CPU cost of moving an embedding from the OpenAI
+response to a pgvector bind parameter.
+
+Paths measured (no network or database, payloads are synthesized):
+
+- float JSON:    JSON float list -> list[float] -> pgvector text literal
+- sdk default:   base64 -> SDK .tolist() -> pgvector text literal
+                 (what the openai SDK does when no encoding_format is given)
+- base64 numpy:  base64 -> np.frombuffer float32 -> app.core.vector literal
+                 (EMBEDDING_ENCODING_FORMAT=base64)
+
+Usage:
+    python scripts/benchmark_embedding_pipeline.py --rows 2000
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from pgvector.sqlalchemy import Vector as PgVector
+
+# Add parent directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.vector import Vector  # noqa: E402
+from app.services.embedding import decode_embedding  # noqa: E402
+
+
+def measure(label, payloads, decode, bind):
+    decode_seconds = 0.0
+    bind_seconds = 0.0
+    for payload in payloads:
+        started = time.perf_counter()
+        vector = decode(payload)
+        decoded = time.perf_counter()
+        bind(vector)
+        bind_seconds += time.perf_counter() - decoded
+        decode_seconds += decoded - started
+    rows = len(payloads)
+    decode_us = decode_seconds / rows * 1e6
+    bind_us = bind_seconds / rows * 1e6
+    print(
+        f"  {label:<14} decode {decode_us:8.1f} us  bind {bind_us:8.1f} us  "
+        f"total {decode_us + bind_us:8.1f} us/row"
+    )
+    return decode_us + bind_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((args.rows, args.dimensions)).astype(np.float32)
+    # The API returns float32 values; JSON carries them as decimal text
+    float_payloads = [json.dumps(vector.tolist()) for vector in vectors]
+    base64_payloads = [
+        base64.b64encode(vector.tobytes()).decode() for vector in vectors
+    ]
+
+    pg_bind = PgVector(args.dimensions).bind_processor(None)
+    app_bind = Vector(args.dimensions).bind_processor(None)
+
+    print(f"{args.rows} rows x {args.dimensions} dims")
+    before = measure("float JSON", float_payloads, json.loads, pg_bind)
+    measure(
+        "sdk default",
+        base64_payloads,
+        lambda data: decode_embedding(data).tolist(),
+        pg_bind,
+    )
+    after = measure("base64 numpy", base64_payloads, decode_embedding, app_bind)
+    print(f"  speedup vs float JSON: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Recall-vs-size benchmark for the embedding storage modes
+(EMBEDDING_STORAGE x EMBEDDING_DIMENSIONS).
+
+Reads existing embeddings from rag_embeddings, holds out --queries of them as
+queries, and compares each mode's top-k neighbours (cosine, exact search) with
+those of the stored full-precision vectors:
+
+- dimensions: vectors are truncated and re-normalized, which is what the
+  text-embedding-3 dimensions parameter returns
+- halfvec:    elements are rounded to float16, as pgvector stores them
+
+With --measure, each mode is also loaded into a temporary table with an HNSW
+index and its on-disk size (table + TOAST + index) is reported. The
+transaction is rolled back. halfvec needs pgvector 0.7.0+ on the server;
+without it only the estimated row size is shown.
+
+Usage:
+    python scripts/benchmark_embedding_storage.py --k 10 --measure
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, select, text
+
+load_dotenv()
+
+# Add parent directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import models  # noqa: E402
+from app.core.vector import embedding_type, shorten_embedding  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.services import embedding_storage  # noqa: E402
+
+MODES = [
+    ("vector", 1536),
+    ("halfvec", 1536),
+    ("vector", 768),
+    ("halfvec", 768),
+    ("vector", 512),
+    ("halfvec", 512),
+]
+
+
+def convert(vectors: np.ndarray, storage: str, dimensions: int) -> np.ndarray:
+    converted = np.stack([shorten_embedding(v, dimensions) for v in vectors])
+    if storage == "halfvec":
+        converted = converted.astype(np.float16).astype(np.float32)
+    norms = np.linalg.norm(converted, axis=1, keepdims=True)
+    return converted / np.where(norms > 0, norms, 1)
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def row_bytes(storage: str, dimensions: int) -> int:
+    # pgvector layout: 4-byte varlena header, 2-byte dim, 2 unused, elements
+    return 8 + dimensions * (2 if storage == "halfvec" else 4)
+
+
+def measure_size(db, vectors: np.ndarray, storage: str, dimensions: int) -> int:
+    db.execute(
+        text(f"CREATE TEMP TABLE storage_bench (embedding {storage}({dimensions}))")
+    )
+    db.execute(
+        text("INSERT INTO storage_bench (embedding) VALUES (:embedding)").bindparams(
+            bindparam("embedding", type_=embedding_type(storage, dimensions))
+        ),
+        [{"embedding": v} for v in convert(vectors, storage, dimensions)],
+    )
+    db.execute(
+        text(
+            f"CREATE INDEX ON storage_bench USING hnsw (embedding {storage}_cosine_ops)"
+        )
+    )
+    size = db.execute(
+        text("SELECT pg_total_relation_size('storage_bench')")
+    ).scalar_one()
+    db.execute(text("DROP TABLE storage_bench"))
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--measure", action="store_true")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        print("❌ DATABASE_URL must be set")
+        sys.exit(1)
+
+    db = SessionLocal()
+    transaction = db.begin()
+    try:
+        stored = db.scalars(
+            select(models.RagEmbedding.embedding).limit(args.rows)
+        ).all()
+        if len(stored) < args.queries + args.k:
+            print(f"❌ Need at least {args.queries + args.k} stored embeddings")
+            sys.exit(1)
+        vectors = np.asarray(stored, dtype=np.float32)
+        stored_dimensions = vectors.shape[1]
+        halfvec_supported = (
+            embedding_storage.pgvector_version(db)
+            >= embedding_storage.HALFVEC_MIN_VERSION
+        )
+
+        rng = np.random.default_rng(args.seed)
+        order = rng.permutation(len(vectors))
+        queries = vectors[order[: args.queries]]
+        corpus = vectors[order[args.queries :]]
+        reference = top_k(
+            convert(corpus, "vector", stored_dimensions),
+            convert(queries, "vector", stored_dimensions),
+            args.k,
+        )
+
+        print(
+            f"{len(corpus)} rows, {len(queries)} queries, "
+            f"stored as {stored_dimensions} dims"
+        )
+        baseline = row_bytes("vector", stored_dimensions)
+        for storage, dimensions in MODES:
+            if dimensions > stored_dimensions:
+                continue
+            found = top_k(
+                convert(corpus, storage, dimensions),
+                convert(queries, storage, dimensions),
+                args.k,
+            )
+            recall = np.mean(
+                [
+                    len(set(row) & set(expected)) / args.k
+                    for row, expected in zip(found, reference, strict=True)
+                ]
+            )
+            estimate = row_bytes(storage, dimensions)
+            line = (
+                f"  {storage}({dimensions}):".ljust(18)
+                + f"recall@{args.k} {recall:.3f}  "
+                + f"{estimate:5d} B/vector ({baseline / estimate:.1f}x smaller)"
+            )
+            if args.measure and (storage == "vector" or halfvec_supported):
+                size = measure_size(db, corpus, storage, dimensions)
+                line += f"  table+index {size / len(corpus):7.0f} B/row"
+            print(line)
+    finally:
+        transaction.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
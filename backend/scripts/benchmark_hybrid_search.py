@@ -0,0 +1,135 @@
+"""
+Recall benchmark: vector search vs hybrid (bigram + vector, RRF) search.
+
+Uses memo/question fixtures in the style of scripts/test_rag_accuracy.py:
+Japanese memos and questions whose answer hinges on an exact term (a club
+name, a technology, a number). The memos are stored for a scratch user inside
+a transaction that is rolled back at the end, embedded with the real OpenAI
+model (one batched call), and each question is run through
+search_similar_items and hybrid_search.
+
+Reports recall@k and MRR for both. Needs DATABASE_URL and OPENAI_API_KEY.
+
+Usage:
+    python scripts/benchmark_hybrid_search.py --k 3
+"""
+
+import argparse
+import os
+import sys
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud, models  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.services import vector_search  # noqa: E402
+from app.services.embedding import get_embeddings  # noqa: E402
+
+MEMOS = [
+    "大学時代はプログラミングサークルで活動し、Pythonを使ってWebアプリを開発しました。",
+    "軽音楽部ではドラムを担当し、3年次には部長として40人をまとめました。",
+    "カフェのアルバイトで新人教育を任され、マニュアルを作り直しました。",
+    "TOEICで850点を取得するため、毎朝1時間の勉強を半年続けました。",
+    "ゼミでは行動経済学を専攻し、ナッジに関する卒業論文を書きました。",
+    "長期インターンではReactとTypeScriptで社内ツールを作りました。",
+    "高校時代はサッカー部に所属し、県大会ベスト8に進出しました。",
+    "学園祭実行委員として、来場者数を前年比120%に伸ばしました。",
+    "留学先のカナダ・バンクーバーで、現地の学生とボランティアをしました。",
+    "私の強みは、粘り強さと論理的思考力です。",
+    "塾講師のアルバイトで、担当した生徒の数学の偏差値を10上げました。",
+    "ハッカソンでGo言語を使ったAPIを作り、優秀賞を受賞しました。",
+    "簿記2級の資格を大学2年生のときに取得しました。",
+    "地域の子ども食堂で月2回ボランティアをしています。",
+    "AWSの認定資格（ソリューションアーキテクト）を勉強中です。",
+]
+
+# (question, index of the memo that answers it)
+QUESTIONS = [
+    ("Pythonで何を作りましたか？", 0),
+    ("軽音楽部での役割は？", 1),
+    ("TOEICの点数は？", 3),
+    ("ゼミで何を研究しましたか？", 4),
+    ("TypeScriptの経験はありますか？", 5),
+    ("県大会の結果を教えてください", 6),
+    ("学園祭で何をしましたか？", 7),
+    ("バンクーバーで何をしていましたか？", 8),
+    ("私の強みは何ですか？", 9),
+    ("偏差値をどれくらい上げましたか？", 10),
+    ("Go言語を使った経験は？", 11),
+    ("簿記の資格は持っていますか？", 12),
+    ("子ども食堂での活動について", 13),
+    ("AWSの資格について", 14),
+]
+
+
+def evaluate(results_per_question, k):
+    hits = 0
+    reciprocal_ranks = 0.0
+    for found, expected in results_per_question:
+        if expected in found[:k]:
+            hits += 1
+        if expected in found:
+            reciprocal_ranks += 1 / (found.index(expected) + 1)
+    total = len(results_per_question)
+    return hits / total, reciprocal_ranks / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL") or not os.getenv("OPENAI_API_KEY"):
+        print("❌ DATABASE_URL and OPENAI_API_KEY must be set")
+        sys.exit(1)
+
+    vectors = get_embeddings(MEMOS + [question for question, _ in QUESTIONS])
+    memo_vectors, question_vectors = vectors[: len(MEMOS)], vectors[len(MEMOS) :]
+
+    db = SessionLocal()
+    transaction = db.begin()
+    try:
+        user = models.User(
+            email=f"bench-{uuid.uuid4().hex[:8]}@example.com", name="Benchmark"
+        )
+        db.add(user)
+        db.flush()
+        memo_ids = crud.bulk_create_rag_embeddings(
+            db,
+            [
+                {"user_id": user.id, "content": memo, "embedding": vector}
+                for memo, vector in zip(MEMOS, memo_vectors, strict=True)
+            ],
+        )
+
+        vector_results = []
+        hybrid_results = []
+        for (question, expected), query_vec in zip(
+            QUESTIONS, question_vectors, strict=True
+        ):
+            found = vector_search.search_similar_items(
+                db, query_vec, user.id, limit=10, mode="exact"
+            )
+            vector_results.append(([r.id for r in found], memo_ids[expected]))
+            found = vector_search.hybrid_search(
+                db, question, query_vec, user.id, limit=10
+            )
+            hybrid_results.append(([r.id for r in found], memo_ids[expected]))
+    finally:
+        transaction.rollback()
+        db.close()
+
+    print(f"{len(MEMOS)} memos, {len(QUESTIONS)} questions")
+    for label, results in (("vector", vector_results), ("hybrid", hybrid_results)):
+        recall, mrr = evaluate(results, args.k)
+        print(f"  {label:<7} recall@{args.k} {recall:.3f}  MRR {mrr:.3f}")
+
+
+if __name__ == "__main__":
+    main()
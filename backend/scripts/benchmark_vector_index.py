@@ -0,0 +1,221 @@
+"""
+Benchmark HNSW vs exact (sequential scan) vector search.
+
+Loads synthetic clustered 1536-dim embeddings into a scratch schema
+(vector_bench) of the database in DATABASE_URL, builds the same HNSW index
+as the rag_embeddings migration, and reports latency and recall@k for:
+
+- global search:    ORDER BY embedding <=> q LIMIT k
+- per-user search:  WHERE user_id = u ORDER BY embedding <=> q LIMIT k
+                    (with hnsw.iterative_scan when pgvector >= 0.8.0)
+
+Usage:
+    python scripts/benchmark_vector_index.py --sizes 10000 100000 1000000
+
+Large sizes need a lot of disk and maintenance_work_mem (1M rows is ~6 GB of
+vectors, and the index build takes a long time).
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+load_dotenv()
+
+DIMENSIONS = 1536
+SCHEMA = "vector_bench"
+
+
+def make_vectors(rng, count, centers, noise=0.6):
+    """Clustered, unit-norm vectors, similar in spirit to text embeddings."""
+    labels = rng.integers(0, len(centers), size=count)
+    vectors = centers[labels] + noise * rng.standard_normal(
+        (count, DIMENSIONS), dtype=np.float32
+    ) / np.sqrt(DIMENSIONS)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+_ROW_FORMAT = "[" + ",".join(["%.6f"] * DIMENSIONS) + "]"
+
+
+def to_literal(vector):
+    return _ROW_FORMAT % tuple(vector.tolist())
+
+
+def load_rows(engine, rng, size, users, centers, chunk=5000):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {SCHEMA}.items"))
+        conn.execute(
+            text(
+                f"CREATE TABLE {SCHEMA}.items ("
+                "id bigserial PRIMARY KEY, user_id integer NOT NULL, "
+                f"embedding vector({DIMENSIONS}) NOT NULL)"
+            )
+        )
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for start in range(0, size, chunk):
+            count = min(chunk, size - start)
+            vectors = make_vectors(rng, count, centers)
+            user_ids = rng.integers(0, users, size=count)
+            buffer = io.StringIO()
+            for user_id, vector in zip(user_ids, vectors, strict=True):
+                buffer.write(f"{user_id}\t{to_literal(vector)}\n")
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {SCHEMA}.items (user_id, embedding) FROM STDIN", buffer
+            )
+            raw.commit()
+        cursor.execute(f"CREATE INDEX ON {SCHEMA}.items (user_id)")
+        cursor.execute(f"ANALYZE {SCHEMA}.items")
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def build_index(engine):
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text("SET maintenance_work_mem = '1GB'"))
+        conn.execute(
+            text(
+                f"CREATE INDEX items_embedding_hnsw ON {SCHEMA}.items "
+                "USING hnsw (embedding vector_cosine_ops) "
+                "WITH (m = 16, ef_construction = 64)"
+            )
+        )
+    return time.perf_counter() - started
+
+
+def supports_iterative_scan(engine):
+    with engine.connect() as conn:
+        version = conn.execute(
+            text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        ).scalar()
+    return tuple(int(p) for p in version.split(".")[:2]) >= (0, 8), version
+
+
+def run_queries(engine, queries, k, user_ids, exact, ef_search, iterative):
+    """Returns (latencies in ms, result id lists)."""
+    latencies = []
+    results = []
+    where = "WHERE user_id = :user_id" if user_ids is not None else ""
+    sql = text(
+        f"SELECT id FROM {SCHEMA}.items {where} "
+        "ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k"
+    )
+    with engine.connect() as conn:
+        for i, query in enumerate(queries):
+            with conn.begin():
+                if exact:
+                    conn.execute(text("SET LOCAL enable_indexscan = off"))
+                else:
+                    conn.execute(text(f"SET LOCAL hnsw.ef_search = {ef_search}"))
+                    if iterative:
+                        conn.execute(
+                            text("SET LOCAL hnsw.iterative_scan = relaxed_order")
+                        )
+                params = {"q": to_literal(query), "k": k}
+                if user_ids is not None:
+                    params["user_id"] = int(user_ids[i])
+                started = time.perf_counter()
+                ids = conn.execute(sql, params).scalars().all()
+                latencies.append((time.perf_counter() - started) * 1000)
+                results.append(ids)
+    return latencies, results
+
+
+def recall(results, truth, k):
+    hits = sum(
+        len(set(found) & set(expected[:k]))
+        for found, expected in zip(results, truth, strict=True)
+    )
+    total = sum(min(k, len(expected)) for expected in truth)
+    return hits / total if total else 1.0
+
+
+def summarize(label, latencies, rec):
+    p50 = statistics.median(latencies)
+    p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+    print(f"  {label:<34} p50 {p50:8.2f} ms  p95 {p95:8.2f} ms  recall {rec:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100, 200])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch data")
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("ERROR: DATABASE_URL environment variable is not set")
+        sys.exit(1)
+
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+    iterative, version = supports_iterative_scan(engine)
+    print(f"pgvector {version}, iterative scan {'on' if iterative else 'n/a'}")
+
+    rng = np.random.default_rng(args.seed)
+    try:
+        for size in args.sizes:
+            centers = rng.standard_normal((max(size // 500, 20), DIMENSIONS))
+            centers = (centers / np.linalg.norm(centers, axis=1, keepdims=True)).astype(
+                np.float32
+            )
+            started = time.perf_counter()
+            load_rows(engine, rng, size, args.users, centers)
+            load_seconds = time.perf_counter() - started
+            queries = make_vectors(rng, args.queries, centers)
+            user_ids = rng.integers(0, args.users, size=args.queries)
+
+            print(f"\n{size} rows ({args.users} users), loaded in {load_seconds:.1f}s")
+            exact_global = run_queries(engine, queries, args.k, None, True, 0, False)
+            exact_user = run_queries(engine, queries, args.k, user_ids, True, 0, False)
+            summarize("exact, global", exact_global[0], 1.0)
+            summarize("exact, per-user", exact_user[0], 1.0)
+
+            print(f"  HNSW build: {build_index(engine):.1f}s")
+            for ef_search in args.ef_search:
+                latencies, results = run_queries(
+                    engine, queries, args.k, None, False, ef_search, False
+                )
+                summarize(
+                    f"hnsw ef={ef_search}, global",
+                    latencies,
+                    recall(results, exact_global[1], args.k),
+                )
+                latencies, results = run_queries(
+                    engine, queries, args.k, user_ids, False, ef_search, iterative
+                )
+                summarize(
+                    f"hnsw ef={ef_search}, per-user",
+                    latencies,
+                    recall(results, exact_user[1], args.k),
+                )
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -25,55 +25,63 @@ export default function AnalysisPage() {
   const [analysisData, setAnalysisData] = useState<AnalysisData | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
-  const [retryCount, setRetryCount] = useState(0);
+  const [jobStatus, setJobStatus] = useState<"queued" | "running" | null>(
+    null,
+  );
+  // The latest analysis failed, but an earlier result may still be shown
+  const [updateFailed, setUpdateFailed] = useState(false);
 
   useEffect(() => {
-    let isMounted = true;
-    let timeoutId: NodeJS.Timeout | null = null;
+    const controller = new AbortController();
 
-    const fetchAnalysis = async (currentRetry = 0) => {
+    const fetchAnalysis = async () => {
       if (!token) return;
+      const headers = { Authorization: `Bearer ${token}` };
 
       try {
+        // Long-poll the analysis job: the request returns when the job
+        // finishes (or after 30 seconds), instead of retrying /analysis
+        let status = "queued";
+        while (status === "queued" || status === "running") {
+          const statusResponse = await fetch(
+            `${API_BASE_URL}/analysis/status?wait=30`,
+            { headers, signal: controller.signal },
+          );
+          if (!statusResponse.ok) {
+            throw new Error("Failed to fetch analysis status");
+          }
+          status = (await statusResponse.json()).status;
+          if (status === "queued" || status === "running") {
+            setJobStatus(status);
+          }
+        }
+        const failed = status === "failed";
+
         const response = await fetch(`${API_BASE_URL}/analysis`, {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
+          headers,
+          signal: controller.signal,
         });
-
         if (!response.ok) {
           if (response.status === 404) {
-            // If analysis not found and we haven't retried too many times, retry
-            if (currentRetry < 10) {
-              if (isMounted) setRetryCount(currentRetry + 1);
-              console.log(
-                `Analysis not found, retrying in 3 seconds... (attempt ${currentRetry + 1}/10)`,
-              );
-              timeoutId = setTimeout(
-                () => fetchAnalysis(currentRetry + 1),
-                3000,
-              );
-              return;
-            }
             throw new Error(
-              "分析が完了していません。しばらく待ってからページを再読み込みしてください。",
+              failed
+                ? "分析に失敗しました。時間をおいて回答を保存し直してください。"
+                : "分析結果がありません。質問に回答すると分析が始まります。",
             );
           }
           throw new Error("Failed to fetch analysis");
         }
 
         const data = await response.json();
-        if (isMounted) {
-          setAnalysisData(data);
-          setLoading(false);
-        }
+        setAnalysisData(data);
+        setUpdateFailed(failed);
+        setLoading(false);
       } catch (err) {
-        if (isMounted) {
-          setError(
-            err instanceof Error ? err.message : "An unknown error occurred",
-          );
-          setLoading(false);
-        }
+        if (controller.signal.aborted) return;
+        setError(
+          err instanceof Error ? err.message : "An unknown error occurred",
+        );
+        setLoading(false);
       }
     };
 
@@ -81,10 +89,7 @@ export default function AnalysisPage() {
       fetchAnalysis();
     }
 
-    return () => {
-      isMounted = false;
-      if (timeoutId) clearTimeout(timeoutId);
-    };
+    return () => controller.abort();
   }, [token]);
 
   return (
@@ -99,9 +104,11 @@ export default function AnalysisPage() {
         {loading ? (
           <div className="text-center py-12">
             <div className="text-xl mb-4">分析中...</div>
-            {retryCount > 0 && (
+            {jobStatus && (
               <div className="text-sm text-foreground/60">
-                分析結果を取得しています... ({retryCount}/10)
+                {jobStatus === "queued"
+                  ? "分析の開始を待っています..."
+                  : "AIが回答を分析しています..."}
               </div>
             )}
           </div>
@@ -124,6 +131,11 @@ export default function AnalysisPage() {
           </div>
         ) : analysisData ? (
           <>
+            {updateFailed && (
+              <div className="mb-8 rounded-lg bg-yellow-50 p-4 text-sm text-yellow-800">
+                最新の回答の分析に失敗したため、前回の分析結果を表示しています。時間をおいて回答を保存し直してください。
+              </div>
+            )}
             <AnalysisDisplay data={analysisData} />
             <div className="mt-12 flex gap-4 justify-center">
               <Link